@@ -1,132 +1,566 @@
+import hashlib
+import json
+import logging
 import os
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
-from werkzeug.utils import secure_filename
-import subprocess
-import sys
-import shutil
+import secrets
+import tempfile
+import time
+import zipfile
+from flask import Flask, Response, render_template, request, send_file, flash, redirect, session, url_for, jsonify
+from evidence_index import EvidenceIndex
+from evidence_store import EvidenceStore
+from disk_cache import DiskCache
+from generate_document import OUTPUT_FILE, ReportError, warm_up
+from input_readers import parse_severity_colors
+from html_preview import PreviewSession, PreviewStore, THUMBNAIL_WIDTH, image_mimetype, thumbnail
+from jobs import DONE, PREVIEW, JobManager, QueueFull
+from metrics import Gauge, jobs_rejected, registry
+from post_processing import resolve
+from preflight import preflight
+from template_cache import TemplateCache
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key'  # Required for flash messages
-app.config['UPLOAD_FOLDER'] = 'uploads/'  # Temporary folder for uploaded files
-app.config['GENERATED_DOCS_FOLDER'] = 'generated_docs/'  # Folder for the Word template
-app.config['IMAGE_FOLDER'] = 'path/'  # Folder for the uploaded images
-app.config['OUTPUT_FILE'] = 'Final_output.docx'  # Output file path
+# Step timings at INFO; DEBUG adds a line per table cell, so keep it off in production
+logging.basicConfig(level=os.environ.get('DOCGEN_LOG_LEVEL', 'INFO').upper(),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+# Signs the session cookie (flash messages, evidence owner); random on every start unless configured
+app.config['SECRET_KEY'] = os.environ.get('DOCGEN_SECRET_KEY') or secrets.token_hex(32)
+app.config['JOBS_FOLDER'] = os.environ.get('DOCGEN_JOBS_FOLDER')  # Per-job workspaces (a temp dir if unset)
+app.config['RENDER_WORKERS'] = int(os.environ.get('DOCGEN_RENDER_WORKERS', 2))  # Concurrent render processes
+app.config['MAX_PENDING_JOBS'] = int(os.environ.get(  # Renders queued or running before submissions get a 503
+    'DOCGEN_MAX_PENDING_JOBS', 4 * app.config['RENDER_WORKERS']))
+app.config['RENDER_TIMEOUT'] = int(os.environ.get('DOCGEN_RENDER_TIMEOUT', 600))  # Seconds before a render is stopped
+app.config['WORKER_MEMORY_LIMIT'] = int(os.environ.get(  # Address space of each render process, 0 for no limit
+    'DOCGEN_WORKER_MEMORY_MB', 2048)) * 1024 * 1024
+app.config['WORKER_CPU_LIMIT'] = int(os.environ.get(  # CPU seconds of each render process, 0 for no limit
+    'DOCGEN_WORKER_CPU_SECONDS', app.config['RENDER_TIMEOUT']))
+app.config['WARM_START'] = os.environ.get('DOCGEN_WARM_START', '1') == '1'  # Preload the engine before serving
+app.config['DEBUG_SERVER'] = os.environ.get('DOCGEN_DEBUG', '0') == '1'  # Flask's debug server instead of production
+app.config['SERVER_THREADS'] = int(os.environ.get('DOCGEN_SERVER_THREADS', 8))  # Request threads in production
+app.config['PORT'] = int(os.environ.get('DOCGEN_PORT', 5000))
+app.config['JOB_TTL'] = int(os.environ.get('DOCGEN_JOB_TTL', 3600))  # Seconds to keep finished jobs
+app.config['IMAGE_TARGET_DPI'] = int(os.environ.get('DOCGEN_IMAGE_DPI', 150))  # Screenshot resolution at 5 inches
+app.config['IMAGE_FORMAT'] = os.environ.get('DOCGEN_IMAGE_FORMAT', 'keep')  # keep, jpeg or png
+app.config['IMAGE_QUALITY'] = int(os.environ.get('DOCGEN_IMAGE_QUALITY', 85))  # JPEG quality
+app.config['IMAGE_CACHE_FOLDER'] = os.environ.get(  # Processed screenshots reused across jobs
+    'DOCGEN_IMAGE_CACHE', os.path.join(tempfile.gettempdir(), 'docgen-cache', 'images'))
+app.config['IMAGE_CACHE_SIZE'] = int(os.environ.get('DOCGEN_IMAGE_CACHE_MB', 512)) * 1024 * 1024
+app.config['FRAGMENT_CACHE_FOLDER'] = os.environ.get(  # Rendered findings reused across jobs
+    'DOCGEN_FRAGMENT_CACHE', os.path.join(tempfile.gettempdir(), 'docgen-cache', 'fragments'))
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get('DOCGEN_FRAGMENT_CACHE_MB', 256)) * 1024 * 1024
+app.config['STREAM_OUTPUT'] = os.environ.get('DOCGEN_STREAM_OUTPUT', '0') == '1'  # Write reports finding by finding
+app.config['TEMPLATE_CACHE_SIZE'] = int(os.environ.get('DOCGEN_TEMPLATE_CACHE_MB', 64)) * 1024 * 1024  # In memory
+app.config['RESULT_CACHE_FOLDER'] = os.environ.get(  # Finished reports by the hash of their inputs
+    'DOCGEN_RESULT_CACHE', os.path.join(tempfile.gettempdir(), 'docgen-cache', 'results'))
+app.config['RESULT_CACHE_SIZE'] = int(os.environ.get('DOCGEN_RESULT_CACHE_MB', 1024)) * 1024 * 1024
+app.config['EVIDENCE_STORE_FOLDER'] = os.environ.get(  # Uploaded screenshots by content hash, shared by jobs
+    'DOCGEN_EVIDENCE_STORE', os.path.join(tempfile.gettempdir(), 'docgen-cache', 'evidence'))
+app.config['EVIDENCE_OWNER_HEADER'] = os.environ.get(  # Team name set by an authenticating proxy; else per session
+    'DOCGEN_EVIDENCE_OWNER_HEADER')
+app.config['EVIDENCE_STORE_SIZE'] = int(os.environ.get('DOCGEN_EVIDENCE_STORE_MB', 4096)) * 1024 * 1024
+app.config['MAX_ARCHIVE_SIZE'] = int(os.environ.get('DOCGEN_MAX_ARCHIVE_MB', 4096)) * 1024 * 1024  # Unpacked .zip size
+app.config['PREVIEW_PAGE_SIZE'] = int(os.environ.get('DOCGEN_PREVIEW_PAGE_SIZE', 20))  # Findings per preview page
+app.config['PREVIEW_THUMBNAIL_WIDTH'] = int(os.environ.get('DOCGEN_PREVIEW_THUMBNAIL_WIDTH', THUMBNAIL_WIDTH))
+app.config['THUMBNAIL_CACHE_FOLDER'] = os.environ.get(  # Preview thumbnails reused across previews
+    'DOCGEN_THUMBNAIL_CACHE', os.path.join(tempfile.gettempdir(), 'docgen-cache', 'thumbnails'))
+app.config['THUMBNAIL_CACHE_SIZE'] = int(os.environ.get('DOCGEN_THUMBNAIL_CACHE_MB', 128)) * 1024 * 1024
+app.config['IMAGE_FOLDER'] = 'path/'  # Image folder name inside each job workspace
+app.config['OUTPUT_FILE'] = OUTPUT_FILE  # Download name of the generated document
+app.config['POST_PROCESSORS'] = [name.strip() for name in os.environ.get(  # Hooks run on each report before saving
+    'DOCGEN_POST_PROCESS', '').split(',') if name.strip()]
+app.config['NEXT_SCRIPT'] = os.environ.get('DOCGEN_NEXT_SCRIPT')  # Legacy script run on each saved report
+app.config['SEVERITY_COLORS'] = parse_severity_colors(  # Severity colors of CSV, JSON Lines and Parquet uploads
+    os.environ['DOCGEN_SEVERITY_COLORS']) if os.environ.get('DOCGEN_SEVERITY_COLORS') else None
 
 # Allowed file extensions
-ALLOWED_EXCEL_EXTENSIONS = {'xlsx'}
+ALLOWED_EXCEL_EXTENSIONS = {'xlsx', 'csv', 'jsonl', 'ndjson', 'parquet'}  # Workbooks and tracker exports
 ALLOWED_DOC_EXTENSIONS = {'docx'}
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+ALLOWED_ARCHIVE_EXTENSIONS = {'zip'}
 
-# Ensure upload, generated_docs, and path folders exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['GENERATED_DOCS_FOLDER'], exist_ok=True)
-os.makedirs(app.config['IMAGE_FOLDER'], exist_ok=True)
+# Pre-warm the rendering engine once so forked render workers start with it loaded; without a
+# warm start, dependencies are imported on first use, which starts short-lived instances faster
+if app.config['WARM_START']:
+    warm_up()
+for hook in app.config['POST_PROCESSORS']:
+    resolve(hook)  # Fail at startup, not in every job, on a misconfigured hook
+
+template_cache = TemplateCache(app.config['TEMPLATE_CACHE_SIZE'])  # Shared by render jobs and previews
+preview_store = PreviewStore()  # Workbooks being previewed, read as far as the pages viewed
+job_manager = JobManager(
+    root=app.config['JOBS_FOLDER'],
+    max_workers=app.config['RENDER_WORKERS'],
+    ttl=app.config['JOB_TTL'],
+    next_script=app.config['NEXT_SCRIPT'],
+    render_options={
+        'image_options': {
+            'target_dpi': app.config['IMAGE_TARGET_DPI'],
+            'image_format': app.config['IMAGE_FORMAT'],
+            'quality': app.config['IMAGE_QUALITY'],
+            'cache_dir': app.config['IMAGE_CACHE_FOLDER'],
+            'cache_max_bytes': app.config['IMAGE_CACHE_SIZE'],
+        },
+        'fragment_cache': app.config['FRAGMENT_CACHE_FOLDER'],
+        'fragment_cache_max_bytes': app.config['FRAGMENT_CACHE_SIZE'],
+        'post_processors': app.config['POST_PROCESSORS'],
+        'severity_colors': app.config['SEVERITY_COLORS'],
+    },
+    template_cache=template_cache,
+    stream=app.config['STREAM_OUTPUT'],
+    result_cache=DiskCache(app.config['RESULT_CACHE_FOLDER'], app.config['RESULT_CACHE_SIZE']),
+    max_pending=app.config['MAX_PENDING_JOBS'],
+    timeout=app.config['RENDER_TIMEOUT'],
+    memory_limit=app.config['WORKER_MEMORY_LIMIT'],
+    cpu_limit=app.config['WORKER_CPU_LIMIT'],
+    on_discard=lambda job: preview_store.discard(job.id),  # Close the workbook of an expired preview
+)
+registry.add(Gauge('docgen_queue_depth', 'Render jobs waiting for or occupying a worker.',
+                   job_manager.queue_depth))
+evidence_store = EvidenceStore(app.config['EVIDENCE_STORE_FOLDER'], app.config['EVIDENCE_STORE_SIZE'])
+thumbnail_cache = DiskCache(app.config['THUMBNAIL_CACHE_FOLDER'], app.config['THUMBNAIL_CACHE_SIZE'])
+
+def findings_path(workspace, filename=None):
+    """Where a job's findings file is saved: data_ples with the extension of the upload `filename`.
+
+    Without `filename`, the one already saved in `workspace`.
+    """
+    if filename is not None:
+        return os.path.join(workspace, 'data_ples.' + filename.rsplit('.', 1)[1].lower())
+    return next((os.path.join(workspace, 'data_ples.' + extension) for extension in sorted(ALLOWED_EXCEL_EXTENSIONS)
+                 if os.path.exists(os.path.join(workspace, 'data_ples.' + extension))),
+                os.path.join(workspace, 'data_ples.xlsx'))
 
 def allowed_file(filename, allowed_extensions):
     """Check if the file has an allowed extension."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def save_and_hash(stream, save_path, chunk_size=1024 * 1024):
+    """Save an uploaded file while computing its SHA-256, so images are never re-read just to hash them."""
+    digest = hashlib.sha256()
+    with open(save_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def image_destination(image_folder, relative_path):
+    """Return where an image goes inside `image_folder`, or None if the path would escape it."""
+    save_path = os.path.normpath(os.path.join(image_folder, relative_path))
+    if not save_path.startswith(os.path.normpath(image_folder) + os.sep):
+        return None
+    return save_path
+
+def uploaded_image_path(filename):
+    """Relative path of an image picked from the "path" folder (or a bare file name)."""
+    if filename.startswith('path/'):
+        return filename[len('path/'):]  # Remove the "path/" prefix
+    return os.path.basename(filename)  # Use only the filename if no path
+
+def extract_images(archive, image_folder, image_hashes, warnings):
+    """Unpack the images in an uploaded .zip into `image_folder`.
+
+    Entries that are not images, or whose names would land outside the
+    folder (absolute paths, "..", zip-slip), are skipped with a warning.
+    The archive is streamed member by member from the uploaded file.
+    """
+    try:
+        with zipfile.ZipFile(archive.stream) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            if sum(info.file_size for info in members) > app.config['MAX_ARCHIVE_SIZE']:
+                warnings.append('Skipped the image archive: it is too large once unpacked.')
+                return
+            for info in members:
+                name = info.filename.replace('\\', '/')
+                if name.startswith('path/'):
+                    name = name[len('path/'):]
+                save_path = image_destination(image_folder, name) if allowed_file(name, ALLOWED_IMAGE_EXTENSIONS) else None
+                if save_path is None:
+                    warnings.append(f'Skipped invalid file in archive: {info.filename}.')
+                    continue
+                os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                with zf.open(info) as member:
+                    image_hashes[save_path] = save_and_hash(member, save_path)
+    except zipfile.BadZipFile:
+        warnings.append('Skipped the image archive: it is not a valid .zip file.')
+
+def evidence_owner():
+    """Who the evidence this request stores or links belongs to: its team, or else its browser session.
+
+    The team comes from EVIDENCE_OWNER_HEADER, which only a trusted proxy
+    may set; without the header configured, each session is its own owner,
+    so a new session has to upload the bytes of every image once. None when
+    the header is configured but missing: nothing is stored or linked.
+    """
+    header = app.config['EVIDENCE_OWNER_HEADER']
+    if header:
+        team = request.headers.get(header, '').strip()
+        return f'team:{team}' if team else None
+    if 'evidence_owner' not in session:
+        session['evidence_owner'] = secrets.token_hex(16)
+    return f"session:{session['evidence_owner']}"
+
+def read_manifest(manifest):
+    """Validate an image manifest: an object (or its JSON text) mapping relative image paths to SHA-256 digests."""
+    if isinstance(manifest, str):
+        try:
+            manifest = json.loads(manifest) if manifest else {}
+        except ValueError:
+            return None
+    manifest = {} if manifest is None else manifest
+    if not isinstance(manifest, dict) or not all(
+            isinstance(path, str) and isinstance(sha256, str) for path, sha256 in manifest.items()):
+        return None
+    return {path: sha256.lower() for path, sha256 in manifest.items()}
+
+def wants_json():
+    """True when the client (the upload page's script) asked for a JSON response."""
+    return request.accept_mimetypes.best == 'application/json'
+
+def reject(message):
+    """Report a validation error as JSON for scripted clients, or flash it and go back to the form."""
+    if wants_json():
+        return jsonify({'error': message}), 400
+    flash(message)
+    return redirect(url_for('index'))
+
+def busy(retry_after):
+    """Refuse a submission while the render queue is full, telling the client when to retry."""
+    with registry.lock:
+        jobs_rejected.inc()
+    message = f"The server is busy; try again in {retry_after} seconds."
+    body = jsonify({'error': message, 'retry_after': retry_after}) if wants_json() else message
+    return body, 503, {'Retry-After': str(retry_after)}
+
 @app.route('/')
 def index():
     """Render the main page with the upload form."""
     return render_template('index.html')
 
-@app.route('/generate', methods=['POST'])
-def generate_document():
-    """Handle file uploads and document generation."""
+class UploadError(Exception):
+    """Raised when the uploaded files of a request are missing or invalid."""
+
+def save_uploads(preview=False):
+    """Validate the uploaded files and save them into a new job's workspace.
+
+    Returns the job, the workbook and template paths, the workbook's and the
+    template's SHA-256, the image hashes and any warnings. A `preview` job
+    does not need images.
+    """
     # Check if all required files are part of the request
     if 'excel_file' not in request.files or 'template_file' not in request.files:
-        flash('Please upload the Excel sheet and the Word template!')
-        return redirect(url_for('index'))
+        raise UploadError('Please upload the Excel sheet and the Word template!')
 
     excel_file = request.files['excel_file']
     template_file = request.files['template_file']
 
     # Validate Excel and template file uploads
     if excel_file.filename == '' or template_file.filename == '':
-        flash('Please select both the Excel sheet and the Word template!')
-        return redirect(url_for('index'))
+        raise UploadError('Please select both the Excel sheet and the Word template!')
 
     if not (allowed_file(excel_file.filename, ALLOWED_EXCEL_EXTENSIONS) and 
             allowed_file(template_file.filename, ALLOWED_DOC_EXTENSIONS)):
-        flash('Invalid file types! Excel sheet must be .xlsx, and the template must be .docx.')
-        return redirect(url_for('index'))
+        raise UploadError('Invalid file types! The findings must be an .xlsx sheet or a .csv, .jsonl or .parquet '
+                          'export, and the template must be .docx.')
 
-    # Save the Excel and template files
-    excel_filename = secure_filename(excel_file.filename)
-    template_filename = secure_filename(template_file.filename)
+    # Handle the images: uploaded folder files, a .zip archive and/or a manifest of
+    # files already in the evidence store (see /uploads/manifest)
+    image_files = request.files.getlist('image_folder')
+    archive = request.files.get('image_archive')
+    manifest = read_manifest(request.form.get('image_manifest'))
+    if manifest is None:
+        raise UploadError('Invalid image manifest!')
 
-    excel_path = os.path.join(app.config['UPLOAD_FOLDER'], 'data_ples.xlsx')
-    template_path = os.path.join(app.config['GENERATED_DOCS_FOLDER'], 'document_1.docx')
+    if not image_files and not archive and not manifest and not preview:
+        raise UploadError('Please upload the image folder!')
 
-    excel_file.save(excel_path)
-    template_file.save(template_path)
+    # Validate and save image files
+    has_archive = archive is not None and archive.filename != ''
+    if all(file.filename == '' for file in image_files) and not has_archive and not manifest and not preview:
+        raise UploadError('Please select a folder containing images!')
 
-    # Handle the image folder upload
-    if 'image_folder' not in request.files:
-        flash('Please upload the image folder!')
-        return redirect(url_for('index'))
+    if has_archive and not allowed_file(archive.filename, ALLOWED_ARCHIVE_EXTENSIONS):
+        raise UploadError('Invalid file type! The image archive must be a .zip file.')
 
-    image_files = request.files.getlist('image_folder')
-
-    # Validate and save image files
-    if not image_files or all(file.filename == '' for file in image_files):
-        flash('Please select a folder containing images!')
-        return redirect(url_for('index'))
+    # Save everything into this job's own workspace
+    job = job_manager.create_job(preview=preview)
+    # A job whose uploads could not be saved would otherwise stay queued forever
+    try:
+        excel_path = findings_path(job.workspace, excel_file.filename)
+        template_path = os.path.join(job.workspace, 'document_1.docx')
+        image_folder = os.path.join(job.workspace, app.config['IMAGE_FOLDER'])
 
-    # Clear the existing path/ folder to avoid conflicts
-    if os.path.exists(app.config['IMAGE_FOLDER']):
-        shutil.rmtree(app.config['IMAGE_FOLDER'])
-    os.makedirs(app.config['IMAGE_FOLDER'], exist_ok=True)
-
-    # Save each image file into the path/ folder, preserving the relative path
-    for image_file in image_files:
-        if image_file and allowed_file(image_file.filename, ALLOWED_IMAGE_EXTENSIONS):
-            # Get the relative path of the file within the uploaded folder
-            relative_path = image_file.filename
-            if relative_path.startswith('path/'):
-                relative_path = relative_path[len('path/'):]  # Remove the "path/" prefix
-            else:
-                relative_path = os.path.basename(relative_path)  # Use only the filename if no path
+        excel_sha256 = save_and_hash(excel_file.stream, excel_path)  # With the others, keys the result cache
+        template_sha256 = save_and_hash(template_file.stream, template_path)  # Keys the template cache
 
-            # Construct the full path to save the image
-            image_save_path = os.path.join(app.config['IMAGE_FOLDER'], relative_path)
+        # Save each image file into the workspace's path/ folder, preserving the relative path
+        warnings = []
+        image_hashes = {}
+        for image_file in image_files:
+            if image_file and allowed_file(image_file.filename, ALLOWED_IMAGE_EXTENSIONS):
+                # Construct the full path to save the image, refusing anything outside the folder
+                image_save_path = image_destination(image_folder, uploaded_image_path(image_file.filename))
+                if image_save_path is None:
+                    warnings.append(f'Skipped invalid file: {image_file.filename}.')
+                    continue
             
-            # Create any necessary subdirectories
-            os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
+                # Create any necessary subdirectories
+                os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
             
-            # Save the image
-            image_file.save(image_save_path)
-        else:
-            flash(f'Skipped invalid file: {image_file.filename}. Only .png, .jpg, and .jpeg files are allowed.')
-            continue
+                # Save the image, remembering its content hash for the image cache
+                image_hashes[image_save_path] = save_and_hash(image_file.stream, image_save_path)
+            elif image_file.filename:
+                warnings.append(f'Skipped invalid file: {image_file.filename}. Only .png, .jpg, and .jpeg files are allowed.')
+                continue
+
+        if has_archive:
+            extract_images(archive, image_folder, image_hashes, warnings)
+
+        # Keep what was uploaded for later jobs, then link in what the client didn't need to send
+        owner = evidence_owner()
+        for image_save_path, sha256 in image_hashes.items():
+            evidence_store.add(owner, image_save_path, sha256)
+        for filename, sha256 in manifest.items():
+            image_save_path = image_destination(image_folder, uploaded_image_path(filename))
+            if image_save_path is None or not allowed_file(filename, ALLOWED_IMAGE_EXTENSIONS):
+                warnings.append(f'Skipped invalid file: {filename}.')
+                continue
+            if image_save_path in image_hashes:
+                continue  # Uploaded after all
+            os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
+            if evidence_store.materialize(owner, sha256, image_save_path):
+                image_hashes[image_save_path] = sha256
+            else:
+                warnings.append(f'Missing image: {filename} was neither uploaded nor found on the server.')
+
+        return job, excel_path, template_path, excel_sha256, template_sha256, image_hashes, warnings
+    except BaseException:
+        job_manager.discard(job)
+        raise
+
+def image_paths(names):
+    """Where images uploaded under `names` end up, relative to a job workspace (as the sheet references them)."""
+    return {os.path.normpath(os.path.join(app.config['IMAGE_FOLDER'], uploaded_image_path(name)))
+            for name in names}
+
+@app.route('/preflight', methods=['POST'])
+def preflight_check():
+    """Check the Excel sheet, the template and the image references without uploading images or rendering.
+
+    Takes the Excel sheet and the template as files, and the names of the images
+    that would be uploaded as the keys of `image_manifest` (see /uploads/manifest)
+    and/or a JSON list in `image_paths`; without either, image paths are not checked.
+    """
+    excel_file = request.files.get('excel_file')
+    template_file = request.files.get('template_file')
+    if not excel_file or not template_file or excel_file.filename == '' or template_file.filename == '':
+        return jsonify({'error': 'Please upload the Excel sheet and the Word template!'}), 400
+    manifest = read_manifest(request.form.get('image_manifest'))
+    try:
+        names = json.loads(request.form.get('image_paths') or '[]')
+    except ValueError:
+        names = None
+    if manifest is None or not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({'error': 'Invalid image manifest!'}), 400
+
+    # Checked straight from the uploaded streams; nothing is saved
+    check_images = 'image_manifest' in request.form or 'image_paths' in request.form
+    evidence = EvidenceIndex(image_paths(list(manifest) + names)) if check_images else None
+    report = preflight(excel_file.stream, template_file.stream, evidence=evidence, check_images=check_images,
+                       fmt=os.path.splitext(excel_file.filename)[1])
+    report['ok'] = not report['errors']
+    return jsonify(report)
+
+@app.route('/generate', methods=['POST'])
+def generate_document():
+    """Handle file uploads and queue the document generation job."""
+    # Refuse at once while the render queue is full, before reading the uploads
+    if job_manager.full():
+        return busy(job_manager.retry_after())
+
+    try:
+        job, excel_path, template_path, excel_sha256, template_sha256, image_hashes, warnings = save_uploads()
+    except UploadError as e:
+        return reject(str(e))
+
+    # Refuse what would fail anyway before it takes up a render worker
+    try:
+        template = template_cache.get(template_path, template_sha256)
+    except Exception:
+        template = template_path  # Preflight reports why it can't be read
+    # The images are indexed once from what was saved; preflight and the render resolve references through it
+    evidence = EvidenceIndex(os.path.relpath(path, job.workspace) for path in image_hashes)
+    report = preflight(excel_path, template, image_dir=job.workspace, evidence=evidence)
+    if report['errors']:
+        job_manager.discard(job)
+        return reject(' '.join(report['errors']))
+    warnings.extend(report['warnings'])
+    job.evidence = report['evidence']  # Until the render reports on the images it embedded
+
+    # An identical submission gets the job already rendering it, or the cached report
+    result_key = job_manager.result_key(job, excel_sha256, template_sha256, image_hashes)
+    try:
+        job = job_manager.submit(job, excel_path, template_path, template_sha256, result_key,
+                                 image_hashes=image_hashes, evidence=evidence)
+    except QueueFull as e:
+        job_manager.discard(job)
+        return busy(e.retry_after)
 
-    # Run the document generation script with the uploaded file paths
+    if not wants_json():
+        for warning in warnings:
+            flash(warning)
+        if job.status == DONE:
+            return redirect(url_for('download_job', job_id=job.id))
+        return redirect(url_for('job_status', job_id=job.id))
+    response = jsonify({
+        'id': job.id,
+        'status': job.status,
+        'status_url': url_for('job_status', job_id=job.id),
+        'download_url': url_for('download_job', job_id=job.id),
+        'warnings': warnings,
+        'evidence': job.evidence,
+    })
+    return response, 200 if job.status == DONE else 202, {'Location': url_for('job_status', job_id=job.id)}
+
+@app.route('/preview', methods=['POST'])
+def preview_upload():
+    """Save the uploads for an HTML preview of the findings, without rendering the document."""
     try:
-        result = subprocess.run(
-            [sys.executable, 'generate_document.py', excel_path, template_path],
-            check=True,
-            capture_output=True,
-            text=True
-        )
-        print(f"Document generation output: {result.stdout}")
-        if result.stderr:
-            print(f"Document generation errors: {result.stderr}")
-    except subprocess.CalledProcessError as e:
-        flash(f"Error generating document: {e.stderr}")
+        job, _, _, _, _, image_hashes, warnings = save_uploads(preview=True)
+    except UploadError as e:
+        return reject(str(e))
+
+    job.image_hashes = image_hashes  # Keys the thumbnails without hashing each image again
+
+    # Shown on the preview page, which the upload page's script navigates to
+    for warning in warnings:
+        flash(warning)
+    preview_url = url_for('preview', job_id=job.id)
+    if not wants_json():
+        return redirect(preview_url)
+    return jsonify({'id': job.id, 'preview_url': preview_url, 'warnings': warnings}), 201, {'Location': preview_url}
+
+def preview_job(job_id):
+    """The preview job `job_id`, kept for another TTL now that it is being looked at; None if gone."""
+    job = job_manager.get(job_id)
+    if job is None or job.status != PREVIEW:
+        preview_store.discard(job_id)  # Expired: close its open workbook
+        return None
+    job.finished = time.time()
+    return job
+
+@app.route('/preview/<job_id>')
+def preview(job_id):
+    """Show one page of findings as HTML, reading the workbook only as far as that page."""
+    job = preview_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired preview.'}), 404
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', app.config['PREVIEW_PAGE_SIZE'], type=int)), 100)
+
+    def open_session():
+        template_path = os.path.join(job.workspace, 'document_1.docx')
+        try:
+            template = template_cache.get(template_path)
+        except Exception as e:
+            raise ReportError(f"Cannot load the Word template: {e}")
+        evidence = EvidenceIndex.scan(job.workspace, app.config['IMAGE_FOLDER'])
+        return PreviewSession(findings_path(job.workspace), template, job.workspace, app.config['SEVERITY_COLORS'],
+                              evidence)
+
+    try:
+        preview_session = preview_store.get(job.id, open_session)
+        findings, has_next = preview_session.page(
+            page, per_page, lambda name: url_for('preview_image', job_id=job.id, name=name))
+    except ReportError as e:
+        if wants_json():
+            return jsonify({'error': str(e)}), 422
+        flash(str(e))
         return redirect(url_for('index'))
 
+    total = preview_session.total()
+    if wants_json():
+        return jsonify({'page': page, 'per_page': per_page, 'total': total, 'has_next': has_next,
+                        'html': findings})
+    return render_template('preview.html', job_id=job.id, findings=findings, page=page, per_page=per_page,
+                           has_next=has_next, total=total)
+
+@app.route('/preview/<job_id>/images/<path:name>')
+def preview_image(job_id, name):
+    """Serve a screenshot of a preview as a cached thumbnail."""
+    job = preview_job(job_id)
+    image_path = image_destination(job.workspace, name) if job is not None else None
+    if image_path is None or not allowed_file(name, ALLOWED_IMAGE_EXTENSIONS) or not os.path.isfile(image_path):
+        return jsonify({'error': 'Unknown image.'}), 404
+    data = thumbnail(image_path, thumbnail_cache, app.config['PREVIEW_THUMBNAIL_WIDTH'],
+                     job.image_hashes.get(image_path))
+    # The workspace's files never change, so the browser can keep the thumbnail as long as the preview lives
+    return Response(data, mimetype=image_mimetype(data),
+                    headers={'Cache-Control': f"private, max-age={app.config['JOB_TTL']}"})
+
+@app.route('/uploads/manifest', methods=['POST'])
+def upload_manifest():
+    """Tell the client which images it still has to upload.
+
+    Takes {"files": {relative path: sha256}} and answers with the paths whose
+    content this client (see evidence_owner) has not uploaded yet; /generate
+    links the others in when it receives the same mapping as its
+    image_manifest field. Uploads by other clients are never reported.
+    """
+    data = request.get_json(silent=True) or {}
+    manifest = read_manifest(data.get('files'))
+    if manifest is None:
+        return jsonify({'error': 'Invalid image manifest!'}), 400
+    missing = evidence_store.missing(evidence_owner(), set(manifest.values()))
+    return jsonify({'missing': sorted(path for path, sha256 in manifest.items() if sha256 in missing)})
+
+@app.route('/metrics')
+def metrics():
+    """Expose render metrics in the Prometheus text format."""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the state of a generation job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    status = job.to_dict()
+    if job.status == DONE:
+        status['download_url'] = url_for('download_job', job_id=job.id)
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Provide the generated file of a finished job for download."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    if job.status != DONE:
+        return jsonify({'error': f'Job is {job.status}.', 'status': job.status}), 409
+
     # Check if the output file was created
-    if not os.path.exists(app.config['OUTPUT_FILE']):
-        flash('Document generation failed: Output file not created.')
-        return redirect(url_for('index'))
+    if not os.path.exists(job.output_path):
+        return jsonify({'error': 'Document generation failed: Output file not created.'}), 500
 
-    # Provide the generated file for download
+    # Streamed from the job's own copy; the result key is the ETag, so conditional and range
+    # requests are answered for resubmissions and resumed downloads alike
     return send_file(
-        app.config['OUTPUT_FILE'],
+        job.output_path,
         as_attachment=True,
-        download_name='Final_output.docx'
+        download_name=app.config['OUTPUT_FILE'],
+        etag=job.result_key or True,
+        conditional=True,
     )
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    try:
+        import waitress
+    except ImportError:  # Production mode falls back to Werkzeug's threaded server
+        waitress = None
+    if app.config['DEBUG_SERVER']:
+        app.run(debug=True, host='0.0.0.0', port=app.config['PORT'])
+    elif waitress is not None:
+        waitress.serve(app, host='0.0.0.0', port=app.config['PORT'], threads=app.config['SERVER_THREADS'])
+    else:
+        logging.getLogger('docgen.app').warning("waitress is not installed; serving with Werkzeug's threaded server")
+        app.run(host='0.0.0.0', port=app.config['PORT'], threaded=True)
\ No newline at end of file
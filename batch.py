@@ -0,0 +1,156 @@
+"""Render many workbooks against one Word template.
+
+Usage: python batch.py INPUTS TEMPLATE [--output-dir DIR] [--workers N] [--summary FILE] [render options]
+
+INPUTS is a directory of .xlsx files (or .csv, .jsonl and .parquet exports)
+or a manifest listing one workbook per line (blank lines and '#' comments
+are ignored, relative paths are resolved against the manifest's directory). The template is loaded and its tables
+analyzed once (see PreparedTemplate), then the workbooks are rendered by a
+process pool sized to the CPU count. Every workbook gets its own
+<name>.docx in the output directory, and a summary of timings and failures
+is printed at the end.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from generate_document import PreparedTemplate, ReportError, add_render_arguments, check_post_processors, \
+    configure_logging, preload, render_options, render_report, stream_report
+from input_readers import READERS
+
+logger = logging.getLogger('docgen.batch')
+
+# The prepared template of a worker process; inherited from the parent when the pool forks
+TEMPLATE = None
+
+
+def read_inputs(inputs):
+    """Return the workbook paths named by `inputs`, a directory or a manifest file."""
+    if os.path.isdir(inputs):
+        return [os.path.join(inputs, name) for name in sorted(os.listdir(inputs))
+                if name.lower().endswith(tuple(READERS)) and not name.startswith('~$')]  # Skip Excel lock files
+    base = os.path.dirname(os.path.abspath(inputs))
+    with open(inputs, encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+def output_paths(workbooks, output_dir):
+    """One <name>.docx per workbook in `output_dir`, numbering repeated names."""
+    outputs, seen = [], {}
+    for excel_path in workbooks:
+        stem = os.path.splitext(os.path.basename(excel_path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        name = stem if seen[stem] == 1 else f"{stem}-{seen[stem]}"
+        outputs.append(os.path.join(output_dir, name + '.docx'))
+    return outputs
+
+
+def init_worker(template_path, verbose):
+    global TEMPLATE
+    configure_logging(verbose)
+    if TEMPLATE is None:  # Not forked from the parent (spawn start method)
+        TEMPLATE = PreparedTemplate(template_path)
+
+
+def render_one(job):
+    """Render one workbook and write its report (runs in a pool worker)."""
+    excel_path, output_path, image_dir, stream, options = job
+    image_dir = image_dir or os.path.dirname(os.path.abspath(excel_path))
+    stats = {}
+    try:
+        if stream:
+            stream_report(excel_path, TEMPLATE, output_path, image_dir, stats=stats, **options)
+        else:
+            report = render_report(excel_path, TEMPLATE, image_dir, stats=stats, **options)
+            with open(output_path, 'wb') as f:
+                f.write(report)
+    except ReportError as e:
+        return excel_path, output_path, 'failed', str(e), stats
+    except Exception as e:
+        logger.exception("Rendering %s failed", excel_path)
+        return excel_path, output_path, 'failed', f"{type(e).__name__}: {e}", stats
+    return excel_path, output_path, 'finished', None, stats
+
+
+def print_summary(results, seconds):
+    print(f"{'status':<9} {'seconds':>8} {'findings':>9} {'images':>7}  workbook")
+    for excel_path, _, status, _, stats in results:
+        print(f"{status:<9} {stats.get('seconds', 0.0):8.2f} {stats.get('findings', 0):9d} "
+              f"{stats.get('images', 0):7d}  {excel_path}")
+    failures = [result for result in results if result[2] != 'finished']
+    print(f"{len(results) - len(failures)} of {len(results)} reports rendered in {seconds:.2f} s")
+    for excel_path, _, _, error, _ in failures:
+        print(f"Error: {excel_path}: {error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', help="Directory of .xlsx workbooks or exports, or a manifest listing one per line")
+    parser.add_argument('template_path', help="Word template (.docx) containing the findings table")
+    parser.add_argument('--output-dir', default='reports', help="Where the reports are written (default: reports)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Render processes (default: one per CPU)")
+    parser.add_argument('--image-dir', metavar='DIR',
+                        help="Resolve screenshot paths against DIR (default: each workbook's directory)")
+    parser.add_argument('--summary', metavar='FILE', help="Also write the per-workbook results as JSON")
+    add_render_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    global TEMPLATE
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    check_post_processors(parser, args)
+    configure_logging(args.verbose)
+
+    try:
+        workbooks = read_inputs(args.inputs)
+    except OSError as e:
+        print(f"Error: cannot read {args.inputs}: {e}")
+        sys.exit(1)
+    if not workbooks:
+        print(f"Error: no workbooks found in {args.inputs}")
+        sys.exit(1)
+    try:
+        TEMPLATE = PreparedTemplate(args.template_path)
+    except Exception as e:
+        print(f"Error: cannot load template {args.template_path}: {e}")
+        sys.exit(1)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = render_options(args)
+    jobs = [(excel_path, output_path, args.image_dir, args.stream, options)
+            for excel_path, output_path in zip(workbooks, output_paths(workbooks, args.output_dir))]
+    workers = max(1, min(args.workers, len(jobs)))
+
+    # Forked workers share the template parsed above, and the dependencies preloaded here, instead of loading them again
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    if 'fork' in methods and workers > 1:
+        preload()
+    start = time.perf_counter()
+    with context.Pool(workers, initializer=init_worker, initargs=(args.template_path, args.verbose)) as pool:
+        results = pool.map(render_one, jobs, chunksize=1)
+    seconds = time.perf_counter() - start
+
+    print_summary(results, seconds)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump({
+                'seconds': seconds,
+                'workers': workers,
+                'reports': [{'workbook': excel_path, 'output': output_path, 'status': status, 'error': error,
+                             'stats': stats} for excel_path, output_path, status, error, stats in results],
+            }, f, indent=2)
+    if any(result[2] != 'finished' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Track the import time of the entry points against a budget, from `python -X importtime` output.
+
+Each scenario runs in a fresh interpreter: importing the CLI module, rendering
+a small CSV report, and importing the web app with and without its warm start.
+The time spent importing (beyond the interpreter's own startup imports) is
+compared with the scenario's budget, and the modules a scenario must not load
+(openpyxl on the CSV path, for instance) are checked. Results are written to
+`import-benchmark.json` (--output); the exit status is 1 when a budget is
+exceeded or a module is loaded where it should not be.
+
+Usage: python benchmarks/bench_import_time.py [--repeat N] [--budget SCENARIO=MS ...] [--output FILE]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+
+# Budgets in milliseconds of import time; generous enough for a slow CI machine
+BUDGETS = {
+    'cli': 400,
+    'csv_render': 500,
+    'app_cold': 800,
+    'app_warm': None,  # Tracked only: the warm start loads everything on purpose
+}
+# Modules that must stay unloaded on a scenario's path
+FORBIDDEN = {
+    'cli': ('openpyxl', 'PIL', 'pyarrow', 'pandas'),
+    'csv_render': ('openpyxl', 'PIL', 'pyarrow', 'pandas'),
+    'app_cold': ('openpyxl', 'PIL', 'pyarrow', 'pandas'),
+    'app_warm': ('pandas',),
+}
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(stderr):
+    """(module, cumulative microseconds, nesting depth) for each line of -X importtime output."""
+    return [(match.group(4), int(match.group(2)), len(match.group(3)) - 1)
+            for match in map(LINE.match, stderr.splitlines()) if match]
+
+
+def run(code, env=None):
+    """Run `code` in a fresh interpreter and return its parsed import times."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure(code, startup, env=None):
+    """Import time in ms of `code` beyond the interpreter's startup imports, and the modules it loaded."""
+    entries = run(code, env)
+    total = sum(cumulative for module, cumulative, depth in entries if depth == 0 and module not in startup)
+    return total / 1000, {module for module, _, _ in entries}
+
+
+def build_csv(csv_path, findings=5):
+    """Write a small CSV export with the columns of the fixture template."""
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fixtures.ROW_HEADERS + ["Step Extra"])
+        for n in range(findings):
+            writer.writerow([f"Finding {n + 1}", "High", "7.5", "Description", "Impact", "10.0.0.1", "CWE-79",
+                             "https://example.com", "Fix it", "Mitigate", "Step 1: do it.", "Step 2: verify"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per scenario; the fastest counts (default: 5)")
+    parser.add_argument('--budget', action='append', default=[], metavar='SCENARIO=MS',
+                        help="Override a scenario's budget")
+    parser.add_argument('--output', default='import-benchmark.json')
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        scenario, _, ms = item.partition('=')
+        if scenario not in budgets:
+            parser.error(f"unknown scenario '{scenario}'; choose from {', '.join(budgets)}")
+        budgets[scenario] = float(ms)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, 'template.docx')
+        csv_path = os.path.join(tmp, 'findings.csv')
+        fixtures.build_template(template_path)
+        build_csv(csv_path)
+        app_env = {**os.environ, 'DOCGEN_JOBS_FOLDER': os.path.join(tmp, 'jobs'),
+                   'DOCGEN_LOG_LEVEL': 'WARNING'}
+        scenarios = {
+            'cli': ("import generate_document", None),
+            'csv_render': (f"import generate_document; "
+                           f"generate_document.render_report({csv_path!r}, {template_path!r})", None),
+            'app_cold': ("import app", {**app_env, 'DOCGEN_WARM_START': '0'}),
+            'app_warm': ("import app", {**app_env, 'DOCGEN_WARM_START': '1'}),
+        }
+
+        startup = {module for module, _, depth in run('pass') if depth == 0}
+        results = {}
+        failed = False
+        for name, (code, env) in scenarios.items():
+            runs = [measure(code, startup, env) for _ in range(args.repeat)]
+            ms = min(total for total, _ in runs)
+            loaded = runs[0][1]
+            forbidden = sorted(module for module in FORBIDDEN[name] if module in loaded)
+            over = budgets[name] is not None and ms > budgets[name]
+            failed = failed or over or bool(forbidden)
+            results[name] = {'import_ms': round(ms, 1), 'budget_ms': budgets[name], 'modules': len(loaded),
+                             'forbidden_loaded': forbidden, 'ok': not over and not forbidden}
+            budget = f"{budgets[name]:.0f} ms" if budgets[name] is not None else "none"
+            status = 'ok' if results[name]['ok'] else 'OVER BUDGET' if over else 'FORBIDDEN IMPORTS'
+            print(f"{name:12} {ms:8.1f} ms  budget {budget:>8}  {len(loaded):4d} modules  {status}"
+                  + (f" ({', '.join(forbidden)})" if forbidden else ""))
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'scenarios': results}, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Time regenerating a lightly edited report with and without the finding cache.
+
+Usage: python benchmarks/bench_incremental.py [--findings N] [--edits N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from openpyxl import load_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+from generate_document import render_report  # noqa: E402
+
+
+def timed_render(*args, **kwargs):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        report = render_report(*args, **kwargs)
+        return report, time.perf_counter() - start
+
+
+def document_xml(report):
+    with zipfile.ZipFile(io.BytesIO(report)) as package:
+        return package.read('word/document.xml')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--findings', type=int, default=300)
+    parser.add_argument('--edits', type=int, default=2, help="Rows changed between the two runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        excel_path = os.path.join(workdir, 'findings.xlsx')
+        template_path = os.path.join(workdir, 'template.docx')
+        cache_dir = os.path.join(workdir, 'fragments')
+        fixtures.build_template(template_path)
+        images = fixtures.build_images(os.path.join(workdir, 'shots'), count=2)
+        fixtures.build_workbook(excel_path, args.findings, images)
+
+        _, cold = timed_render(excel_path, template_path, fragment_cache=cache_dir)
+
+        wb = load_workbook(excel_path)
+        for n in range(args.edits):
+            row = 2 + n * max(1, args.findings // max(1, args.edits))
+            wb.active.cell(row=row, column=4).value = f"Edited description {n}"
+        wb.save(excel_path)
+
+        full, full_time = timed_render(excel_path, template_path)
+        incremental, incremental_time = timed_render(excel_path, template_path, fragment_cache=cache_dir)
+
+    print(f"cold run (fills cache) {cold:7.2f} s")
+    print(f"full render            {full_time:7.2f} s")
+    print(f"incremental render     {incremental_time:7.2f} s   ({args.edits} of {args.findings} rows changed)")
+    print(f"identical document.xml: {document_xml(full) == document_xml(incremental)}")
+
+
+if __name__ == '__main__':
+    main()
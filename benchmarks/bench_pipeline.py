@@ -0,0 +1,203 @@
+"""Measure each stage of the report pipeline on synthetic workbooks of several sizes.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 10,500,5000] [--image-columns M]
+           [--image-size 1920x1080] [--output results.json]
+
+Each size runs in a fresh process. For every stage (workbook load, template
+load, image processing, table rendering, image embedding, save) the wall
+time, CPU time (all threads) and peak RSS are written to a JSON file, so
+runs can be compared to catch regressions and to size render workers.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+
+STAGES = ('workbook_load', 'template_load', 'image_processing', 'table_rendering', 'image_embedding', 'save')
+
+
+def current_rss():
+    """Resident set size of this process in bytes (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageRecorder:
+    """Collect wall time, CPU time and peak RSS per named stage."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.results = {}
+        self.peak = 0
+        self.sampling = False
+
+    def _sample(self):
+        while self.sampling:
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.peak = current_rss()
+        self.sampling = True
+        sampler = threading.Thread(target=self._sample, daemon=True)
+        sampler.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self.sampling = False
+            sampler.join()
+            self.peak = max(self.peak, current_rss())
+            self.results[name] = {'wall_seconds': wall, 'cpu_seconds': cpu,
+                                  'peak_rss_mb': self.peak / (1024 * 1024)}
+
+    def split(self, name, part, wall, cpu):
+        """Move `wall`/`cpu` seconds measured inside stage `name` into their own stage `part`."""
+        whole = self.results[name]
+        whole['wall_seconds'] -= wall
+        whole['cpu_seconds'] -= cpu
+        self.results[part] = {'wall_seconds': wall, 'cpu_seconds': cpu, 'peak_rss_mb': whole['peak_rss_mb']}
+
+
+def run_size(findings, options):
+    """Build the inputs for `findings` rows and measure each pipeline stage (runs in a child process)."""
+    from generate_document import (WRITERS, detach_matching_table, image_references, load_findings,
+                                   load_template, prepare_cells, render_finding, table_layout)
+    from image_pipeline import ImagePipeline
+    from poc_parser import parse_poc
+
+    with tempfile.TemporaryDirectory() as workdir:
+        excel_path = os.path.join(workdir, 'findings.xlsx')
+        template_path = os.path.join(workdir, 'template.docx')
+        fixtures.build_template(template_path)
+        image_paths = []
+        if options['image_columns']:
+            image_paths = fixtures.build_images(os.path.join(workdir, 'shots'), options['unique_images'],
+                                                options['image_size'])
+        fixtures.build_workbook(excel_path, findings, image_paths, image_columns=options['image_columns'],
+                                poc_steps=options['poc_steps'], poc_lines=options['poc_lines'])
+
+        recorder = StageRecorder()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            with recorder.stage('workbook_load'):
+                rows, excel_columns_normalized, additional_columns = load_findings(excel_path)
+                rows = [(row, severity_hex, parse_poc(row, additional_columns)) for row, severity_hex in rows]
+
+            with recorder.stage('template_load'):
+                doc = load_template(template_path)
+                row_headers, parent, following_elements = detach_matching_table(doc, excel_columns_normalized)
+
+            images = ImagePipeline(target_dpi=options['image_dpi'], image_format=options['image_format'])
+            with recorder.stage('image_processing'):
+                references = [path for _, _, poc in rows for path in image_references(poc)]
+                for path in references:
+                    images.submit(path)
+                for path in references:
+                    images.get(path)
+            images.close()
+
+            # Time add_picture separately from the rest of the table
+            writer = WRITERS[options['backend']](doc)
+            embedding = {'wall': 0.0, 'cpu': 0.0}
+            add_picture = writer.add_picture
+
+            def timed_add_picture(*args):
+                wall, cpu = time.perf_counter(), time.process_time()
+                add_picture(*args)
+                embedding['wall'] += time.perf_counter() - wall
+                embedding['cpu'] += time.process_time() - cpu
+            writer.add_picture = timed_add_picture
+
+            with recorder.stage('table_rendering'):
+                layout = table_layout(row_headers, excel_columns_normalized)
+                for idx, (row, severity_hex, poc) in enumerate(rows):
+                    render_finding(writer, idx, prepare_cells(row, layout), severity_hex, poc, images)
+                    doc.add_page_break()
+                for elem in following_elements:
+                    parent.append(elem)
+            recorder.split('table_rendering', 'image_embedding', embedding['wall'], embedding['cpu'])
+
+            with recorder.stage('save'):
+                buffer = io.BytesIO()
+                doc.save(buffer)
+
+    return {
+        'findings': findings,
+        'images': len(references),
+        'output_bytes': len(buffer.getvalue()),
+        'stages': {name: recorder.results[name] for name in STAGES},
+        'total_wall_seconds': sum(stage['wall_seconds'] for stage in recorder.results.values()),
+        'max_rss_mb': max(stage['peak_rss_mb'] for stage in recorder.results.values()),
+    }
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,500,5000', help="Comma-separated finding counts")
+    parser.add_argument('--image-columns', type=int, default=1, help="Image columns per finding (0 for none)")
+    parser.add_argument('--unique-images', type=int, default=20, help="Distinct PNGs the image columns cycle through")
+    parser.add_argument('--image-size', type=parse_size, default=(1920, 1080), help="PNG resolution, WIDTHxHEIGHT")
+    parser.add_argument('--image-dpi', type=int, default=150)
+    parser.add_argument('--image-format', default='keep')
+    parser.add_argument('--poc-steps', type=int, default=8)
+    parser.add_argument('--poc-lines', type=int, default=4)
+    parser.add_argument('--backend', default='fragments')
+    parser.add_argument('--output', default='pipeline-benchmark.json', help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    options = {
+        'image_columns': args.image_columns, 'unique_images': args.unique_images, 'image_size': args.image_size,
+        'image_dpi': args.image_dpi, 'image_format': args.image_format, 'poc_steps': args.poc_steps,
+        'poc_lines': args.poc_lines, 'backend': args.backend,
+    }
+    # A fresh process per size, so peak RSS is not carried over from the previous run
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for findings in (int(size) for size in args.sizes.split(',')):
+        with context.Pool(1) as pool:
+            result = pool.apply(run_size, (findings, options))
+        runs.append(result)
+        print(f"{findings:>6} findings  {result['total_wall_seconds']:8.2f} s  peak {result['max_rss_mb']:7.1f} MB")
+        for name, stage in result['stages'].items():
+            print(f"         {name:<17} {stage['wall_seconds']:8.2f} s wall {stage['cpu_seconds']:8.2f} s cpu "
+                  f"{stage['peak_rss_mb']:8.1f} MB")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': {**options, 'image_size': list(args.image_size)},
+        'runs': runs,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compare the previous per-column POC parsing loop with poc_parser.parse_poc on long narratives.
+
+Usage: python benchmarks/bench_poc_parser.py [--rows N] [--steps N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from poc_parser import parse_poc  # noqa: E402
+from workbook_reader import cell_text  # noqa: E402
+
+COLUMNS = ["Proof of Concept", "Image 1", "Step Extra", "Notes", "Image 2"]
+
+
+def legacy_parse(row, additional_columns):
+    """The loop render_finding used before poc_parser, collecting items instead of rendering them."""
+    items = []
+    step_counter = 1
+    for col_idx, col_name in enumerate(additional_columns):
+        col_value = str(row.get(col_name, '')).strip()
+        is_image = any(col_value.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
+        is_step = re.search(r'Step\s*\d+:|\bstep\b', col_value, flags=re.IGNORECASE)
+        if col_idx == 0 or is_step:
+            if col_idx == 0 and not (col_value and col_value.lower() != 'nan'):
+                continue
+            steps = re.split(r'(Step\s*\d+:)', col_value, flags=re.IGNORECASE)
+            step_dict = {}
+            current_step = None
+            for part in steps:
+                part = part.strip()
+                if re.match(r'Step\s*\d+:', part, flags=re.IGNORECASE):
+                    current_step = part
+                    step_dict[current_step] = ""
+                elif current_step and part:
+                    step_dict[current_step] += part
+            if not step_dict:
+                items.append(('step', f"Step{step_counter}:", col_value))
+                step_counter += 1
+            else:
+                for step_name, step_content in step_dict.items():
+                    items.append(('step', step_name, step_content))
+                    step_counter += 1
+        elif is_image:
+            items.extend(('image', p.strip()) for p in col_value.split(",") if p.strip())
+        else:
+            items.append(('step', f"Step{step_counter}:", col_value))
+            step_counter += 1
+    return items
+
+
+def build_rows(count, steps, seed=1):
+    """Rows with long multi-step narratives, plus the odd edge case (no labels, NaN, repeated labels)."""
+    rng = random.Random(seed)
+    words = "open the login page submit payload observe response token header cookie session".split()
+    rows = []
+    for n in range(count):
+        narrative = " ".join(
+            f"{rng.choice(['Step', 'step', 'STEP '])}{s}: " + " ".join(rng.choices(words, k=40))
+            for s in range(1, steps + 1))
+        rows.append({
+            "Proof of Concept": rng.choice([narrative, narrative, "no labels here", float('nan'),
+                                            "Step 1: a Step 1: b"]),
+            "Image 1": rng.choice(["shots/a.png, shots/b.jpg", "shot.PNG", "", "notes.txt"]),
+            "Step Extra": rng.choice(["Step 9: verify", "see the next step", "plain text"]),
+            "Notes": rng.choice([float('nan'), "free text"]),
+            "Image 2": "shots/c.jpeg",
+        })
+    return rows
+
+
+def best_of(repeat, parse, rows):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            parse(row, COLUMNS)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=25, help="Steps per POC narrative")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows, args.steps)
+    legacy = best_of(args.repeat, legacy_parse, rows)
+    compiled = best_of(args.repeat, parse_poc, rows)
+    # Empty and NaN cells used to come out as "StepN: nan" or empty steps; parse_poc skips them
+    filled = [row for row in rows if all(cell_text(row.get(col)) for col in COLUMNS)]
+    same = all(legacy_parse(row, COLUMNS) == parse_poc(row, COLUMNS) for row in filled)
+
+    print(f"legacy loop  {legacy * 1000:8.1f} ms   {args.rows / legacy:10.0f} rows/s")
+    print(f"parse_poc    {compiled * 1000:8.1f} ms   {args.rows / compiled:10.0f} rows/s")
+    print(f"speedup      {legacy / compiled:.2f}x")
+    print(f"identical items: {same} ({len(filled)} rows without empty cells)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compare per-request latency of the old subprocess path with the in-process render API.
+
+Usage: python benchmarks/bench_render_api.py [--findings N] [--requests N]
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+from generate_document import render_report, run_next_script, warm_up  # noqa: E402
+
+
+def time_subprocess(excel_path, template_path, requests):
+    """Time one `python generate_document.py` run per request, as app.py used to do."""
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, 'generate_document.py'), excel_path, template_path],
+            check=True, capture_output=True, text=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_in_process(excel_path, template_path, requests):
+    """Time render_report calls in an already warmed-up process."""
+    warm_up()
+    timings = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(requests):
+            start = time.perf_counter()
+            report = render_report(excel_path, template_path)
+            with open('Final_output.docx', 'wb') as f:
+                f.write(report)
+            run_next_script()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(label, timings):
+    print(f"{label:<12} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"median {statistics.median(timings) * 1000:8.1f} ms   n={len(timings)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--findings', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        excel_path = os.path.join(workdir, 'findings.xlsx')
+        template_path = os.path.join(workdir, 'template.docx')
+        fixtures.build_template(template_path)
+        fixtures.build_workbook(excel_path, args.findings)
+
+        subprocess_timings = time_subprocess(excel_path, template_path, args.requests)
+        in_process_timings = time_in_process(excel_path, template_path, args.requests)
+        os.chdir(ROOT)
+
+    summarize('subprocess', subprocess_timings)
+    summarize('in-process', in_process_timings)
+    speedup = statistics.median(subprocess_timings) / statistics.median(in_process_timings)
+    print(f"speedup      {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compare the previous per-cell preparation in render_finding with table_layout + prepare_cells on wide sheets.
+
+Only the work done before the writer is measured: matching headers to
+columns, turning values into text and splitting them into paragraphs.
+
+Usage: python benchmarks/bench_row_prep.py [--rows N] [--columns N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_document import prepare_cells, table_layout  # noqa: E402
+from styling import format_text_with_bullets  # noqa: E402
+
+
+def legacy_prepare(row, row_headers, excel_columns_normalized):
+    """The per-cell steps render_finding took before prepare_cells, collecting paragraphs instead of writing them."""
+    cells = []
+    for i, header in enumerate(row_headers):
+        if header.lower() == "proof of concept":
+            continue
+        excel_header = excel_columns_normalized.get(header.strip().lower(), header)
+        text_value = str(row.get(excel_header, "")).strip()
+        if i < 2:
+            cells.append((i, header, text_value, ()))
+            continue
+        apply_bullets = i >= 8
+        if '\n' in text_value:
+            lines = format_text_with_bullets(text_value, apply_bullets).split('\n')
+            if apply_bullets:
+                paragraphs = [('bullet' if line_idx > 0 else 'body', line, None) for line_idx, line in enumerate(lines)]
+            else:
+                paragraphs = [('body', lines[0], None)] + [('line', line, None) for line in lines[1:]]
+        else:
+            paragraphs = [('body', text_value, 11)]
+        cells.append((i, header, text_value, paragraphs))
+    return cells
+
+
+def build_rows(count, columns, seed=1):
+    """A header list like a template's and rows with a mix of short, multi-line and empty values."""
+    rng = random.Random(seed)
+    words = "injection header token session cookie response payload endpoint parameter".split()
+    row_headers = ["Title", "Severity"] + [f"Field {n}" for n in range(columns - 3)] + ["Proof of Concept"]
+    excel_columns_normalized = {header.lower(): header for header in row_headers}
+    rows = []
+    for _ in range(count):
+        row = {}
+        for header in row_headers[:-1]:
+            row[header] = rng.choice([
+                " ".join(rng.choices(words, k=12)),
+                "\n".join(" ".join(rng.choices(words, k=6)) for _ in range(4)),
+                float('nan'),
+                rng.randint(1, 10),
+            ])
+        rows.append(row)
+    return row_headers, excel_columns_normalized, rows
+
+
+def best_of(repeat, prepare, rows):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prepare(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--columns', type=int, default=20, help="Template rows per finding")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    row_headers, excel_columns_normalized, rows = build_rows(args.rows, args.columns)
+
+    def legacy(rows):
+        for row in rows:
+            legacy_prepare(row, row_headers, excel_columns_normalized)
+
+    def prepared(rows):
+        layout = table_layout(row_headers, excel_columns_normalized)
+        for row in rows:
+            prepare_cells(row, layout)
+
+    before = best_of(args.repeat, legacy, rows)
+    after = best_of(args.repeat, prepared, rows)
+
+    print(f"legacy per-cell  {before * 1000:8.1f} ms   {args.rows / before:10.0f} rows/s")
+    print(f"prepare_cells    {after * 1000:8.1f} ms   {args.rows / after:10.0f} rows/s")
+    print(f"speedup          {before / after:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
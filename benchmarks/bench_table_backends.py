@@ -0,0 +1,59 @@
+"""Compare tables-per-second and document.xml size of the table backends.
+
+Usage: python benchmarks/bench_table_backends.py [--findings N] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+from generate_document import WRITERS, render_report  # noqa: E402
+
+
+def document_xml(report):
+    with zipfile.ZipFile(io.BytesIO(report)) as package:
+        return package.read('word/document.xml')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--findings', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        excel_path = os.path.join(workdir, 'findings.xlsx')
+        template_path = os.path.join(workdir, 'template.docx')
+        fixtures.build_template(template_path)
+        fixtures.build_workbook(excel_path, args.findings)
+
+        results = {}
+        outputs = {}
+        for backend in sorted(WRITERS):
+            best = None
+            for _ in range(args.repeat):
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    report = render_report(excel_path, template_path, backend=backend)
+                    elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[backend] = best
+            outputs[backend] = document_xml(report)
+
+    for backend, elapsed in results.items():
+        print(f"{backend:<10} {elapsed:7.2f} s   {args.findings / elapsed:8.1f} tables/s   "
+              f"document.xml {len(outputs[backend]) / 1024:8.0f} KB")
+    print(f"speedup    {results['docx'] / results['fragments']:.2f}x")
+    print(f"identical document.xml: {outputs['docx'] == outputs['fragments']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Build small synthetic inputs (workbook, template, images) for benchmarks."""
+import os
+
+from docx import Document
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+ROW_HEADERS = [
+    "Title", "Severity", "CVSS Score", "Description", "Impact",
+    "Affected Hosts", "CWE", "References", "Recommendation", "Mitigation",
+    "Proof of Concept",
+]
+SEVERITY_FILLS = {"Critical": "C00000", "High": "FF0000", "Medium": "FFC000", "Low": "92D050"}
+
+
+def build_template(template_path):
+    """Write a .docx template with a findings table and some trailing content."""
+    doc = Document()
+    doc.add_paragraph("Findings")
+    table = doc.add_table(rows=len(ROW_HEADERS), cols=1)
+    for i, header in enumerate(ROW_HEADERS):
+        table.cell(i, 0).text = header
+    doc.add_paragraph("Appendix")
+    doc.save(template_path)
+
+
+def build_workbook(excel_path, findings=10, image_paths=(), image_columns=None, poc_steps=3, poc_lines=1):
+    """Write an .xlsx workbook with colored Severity cells and POC columns.
+
+    By default all `image_paths` go into one "Image 1" column. With
+    `image_columns` M, there are M image columns holding one image each,
+    cycling through `image_paths`. Each POC has `poc_steps` steps of
+    `poc_lines` lines.
+    """
+    wb = Workbook()
+    ws = wb.active
+    image_headers = [f"Image {j + 1}" for j in range(image_columns or 1)]
+    ws.append(ROW_HEADERS + image_headers + ["Step Extra", "Notes"])
+    severities = list(SEVERITY_FILLS)
+    for n in range(findings):
+        severity = severities[n % len(severities)]
+        poc = " ".join(
+            f"Step {s}: " + "\n".join(f"do thing {s}.{line} for finding {n}." for line in range(1, poc_lines + 1))
+            if poc_lines > 1 else f"Step {s}: do thing {s} for finding {n}."
+            for s in range(1, poc_steps + 1))
+        if image_columns:
+            images = [image_paths[(n * image_columns + j) % len(image_paths)] if image_paths else ""
+                      for j in range(image_columns)]
+        else:
+            images = [", ".join(image_paths)]
+        ws.append([
+            f"Finding {n + 1}", severity, "7.5", f"Description of finding {n + 1}",
+            "Impact text", "10.0.0.1\n10.0.0.2", "CWE-79",
+            "https://example.com/a\nhttps://example.com/b", "Fix it\nPatch\nUpgrade",
+            "Mitigate", poc, *images, "Step 4: verify", "free text",
+        ])
+        fill = PatternFill("solid", fgColor="FF" + SEVERITY_FILLS[severity])
+        ws.cell(row=n + 2, column=2).fill = fill
+    wb.save(excel_path)
+
+
+def build_images(image_dir, count=2, size=(1920, 1080)):
+    """Write `count` PNG screenshots under `image_dir` and return their paths."""
+    from PIL import Image
+
+    os.makedirs(image_dir, exist_ok=True)
+    paths = []
+    for n in range(count):
+        path = os.path.join(image_dir, f"shot{n + 1}.png")
+        Image.new("RGB", size, (40 * n % 255, 120, 200)).save(path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction is still safe, just not serialized across processes
+    fcntl = None
+
+
+def sha256_file(path, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 of a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """A content-addressed on-disk cache with a size limit and LRU eviction.
+
+    Entries are files named after their key under `directory`. Writes go to a
+    temporary file and are renamed into place, so readers in other processes
+    only ever see complete entries. Reads refresh the file's mtime, which is
+    what eviction orders by; eviction itself holds an exclusive lock file so
+    concurrent workers don't evict the same entries twice.
+
+    The directory is only rescanned when this process's running estimate of
+    the cache size goes over the limit, so puts stay cheap.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(directory, '.lock')
+        self.estimated_bytes = self.size()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key):
+        # Fan out into subdirectories so no single directory grows too large
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Return the cached bytes for `key`, or None."""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.touch(path)
+        self.hits += 1
+        return data
+
+    def get_path(self, key):
+        """Return the path of the cached entry for `key` (refreshing it), or None."""
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.touch(path)
+        self.hits += 1
+        return path
+
+    def put(self, key, data):
+        """Store `data` under `key` and evict old entries if over the size limit."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.added(len(data))
+        return path
+
+    def put_file(self, key, source_path):
+        """Move `source_path` into the cache under `key` (same filesystem) and return the entry path."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = os.path.getsize(source_path)
+        os.replace(source_path, path)
+        self.touch(path)
+        self.added(size)
+        return path
+
+    def add_file(self, key, source_path):
+        """Store `source_path` under `key`, leaving it in place: hard-linked where possible, else copied."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        os.close(fd)
+        try:
+            os.remove(tmp_path)  # Only the unique name is needed; link() wants it free
+            try:
+                os.link(source_path, tmp_path)
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.touch(path)
+        self.added(os.path.getsize(path))
+        return path
+
+    def added(self, size):
+        self.estimated_bytes += size
+        if self.estimated_bytes > self.max_bytes:
+            self.evict()
+
+    def touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # Evicted by another process in the meantime
+
+    def entries(self):
+        """Return (mtime, size, path) for every entry, oldest first."""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with open(self.lock_path, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                entries = self.entries()
+                total = sum(size for _, size, _ in entries)
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                self.estimated_bytes = total
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'max_bytes': self.max_bytes}
+
+
+def cache_key(*parts):
+    """Combine key parts (content hashes, parameters) into one cache key."""
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
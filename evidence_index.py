@@ -0,0 +1,106 @@
+"""Index of the screenshots available to one render, for resolving the sheet's image references.
+
+The index is built once per job from the list of evidence files (the
+upload's saved paths, or one directory walk) and answers every reference
+from memory: an exact match first, then a case-insensitive one, then a
+unique file with the same name anywhere in the evidence. References that
+match several files are ambiguous and, like missing ones, are not embedded.
+After the render, report() lists what was unresolved and what was unused.
+"""
+import os
+
+from image_pipeline import IMAGE_EXTENSIONS
+
+# How a reference was resolved
+EXACT = 'exact'
+CASE = 'case'  # Differs only in upper/lower case
+BASENAME = 'basename'  # Same file name, other folder
+AMBIGUOUS = 'ambiguous'
+MISSING = 'missing'
+
+
+def normalize(reference):
+    """A reference or evidence path as a relative, '/'-separated path."""
+    path = os.path.normpath(reference.strip().replace('\\', '/')).replace(os.sep, '/')
+    return '' if path == '.' else path
+
+
+class EvidenceIndex:
+    """The evidence files of one render by path, lower-cased path and lower-cased file name.
+
+    `paths` are relative to the directory the sheet's references are
+    relative to (the job workspace, or the working directory).
+    """
+
+    def __init__(self, paths):
+        self.paths = set()
+        self.by_lower = {}
+        self.by_name = {}
+        for path in paths:
+            path = normalize(path)
+            if not path.lower().endswith(IMAGE_EXTENSIONS) or path in self.paths:
+                continue
+            self.paths.add(path)
+            self.by_lower.setdefault(path.lower(), []).append(path)
+            self.by_name.setdefault(path.rsplit('/', 1)[-1].lower(), []).append(path)
+        self.lookups = {}  # reference -> (path, how, candidates), so repeated references cost one dict hit
+
+    @classmethod
+    def scan(cls, root, folder=''):
+        """Index the images under `folder` of `root` with one directory walk; paths are relative to `root`."""
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, folder)):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            paths.extend(os.path.relpath(os.path.join(dirpath, name), root) for name in filenames)
+        return cls(paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def lookup(self, reference):
+        """Resolve a reference: (path, how, candidates), where `path` is None when it is ambiguous or missing.
+
+        `candidates` are the evidence paths an ambiguous reference matches.
+        """
+        match = self.lookups.get(reference)
+        if match is None:
+            match = self.lookups[reference] = self.match(normalize(reference))
+        return match
+
+    def match(self, path):
+        if path in self.paths:
+            return path, EXACT, ()
+        for how, candidates in ((CASE, self.by_lower.get(path.lower(), ())),
+                                (BASENAME, self.by_name.get(path.rsplit('/', 1)[-1].lower(), ()))):
+            if len(candidates) == 1:
+                return candidates[0], how, ()
+            if candidates:
+                return None, AMBIGUOUS, tuple(sorted(candidates))
+        return None, MISSING, ()
+
+    def explain(self, reference):
+        """Why a reference was not resolved, for log messages."""
+        _, how, candidates = self.lookup(reference)
+        if how == AMBIGUOUS:
+            return f"it matches {len(candidates)} images: {', '.join(candidates)}"
+        return "no evidence image matches it"
+
+    def report(self, lookups):
+        """Summarize the `lookups` of a render ({reference: (path, how, candidates)}) against the evidence.
+
+        Returns the number of 'images' in the evidence and of 'references',
+        the references 'resolved' by case or file name only (with the path
+        used), those 'ambiguous' (with their candidates) or 'unresolved',
+        and the evidence files no reference used.
+        """
+        used = {path for path, _, _ in lookups.values() if path is not None}
+        return {
+            'images': len(self.paths),
+            'references': len(lookups),
+            'resolved': {reference: path for reference, (path, how, _) in sorted(lookups.items())
+                         if how in (CASE, BASENAME)},
+            'ambiguous': {reference: list(candidates) for reference, (_, how, candidates) in sorted(lookups.items())
+                          if how == AMBIGUOUS},
+            'unresolved': sorted(reference for reference, (_, how, _) in lookups.items() if how == MISSING),
+            'unused': sorted(self.paths - used),
+        }
@@ -0,0 +1,81 @@
+import os
+import re
+import shutil
+import tempfile
+
+from disk_cache import DiskCache, cache_key
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def link_or_copy(source_path, target_path):
+    """Hard-link `source_path` to `target_path`, copying when linking is not possible."""
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+class EvidenceStore:
+    """Uploaded screenshots kept by owner and SHA-256, shared by that owner's jobs.
+
+    Clients send a manifest of content hashes before uploading (see
+    /uploads/manifest) and then only upload the files the store does not
+    have yet; the rest are linked into the job workspace from here. Every
+    entry belongs to the `owner` (a client or team) that uploaded it, and a
+    hash only resolves to content the same owner uploaded: knowing the hash
+    of someone else's screenshot neither retrieves it nor reveals that it
+    was ever uploaded. Entries are hard links to the uploaded copy where the
+    filesystem allows, and the store is a DiskCache, so it stays under
+    `max_bytes` by evicting the least recently used evidence.
+    """
+
+    def __init__(self, directory, max_bytes=4 * 1024 * 1024 * 1024):
+        self.cache = DiskCache(directory, max_bytes)
+
+    @staticmethod
+    def key(owner, sha256):
+        return cache_key('evidence', owner, sha256)
+
+    def has(self, owner, sha256):
+        return bool(owner and SHA256_PATTERN.match(sha256)) and os.path.exists(
+            self.cache.path_for(self.key(owner, sha256)))
+
+    def missing(self, owner, hashes):
+        """Return the hashes in `hashes` that `owner` has not stored."""
+        return {sha256 for sha256 in hashes if not self.has(owner, sha256)}
+
+    def add(self, owner, path, sha256):
+        """Add the file at `path` (whose content hash is `sha256`) for `owner` unless it is already stored."""
+        if not owner:
+            return
+        entry_path = self.cache.path_for(self.key(owner, sha256))
+        if self.has(owner, sha256):
+            self.cache.touch(entry_path)
+            return
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # Link under a temporary name first so other jobs never see a partial copy
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), prefix='.tmp-')
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            link_or_copy(path, tmp_path)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.cache.added(os.path.getsize(entry_path))
+
+    def materialize(self, owner, sha256, target_path):
+        """Place the file `owner` stored for `sha256` at `target_path`; False if they have not stored it."""
+        if not owner or not SHA256_PATTERN.match(sha256):
+            return False
+        entry_path = self.cache.get_path(self.key(owner, sha256))
+        if entry_path is None:
+            return False
+        try:
+            link_or_copy(entry_path, target_path)
+        except OSError:
+            return False  # Evicted in the meantime
+        return True
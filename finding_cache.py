@@ -0,0 +1,178 @@
+import hashlib
+import io
+import json
+import os
+import re
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+from disk_cache import DiskCache, cache_key, sha256_file
+
+# python-docx names each inline picture after its drawing ID
+PICTURE_NAME = re.compile(r'^Picture \d+$')
+
+
+class FindingCache:
+    """Cache of rendered finding tables, for incremental regeneration.
+
+    Each finding is fingerprinted from everything its table is rendered
+    from: the row's cell values, its severity color, the content hashes of
+    the screenshots it embeds and `context` (template headers, column
+    layout, backend, image settings, engine version). The body elements
+    render_finding produced after the title are stored as XML under that
+    fingerprint, together with the embedded image bytes and the definitions
+    of the styles they reference. A later run with the same fingerprint
+    splices the stored XML into the new document instead of rendering it.
+
+    Image relationship IDs and drawing IDs are reassigned on splice, so the
+    result is the same document a full render would have produced.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, context=(), known_hashes=None):
+        self.cache = DiskCache(directory, max_bytes)
+        self.context = cache_key(*context)
+        self.known_hashes = {os.path.normpath(path): sha256 for path, sha256 in (known_hashes or {}).items()}
+        self.next_drawing_id = None  # Running part.next_id between consecutive splices
+        self.reused = 0
+        self.rendered = 0
+
+    def image_hash(self, path):
+        """SHA-256 of the image at `path`, or None if it cannot be read."""
+        key = os.path.normpath(path)
+        if key not in self.known_hashes:
+            try:
+                self.known_hashes[key] = sha256_file(path)
+            except OSError:
+                self.known_hashes[key] = None
+        return self.known_hashes[key]
+
+    def fingerprint(self, row, severity_hex, image_paths):
+        # Paths are already part of the row values; hashing content only lets jobs with
+        # different workspaces share entries
+        images = [self.image_hash(path) for path in image_paths]
+        return cache_key(self.context, repr(list(row.items())), severity_hex, repr(images))
+
+    def lookup(self, key):
+        """Return the cached finding for `key` as (record, image blobs), or None."""
+        data = self.cache.get(key)
+        if data is None:
+            return None
+        record = json.loads(data)
+        blobs = []
+        for sha256 in record['images']:
+            blob = self.cache.get(cache_key('image', sha256))
+            if blob is None:
+                return None  # Image evicted since; render the finding again
+            blobs.append(blob)
+        return record, blobs
+
+    def mark(self, doc):
+        """Remember where the next finding's elements will start."""
+        return len(doc.element.body)
+
+    def store(self, key, doc, mark):
+        """Store the elements added to the body since `mark`, except the title paragraph."""
+        body = doc.element.body
+        offset = 1 if body.sectPr is not None else 0
+        record, blobs = capture(doc, list(body)[mark - offset + 1:len(body) - offset])
+        for sha256, blob in zip(record['images'], blobs):
+            image_key = cache_key('image', sha256)
+            if not os.path.exists(self.cache.path_for(image_key)):
+                self.cache.put(image_key, blob)
+        self.cache.put(key, json.dumps(record).encode('utf-8'))
+        self.next_drawing_id = None  # The render may have added drawings
+        self.rendered += 1
+
+    def splice(self, doc, cached):
+        """Insert a finding returned by lookup() at the end of the body; return the number of images."""
+        record, blobs = cached
+        self.next_drawing_id = insert(doc, record, blobs, self.next_drawing_id)
+        self.reused += 1
+        return len(blobs)
+
+    def summary(self):
+        return f"Findings: {self.reused} reused from cache, {self.rendered} rendered"
+
+
+def capture(doc, elements):
+    """Serialize body `elements` of `doc` so they can be inserted into another document.
+
+    Returns (record, blobs): the record holds the elements' XML with image
+    references replaced by indexes into `blobs`, the SHA-256 of each distinct
+    image ('images') and the definitions of the styles the elements use.
+    """
+    styles = {}
+    images = []
+    blobs = []
+    serialized = []
+    for element in elements:
+        element = etree.fromstring(etree.tostring(element))
+        for tag in ('w:pStyle', 'w:rStyle', 'w:tblStyle'):
+            for reference in element.iter(qn(tag)):
+                collect_style(doc.styles.element, reference.get(qn('w:val')), styles)
+        for blip in element.iter(qn('a:blip')):
+            blob = doc.part.related_parts[blip.get(qn('r:embed'))].blob
+            sha256 = hashlib.sha256(blob).hexdigest()
+            if sha256 not in images:
+                images.append(sha256)
+                blobs.append(blob)
+            blip.set(qn('r:embed'), str(images.index(sha256)))
+        serialized.append(etree.tostring(element).decode('utf-8'))
+    if styles:
+        # In the order the document defines them, so merged documents define them in the same order
+        order = {style.styleId: position for position, style in enumerate(doc.styles.element.style_lst)}
+        styles = dict(sorted(styles.items(), key=lambda item: order[item[0]]))
+    return {'elements': serialized, 'images': images, 'styles': styles}, blobs
+
+
+def insert(doc, record, blobs, next_drawing_id=None):
+    """Insert elements from capture() at the end of the body of `doc`.
+
+    Images are added to the document (python-docx stores identical images
+    once) and drawings are numbered as python-docx would have numbered them.
+    `next_drawing_id` is the running drawing ID returned by the previous
+    insert, if nothing else added drawings since; returns the next one.
+    """
+    styles = doc.styles.element
+    for style_id, xml in record['styles'].items():
+        if styles.get_by_id(style_id) is None:
+            styles.append(parse_xml(xml))
+
+    part = doc.part
+    rIds = [part.get_or_add_image(io.BytesIO(blob))[0] for blob in blobs]
+    body = doc.element.body
+    for xml in record['elements']:
+        element = parse_xml(xml)
+        for blip in element.iter(qn('a:blip')):
+            blip.set(qn('r:embed'), rIds[int(blip.get(qn('r:embed')))])
+        drawings = list(element.iter(qn('wp:docPr')))
+        for doc_pr in drawings:
+            doc_pr.set('id', '0')  # Stale IDs from the other document must not count towards next_id
+        if body.sectPr is not None:
+            body.sectPr.addprevious(element)
+        else:
+            body.append(element)
+        # Same numbering as part.next_id (highest ID + 1) without rescanning the document
+        # for every picture
+        for doc_pr in drawings:
+            if next_drawing_id is None:
+                next_drawing_id = part.next_id
+            doc_pr.set('id', str(next_drawing_id))
+            if PICTURE_NAME.match(doc_pr.get('name', '')):
+                doc_pr.set('name', f'Picture {next_drawing_id}')
+            next_drawing_id += 1
+    return next_drawing_id
+
+
+def collect_style(styles_element, style_id, styles):
+    """Add the XML of style `style_id` and the styles it is based on to `styles`, bases first."""
+    if style_id in styles:
+        return
+    style = styles_element.get_by_id(style_id)
+    if style is None:
+        return
+    if style.basedOn_val:
+        collect_style(styles_element, style.basedOn_val, styles)
+    styles[style_id] = etree.tostring(style).decode('utf-8')
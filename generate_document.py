@@ -1,418 +1,808 @@
-import pandas as pd
 from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from openpyxl import load_workbook
+from docx.shared import Inches
+import argparse
+import copy
+import importlib
+import io
+import logging
+import multiprocessing
 import os
 import subprocess
 import sys
-import re
-from styling import lighten_color, set_cell_shading, set_cell_margins, set_cell_border, set_table_borders, format_text_with_bullets
-
-# Get file paths from command-line arguments
-if len(sys.argv) != 3:
-    print("Usage: python generate_document.py <excel_path> <template_path>")
-    sys.exit(1)
-
-excel_path = sys.argv[1]  # Single Excel sheet
-template_path = sys.argv[2]
-output_file = "Final_output.docx"  # Output file path
-
-# Step 1: Load Excel and extract severity colors
-try:
-    wb = load_workbook(excel_path, data_only=True)
-    ws = wb.active
-except FileNotFoundError:
-    print(f"Error: Excel file '{excel_path}' not found.")
-    sys.exit(1)
-
-# Get headers and map severity column
-headers = [cell.value for cell in ws[1] if cell.value is not None]
-header_lookup = {str(val).strip().lower(): idx for idx, val in enumerate(headers)}
-if "severity" not in header_lookup:
-    print("Error: 'Severity' column not found in the Excel header.")
-    sys.exit(1)
-severity_col_index = header_lookup["severity"] + 1  # 1-based for openpyxl
-
-# Map row index to severity fill color (in hex)
-severity_colors = {}
-for row in ws.iter_rows(min_row=2):
-    row_idx = row[0].row
-    severity_cell = ws.cell(row=row_idx, column=severity_col_index)
-    fill = severity_cell.fill
-    if fill and fill.fgColor and fill.fgColor.type == 'rgb':
-        severity_colors[row_idx - 2] = fill.fgColor.rgb[-6:]  # Get RRGGBB from AARRGGBB
-
-# Step 2: Load Excel data with pandas
-try:
-    df = pd.read_excel(excel_path)
-except FileNotFoundError:
-    print(f"Error: Excel file '{excel_path}' not found.")
-    sys.exit(1)
-
-# Normalize Excel column names for case-insensitive matching
-excel_columns = df.columns.tolist()
-excel_columns_normalized = {str(col).strip().lower(): col for col in excel_columns}
-
-# Identify columns from "Proof of Concept" onwards
-poc_index = None
-for idx, col in enumerate(excel_columns):
-    if str(col).strip().lower() == "proof of concept":
-        poc_index = idx
-        break
-
-if poc_index is None:
-    print("Error: 'Proof of Concept' column not found in the Excel sheet.")
-    sys.exit(1)
-
-# Get all columns from "Proof of Concept" to the end
-additional_columns = excel_columns[poc_index:]
-
-# Step 3: Load Word template
-try:
-    doc = Document(template_path)
-except FileNotFoundError:
-    print(f"Error: Word template '{template_path}' not found.")
-    sys.exit(1)
-
-# Set page margins
-for section in doc.sections:
-    section.top_margin = Inches(1)
-    section.bottom_margin = Inches(1)
-    section.left_margin = Inches(1)
-    section.right_margin = Inches(1)
-
-# Step 4: Find matching table in template
-tables = doc.tables
-matching_table = None
-for table in tables:
-    if table.cell(0, 0).text.strip().lower() in excel_columns_normalized:
-        matching_table = table
-        break
-
-if not matching_table:
-    print("Error: No matching table found in the template.")
-    sys.exit(1)
-
-# Save trailing content
-tbl_elm = matching_table._element
-parent = tbl_elm.getparent()
-index_in_body = list(parent).index(tbl_elm)
-following_elements = list(parent)[index_in_body + 1:]
-parent.remove(tbl_elm)
-
-# Get headers from matching table
-row_headers = [row.cells[0].text.strip() for row in matching_table.rows]
-
-# Step 5: Generate content per row
-for idx, row in df.iterrows():
+import time
+from workbook_reader import cell_text
+from input_readers import InputError, load_parquet, open_input, parse_severity_colors
+from image_pipeline import DISPLAY_WIDTH_INCHES, IMAGE_EXTENSIONS, IMAGE_FORMATS, PIPELINE_VERSION, ImagePipeline, \
+    load_pil
+from finding_cache import FindingCache, capture, insert
+from poc_parser import parse_poc
+from styling import lighten_color, format_text_with_bullets, DocxWriter
+from ooxml_fragments import FragmentWriter
+from style_registry import StyledWriter
+from streaming_docx import StreamingDocx
+from preflight import preflight
+from evidence_index import EvidenceIndex
+from metrics import span
+from post_processing import resolve, run_post_processors
+
+OUTPUT_FILE = "Final_output.docx"  # Output file path used by the CLI and the web app
+NEXT_SCRIPT = "table_update.py"  # Legacy post-processing script, run after saving when asked for
+ENGINE_VERSION = 4  # Bump when the report for the same inputs changes, to invalidate cached findings and reports
+
+logger = logging.getLogger('docgen')
+
+
+# Table rendering backends; "docx" is the reference implementation on top of styling.py
+WRITERS = {
+    'docx': DocxWriter,
+    'fragments': FragmentWriter,
+    'styles': StyledWriter,  # Named styles instead of inline formatting; smaller document.xml
+}
+
+
+class ReportError(Exception):
+    """Raised when the workbook or template cannot be turned into a report."""
+
+
+def load_findings(excel_path, severity_colors=None):
+    """Steps 1-2: Stream the Excel sheet (or export) and locate the "Proof of Concept" columns.
+
+    Cell values and Severity fill colors are read together in one read-only
+    pass (see workbook_reader.open_findings). CSV, JSON Lines and Parquet
+    exports are read by their extension instead, with Severity colors from
+    `severity_colors` (see input_readers). Returns the row generator, the
+    normalized column lookup and the list of columns from "Proof of Concept"
+    to the end of the sheet.
+    """
+    try:
+        excel_columns, rows = open_input(excel_path, severity_colors=severity_colors)
+    except FileNotFoundError:
+        raise ReportError(f"Excel file '{excel_path}' not found.")
+    except KeyError:
+        raise ReportError("'Severity' column not found in the Excel header.")
+    except InputError as e:
+        raise ReportError(str(e))
+
+    # Normalize Excel column names for case-insensitive matching
+    excel_columns_normalized = {str(col).strip().lower(): col for col in excel_columns}
+
+    # Identify columns from "Proof of Concept" onwards
+    poc_index = None
+    for idx, col in enumerate(excel_columns):
+        if str(col).strip().lower() == "proof of concept":
+            poc_index = idx
+            break
+
+    if poc_index is None:
+        rows.close()
+        raise ReportError("'Proof of Concept' column not found in the Excel sheet.")
+
+    # Get all columns from "Proof of Concept" to the end
+    additional_columns = excel_columns[poc_index:]
+    return input_rows(rows), excel_columns_normalized, additional_columns
+
+
+def input_rows(rows):
+    """Pass on the rows of a findings reader, turning errors it finds partway through the file into ReportError."""
+    try:
+        yield from rows
+    except InputError as e:
+        raise ReportError(str(e)) from e
+    finally:
+        rows.close()
+
+
+def load_template(template_path):
+    """Step 3: Load Word template and set page margins."""
+    try:
+        doc = Document(template_path)
+    except FileNotFoundError:
+        raise ReportError(f"Word template '{template_path}' not found.")
+
+    # Set page margins
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+    return doc
+
+
+class PreparedTemplate:
+    """A Word template loaded (Step 3) and analyzed once, for rendering many workbooks.
+
+    Each render works on a deep copy of the parsed document, and the first
+    cell of every table is read up front, so the matching table for a
+    workbook is found without scanning the template again.
+    """
+
+    def __init__(self, template_path):
+        self.doc = load_template(template_path)
+        self.table_keys = [table.cell(0, 0).text.strip().lower() for table in self.doc.tables]
+
+    def document(self):
+        # Copy the part rather than the Document, whose element would be copied apart from the part's
+        return copy.deepcopy(self.doc.part).document
+
+    def table_index(self, excel_columns_normalized):
+        """Index of the table matching the workbook's columns, or None."""
+        for index, key in enumerate(self.table_keys):
+            if key in excel_columns_normalized:
+                return index
+        return None
+
+    def row_headers(self, excel_columns_normalized):
+        """Row headers of the matching table, read without copying the template (see detach_matching_table)."""
+        index = self.table_index(excel_columns_normalized)
+        if index is None:
+            raise ReportError("No matching table found in the template.")
+        return [row.cells[0].text.strip() for row in self.doc.tables[index].rows]
+
+
+def detach_matching_table(doc, excel_columns_normalized, table_index=None):
+    """Step 4: Find the matching table in the template and take it out of the body.
+
+    `table_index` skips the search when the matching table is already known
+    (see PreparedTemplate). Returns the table's row headers, the body element
+    and the elements that followed the table, so they can be reattached
+    after the findings.
+    """
+    tables = doc.tables
+    matching_table = None
+    if table_index is not None:
+        matching_table = tables[table_index]
+    else:
+        for table in tables:
+            if table.cell(0, 0).text.strip().lower() in excel_columns_normalized:
+                matching_table = table
+                break
+
+    if not matching_table:
+        raise ReportError("No matching table found in the template.")
+
+    # Save trailing content
+    tbl_elm = matching_table._element
+    parent = tbl_elm.getparent()
+    index_in_body = list(parent).index(tbl_elm)
+    following_elements = list(parent)[index_in_body + 1:]
+    parent.remove(tbl_elm)
+
+    # Get headers from matching table
+    row_headers = [row.cells[0].text.strip() for row in matching_table.rows]
+    return row_headers, parent, following_elements
+
+
+def image_path(reference, image_dir=None, evidence=None):
+    """Return the file a POC image reference embeds, relative to `image_dir` when given.
+
+    With `evidence`, an EvidenceIndex, the reference is resolved through it
+    without touching the filesystem, and None is returned when it matches
+    no image or several.
+    """
+    if evidence is not None:
+        reference = evidence.lookup(reference)[0]
+        if reference is None:
+            return None
+    return os.path.join(image_dir, reference) if image_dir else reference
+
+
+def image_references(poc, image_dir=None, evidence=None):
+    """Return the image paths the parsed POC items of a row will embed, in order."""
+    paths = (image_path(item[1], image_dir, evidence)
+             for item in poc if item[0] == 'image' and item[1].lower().endswith(IMAGE_EXTENSIONS))
+    return [path for path in paths if path is not None]
+
+
+def table_layout(row_headers, excel_columns_normalized):
+    """Step 4: Match each row of the template table to its workbook column, once per report.
+
+    Returns an (i, header, excel_header) tuple per row above "Proof of
+    Concept" (which always comes last in the rendered table), where `i` is
+    the row's position in the template, which decides its formatting.
+    """
+    return tuple((i, header, excel_columns_normalized.get(header.strip().lower(), header))
+                 for i, header in enumerate(row_headers) if header.lower() != "proof of concept")
+
+
+def prepare_cells(row, layout):
+    """Step 5: Clean a row's values and split them into the paragraphs of its table cells.
+
+    Runs ahead of the writer (see render_findings), so rendering only walks
+    tuples. Returns an (i, header, text, paragraphs) tuple per entry of
+    `layout`: `text` is the cell value as text, empty for empty cells, and
+    `paragraphs` the (format, text, size) paragraphs written below the header
+    (none for the first two rows, which only show the value).
+    """
+    cells = []
+    for i, header, excel_header in layout:
+        text_value = cell_text(row.get(excel_header))
+        if i < 2:  # First two rows: show only data, no header
+            cells.append((i, header, text_value, ()))
+            continue
+
+        # Apply bullet points for 9th and 10th rows based on line breaks
+        apply_bullets = i >= 8  # 9th and 10th rows (index 8, 9)
+        if '\n' in text_value:
+            lines = format_text_with_bullets(text_value, apply_bullets).split('\n')
+            if apply_bullets:
+                # First line without bullet, subsequent lines with bullets
+                paragraphs = tuple(('bullet' if line_idx > 0 else 'body', line, None)
+                                   for line_idx, line in enumerate(lines))
+            else:
+                paragraphs = (('body', lines[0], None),) + tuple(('line', line, None) for line in lines[1:])
+        else:
+            paragraphs = (('body', text_value, 11),)
+        cells.append((i, header, text_value, paragraphs))
+    return tuple(cells)
+
+
+def render_finding(writer, idx, cells, severity_hex, poc, images, image_dir=None, evidence=None):
+    """Step 5: Generate the title and table for a single finding (one Excel row).
+
+    Output goes through `writer` (styling.DocxWriter, ooxml_fragments.FragmentWriter
+    or html_preview.HtmlWriter); `cells` is the row's prepare_cells() result,
+    `poc` its parse_poc() result, and images are embedded from `images`, an
+    ImagePipeline, as image_path resolves them. Returns the number of images
+    embedded.
+    """
+    # Per-cell debug logging is checked once per finding, not formatted per cell
+    debug = logger.isEnabledFor(logging.DEBUG)
+    writer.begin_finding(severity_hex)
+
     # Title
-    title_para = doc.add_paragraph()
-    title_para.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-    run = title_para.add_run(f"Table {idx + 1}")
-    run.font.size = Pt(16)
-    run.bold = True
+    writer.add_title(f"Table {idx + 1}", 16)
     
-    # Get severity color for this row
-    severity_hex = severity_colors.get(idx)
+    # Severity color for this row
     light_severity_hex = lighten_color(severity_hex) if severity_hex else None
     
-    # Count rows needed (excluding POC, but we'll add it as the last row)
-    table_rows = sum(1 for header in row_headers if header.lower() != "proof of concept")
-    table_rows += 1  # Add one row for POC and subsequent columns
-    
-    # Create a table
-    table = doc.add_table(rows=table_rows, cols=1)
-    table.style = 'Table Grid'
-    table.alignment = WD_TABLE_ALIGNMENT.CENTER
-    table.autofit = False
-    table.width = Inches(6.5)  # Fit page width (8.5 - 1 - 1 = 6.5 inches)
+    # Create a table, with one row for POC and subsequent columns after the others
+    table = writer.add_table(len(cells) + 1)
     
     # Fill the table with data (excluding POC)
-    row_index = 0
-    
-    for i, header in enumerate(row_headers):
-        if header.lower() == "proof of concept":
-            continue  # Skip POC since we'll handle it in the last row
-            
-        # Add data to the table cell
-        cell = table.cell(row_index, 0)
-        paragraph = cell.paragraphs[0]
-        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY  # Justify alignment for all cells
-        paragraph.paragraph_format.line_spacing = 1.0
-        
-        # Add padding
-        set_cell_margins(cell, margin_value=100)
+    for row_index, (i, header, text_value, paragraphs) in enumerate(cells):
+        # Add data to the table cell, justified with single spacing
+        cell = writer.cell(table, row_index)
+        paragraph = writer.first_paragraph(cell, 'body' if i < 2 else 'label')
         
-        # Apply background color to the first three rows
+        # Add padding and apply background color to the first three rows
+        shading_hex = None
         if i < 3 and severity_hex:
             if i < 2:  # First two rows: original severity color
-                set_cell_shading(cell, severity_hex)
+                shading_hex = severity_hex
             elif i == 2:  # Third row: lighter color
-                set_cell_shading(cell, light_severity_hex)
-        
-        # Normalize header for matching
-        header_normalized = header.strip().lower()
-        excel_header = excel_columns_normalized.get(header_normalized, header)
+                shading_hex = light_severity_hex
+        writer.style_cell(cell, row_index, shading_hex)
         
         # Add the content (modify first two rows to show only data)
-        text_value = str(row.get(excel_header, '')).strip()
-        print(f"Row {idx + 1}, Table Row {i + 1}, Header '{header}', Excel Header '{excel_header}': Text Value = '{text_value}'")  # Debug print
+        if debug:
+            logger.debug("row=%d table_row=%d header=%r value=%r", idx + 1, i + 1, header, text_value)
         if i < 2:  # First two rows: show only data, no header
-            run = paragraph.add_run(text_value)
-            run.font.size = Pt(11) if i == 0 else Pt(14)  # First row: 11 pt, second row: 14 pt
-            run.bold = True
+            # First row: 11 pt, second row: 14 pt
+            writer.add_run(paragraph, text_value, size=11 if i == 0 else 14, bold=True)
         else:  # Other rows: show header and value
             # Add column name with text color
-            run = paragraph.add_run(f"{header}:")
-            run.font.size = Pt(11)
-            run.bold = True
-            if severity_hex:
-                # Convert hex color to RGB and apply as text color
-                r = int(severity_hex[0:2], 16)
-                g = int(severity_hex[2:4], 16)
-                b = int(severity_hex[4:6], 16)
-                run.font.color.rgb = RGBColor(r, g, b)
+            writer.add_run(paragraph, f"{header}:", size=11, bold=True, color_hex=severity_hex)
             
             # Add a line break before the data only for rows 9 and beyond (indices 8+)
             if i >= 8:  # 9th row and beyond (indices 8, 9, etc.)
-                cell.add_paragraph()  # Add a new paragraph for visual separation
-            # Note: For rows 0 to 7 (1st to 8th rows), no line break is added before the data
+                writer.add_paragraph(cell)  # Add a new paragraph for visual separation
             
-            # Apply bullet points for 9th and 10th rows based on line breaks
-            apply_bullets = i >= 8  # 9th and 10th rows (index 8, 9)
-            if '\n' in text_value:
-                formatted_text = format_text_with_bullets(text_value, apply_bullets)
-                lines = formatted_text.split('\n')
-                
-                if lines:
-                    if apply_bullets:
-                        # Add each line with first line without bullet, subsequent lines with bullets
-                        for line_idx, line in enumerate(lines):
-                            if line_idx > 0:
-                                p = cell.add_paragraph(line)
-                                p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                                p.paragraph_format.left_indent = Inches(0.25)
-                                p.paragraph_format.space_before = Pt(2)
-                                p.paragraph_format.space_after = Pt(2)
-                                p.paragraph_format.line_spacing = 1.0
-                            else:
-                                p = cell.add_paragraph(line)
-                                p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                                p.paragraph_format.line_spacing = 1.0
-                    else:
-                        p = cell.add_paragraph(lines[0])
-                        p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                        p.paragraph_format.line_spacing = 1.0
-                        for line in lines[1:]:
-                            p = cell.add_paragraph(line)
-                            p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                            p.paragraph_format.space_before = Pt(2)
-                            p.paragraph_format.space_after = Pt(2)
-                            p.paragraph_format.line_spacing = 1.0
-            else:
-                if apply_bullets and text_value:
-                    formatted_text = format_text_with_bullets(text_value, apply_bullets)
-                    p = cell.add_paragraph(formatted_text)
-                    p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    p.paragraph_format.line_spacing = 1.0
-                else:
-                    p = cell.add_paragraph(text_value)
-                    p.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    p.paragraph_format.line_spacing = 1.0
-                value_run = p.runs[-1]
-                value_run.font.size = Pt(11)
-        
-        row_index += 1
+            for paragraph_format, text, size in paragraphs:
+                writer.add_paragraph(cell, paragraph_format, text, size=size)
     
+    row_index = len(cells)
     # Add the last row with "Proof of Concept" and subsequent columns
-    last_cell = table.cell(row_index, 0)
-    last_paragraph = last_cell.paragraphs[0]
-    last_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY  # Justify alignment
-    last_paragraph.paragraph_format.line_spacing = 1.0
-    set_cell_margins(last_cell, margin_value=100)
+    last_cell = writer.cell(table, row_index)
+    last_paragraph = writer.first_paragraph(last_cell, 'body')
+    writer.style_cell(last_cell, row_index)
     
     # Add "Proof of Concept" header
-    poc_header_run = last_paragraph.add_run("Proof of Concept:")
-    poc_header_run.bold = True
-    poc_header_run.font.size = Pt(12)
-    if severity_hex:
-        r = int(severity_hex[0:2], 16)
-        g = int(severity_hex[2:4], 16)
-        b = int(severity_hex[4:6], 16)
-        poc_header_run.font.color.rgb = RGBColor(r, g, b)
+    writer.add_run(last_paragraph, "Proof of Concept:", size=12, bold=True, color_hex=severity_hex)
     
-    # Process all columns from "Proof of Concept" onwards
-    step_counter = 1  # To track step numbers if a column doesn't start with "Step"
-    for col_idx, col_name in enumerate(additional_columns):
-        col_value = str(row.get(col_name, '')).strip()
-        print(f"Row {idx + 1} - Column {col_name}: '{col_value}'")
-        
-        # Check if the column value contains a step or an image
-        is_image = any(col_value.lower().endswith(ext) for ext in ['.png', '.jpg', '.jpeg'])
-        is_step = re.search(r'Step\s*\d+:|\bstep\b', col_value, flags=re.IGNORECASE)
+    def add_step(step_name, step_content):
+        # Add step name
+        step_para = writer.add_paragraph(last_cell, 'justify')
+        writer.add_run(step_para, step_name, size=11, bold=True)
         
-        if col_idx == 0:  # "Proof of Concept" column
-            if col_value and col_value.lower() != 'nan':
-                # Parse POC text into steps
-                steps = re.split(r'(Step\s*\d+:)', col_value, flags=re.IGNORECASE)
-                step_dict = {}
-                current_step = None
-                for part in steps:
-                    part = part.strip()
-                    if re.match(r'Step\s*\d+:', part, flags=re.IGNORECASE):
-                        current_step = part
-                        step_dict[current_step] = ""
-                    elif current_step and part:
-                        step_dict[current_step] += part
-                
-                print(f"Row {idx + 1} - Parsed Steps from POC: {step_dict}")
-                
-                if not step_dict:
-                    # If no steps found, treat the entire POC text as a single step
-                    step_name = f"Step{step_counter}:"
-                    last_cell.add_paragraph()
-                    step_para = last_cell.paragraphs[-1]
-                    step_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    step_run = step_para.add_run(step_name)
-                    step_run.bold = True
-                    step_run.font.size = Pt(11)
-                    
-                    last_cell.add_paragraph()
-                    content_para = last_cell.paragraphs[-1]
-                    content_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    content_run = content_para.add_run(col_value)
-                    content_run.font.size = Pt(11)
-                    content_para.paragraph_format.space_before = Pt(2)
-                    content_para.paragraph_format.space_after = Pt(2)
-                    step_counter += 1
-                else:
-                    for step_name, step_content in step_dict.items():
-                        # Add step name
-                        last_cell.add_paragraph()
-                        step_para = last_cell.paragraphs[-1]
-                        step_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                        step_run = step_para.add_run(step_name)
-                        step_run.bold = True
-                        step_run.font.size = Pt(11)
-                        
-                        # Add step content
-                        formatted_content = format_text_with_bullets(step_content, apply_bullets=False)
-                        last_cell.add_paragraph()
-                        content_para = last_cell.paragraphs[-1]
-                        content_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                        content_run = content_para.add_run(formatted_content)
-                        content_run.font.size = Pt(11)
-                        content_para.paragraph_format.space_before = Pt(2)
-                        content_para.paragraph_format.space_after = Pt(2)
-                        step_counter += 1
-        elif is_step:
-            # Parse the column value as a step
-            steps = re.split(r'(Step\s*\d+:)', col_value, flags=re.IGNORECASE)
-            step_dict = {}
-            current_step = None
-            for part in steps:
-                part = part.strip()
-                if re.match(r'Step\s*\d+:', part, flags=re.IGNORECASE):
-                    current_step = part
-                    step_dict[current_step] = ""
-                elif current_step and part:
-                    step_dict[current_step] += part
-            
-            print(f"Row {idx + 1} - Parsed Steps from {col_name}: {step_dict}")
-            
-            if not step_dict:
-                # If no "StepX:" found, treat the entire value as a single step
-                step_name = f"Step{step_counter}:"
-                last_cell.add_paragraph()
-                step_para = last_cell.paragraphs[-1]
-                step_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                step_run = step_para.add_run(step_name)
-                step_run.bold = True
-                step_run.font.size = Pt(11)
-                
-                last_cell.add_paragraph()
-                content_para = last_cell.paragraphs[-1]
-                content_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                content_run = content_para.add_run(col_value)
-                content_run.font.size = Pt(11)
-                content_para.paragraph_format.space_before = Pt(2)
-                content_para.paragraph_format.space_after = Pt(2)
-                step_counter += 1
-            else:
-                for step_name, step_content in step_dict.items():
-                    # Add step name
-                    last_cell.add_paragraph()
-                    step_para = last_cell.paragraphs[-1]
-                    step_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    step_run = step_para.add_run(step_name)
-                    step_run.bold = True
-                    step_run.font.size = Pt(11)
-                    
-                    # Add step content
-                    formatted_content = format_text_with_bullets(step_content, apply_bullets=False)
-                    last_cell.add_paragraph()
-                    content_para = last_cell.paragraphs[-1]
-                    content_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    content_run = content_para.add_run(formatted_content)
-                    content_run.font.size = Pt(11)
-                    content_para.paragraph_format.space_before = Pt(2)
-                    content_para.paragraph_format.space_after = Pt(2)
-                    step_counter += 1
-        elif is_image:
-            # Handle image column: display the actual image
-            paths = [p.strip() for p in col_value.split(",") if p.strip()]
-            for path in paths:
-                if os.path.exists(path) and path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    last_cell.add_paragraph()
-                    img_para = last_cell.paragraphs[-1]
-                    img_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    run = img_para.add_run()
-                    run.add_picture(path, width=Inches(5.0))
-                else:
-                    print(f"Row {idx + 1} - Skipped image: {path}")
+        # Add step content
+        content_para = writer.add_paragraph(last_cell, 'step_content')
+        writer.add_run(content_para, step_content, size=11)
+    
+    # Add the parsed "Proof of Concept" steps and screenshots
+    if debug:
+        logger.debug("row=%d poc=%r", idx + 1, poc)
+    embedded = 0
+    for item in poc:
+        if item[0] == 'step':
+            add_step(item[1], item[2])
+            continue
+        path = item[1]
+        full_path = image_path(path, image_dir, evidence) if path.lower().endswith(IMAGE_EXTENSIONS) else None
+        image = images.get(full_path) if full_path is not None else None
+        if image is not None:
+            img_para = writer.add_paragraph(last_cell, 'justify')
+            writer.add_picture(img_para, image, Inches(DISPLAY_WIDTH_INCHES), os.path.basename(full_path))
+            embedded += 1
+        elif evidence is not None and full_path is None and path.lower().endswith(IMAGE_EXTENSIONS):
+            logger.warning("row=%d skipped image %s: %s", idx + 1, path, evidence.explain(path))
         else:
-            # Treat as a step if it's not an image
-            step_name = f"Step{step_counter}:"
-            last_cell.add_paragraph()
-            step_para = last_cell.paragraphs[-1]
-            step_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-            step_run = step_para.add_run(step_name)
-            step_run.bold = True
-            step_run.font.size = Pt(11)
-            
-            last_cell.add_paragraph()
-            content_para = last_cell.paragraphs[-1]
-            content_para.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
-            content_run = content_para.add_run(col_value)
-            content_run.font.size = Pt(11)
-            content_para.paragraph_format.space_before = Pt(2)
-            content_para.paragraph_format.space_after = Pt(2)
-            step_counter += 1
+            logger.warning("row=%d skipped image %s", idx + 1, path)
     
     # Apply table borders (with custom handling for first and second rows)
-    set_table_borders(table)
-    
-    # Add page break
-    doc.add_page_break()
-
-# Step 6: Reattach trailing content
-for elem in following_elements:
-    parent.append(elem)
-
-# Step 7: Save document
-doc.save(output_file)
-print(f"Document saved as {output_file}")
-
-# Step 8: Run optional next script
-next_script = "table_update.py"
-try:
-    result = subprocess.run([sys.executable, next_script], check=True, capture_output=True, text=True)
-    print(f"Successfully ran {next_script}")
-except subprocess.CalledProcessError as e:
-    print(f"Error running {next_script}: {e}")
-    print(f"Standard Output: {e.stdout}")
-    print(f"Standard Error: {e.stderr}")
-except FileNotFoundError:
-    print(f"Error: {next_script} not found in the current directory.")
\ No newline at end of file
+    writer.finish_table(table)
+    return embedded
+
+
+def render_findings(doc, rows, row_headers, excel_columns_normalized, additional_columns, stats, start=0,
+                    image_dir=None, image_options=None, image_hashes=None, backend='fragments',
+                    fragment_cache=None, fragment_cache_max_bytes=256 * 1024 * 1024, flush=None, evidence=None):
+    """Step 5: Append a titled table and a page break per row to the body of `doc`.
+
+    Tables are numbered from `start + 1`; the options are those of
+    render_document. The findings and images written are added to `stats`,
+    and with `evidence`, how each image reference resolved ('image_lookups').
+    `flush(doc)`, when given, is called after each finding (see
+    StreamingDocx), and the finding's screenshots are then released.
+    """
+    writer = WRITERS[backend](doc)
+
+    # Prepare the screenshots on a thread pool a few rows ahead of the render loop
+    images = ImagePipeline(known_hashes=image_hashes, **(image_options or {}))
+
+    findings = None
+    if fragment_cache:
+        context = (ENGINE_VERSION, backend, repr(row_headers), repr(sorted(excel_columns_normalized.items())),
+                   repr(additional_columns), doc.sections[-1].page_width, doc.sections[-1].left_margin,
+                   doc.sections[-1].right_margin, images.target_width, images.image_format, images.quality,
+                   PIPELINE_VERSION)
+        findings = FindingCache(fragment_cache, fragment_cache_max_bytes, context, image_hashes)
+
+    layout = table_layout(row_headers, excel_columns_normalized)
+    lookups = stats.setdefault('image_lookups', {}) if evidence is not None else None
+
+    def plan(rows):
+        # Parse the POC columns once per row, and look the row up in the finding cache
+        # before its images are queued; rows that have to be rendered get their cells prepared
+        for row, severity_hex in rows:
+            poc = parse_poc(row, additional_columns)
+            if lookups is not None:
+                for item in poc:
+                    if item[0] == 'image' and item[1] not in lookups:
+                        lookups[item[1]] = evidence.lookup(item[1])
+            cached = key = None
+            if findings is not None:
+                key = findings.fingerprint(row, severity_hex, image_references(poc, image_dir, evidence))
+                cached = findings.lookup(key)
+            cells = prepare_cells(row, layout) if cached is None else None
+            yield cells, severity_hex, poc, key, cached
+
+    try:
+        rows = images.prefetch(plan(rows),
+                               lambda record: [] if record[4] else image_references(record[2], image_dir, evidence))
+        for idx, (cells, severity_hex, poc, key, cached) in enumerate(rows, start):
+            if cached is not None:
+                writer.add_title(f"Table {idx + 1}", 16)
+                stats['images'] += findings.splice(doc, cached)
+            else:
+                mark = findings.mark(doc) if findings is not None else None
+                stats['images'] += render_finding(writer, idx, cells, severity_hex, poc, images, image_dir, evidence)
+                if findings is not None:
+                    findings.store(key, doc, mark)
+
+            # Add page break
+            doc.add_page_break()
+            stats['findings'] += 1
+            if flush is not None:
+                flush(doc)
+                images.release(image_references(poc, image_dir, evidence))
+    finally:
+        images.close()
+    logger.info(images.summary())
+    if findings is not None:
+        logger.info(findings.summary())
+
+
+# What the processes of a sharded render need; set before the pool forks, so they inherit it
+SHARD_STATE = {}
+
+
+def can_shard():
+    """Sharded renders fork their workers, which daemonic processes (job and batch workers) may not do."""
+    return 'fork' in multiprocessing.get_all_start_methods() and not multiprocessing.current_process().daemon
+
+
+def render_shard(task):
+    """Render one chunk of rows into a copy of the document and capture the result (runs in a pool worker)."""
+    start, rows = task
+    doc = copy.deepcopy(SHARD_STATE['doc'].part).document
+    body = doc.element.body
+    offset = 1 if body.sectPr is not None else 0
+    mark = len(body) - offset
+    stats = {'findings': 0, 'images': 0}
+    render_findings(doc, rows, *SHARD_STATE['layout'], stats, start, **SHARD_STATE['options'])
+    record, blobs = capture(doc, list(body)[mark:len(body) - offset])
+    return record, blobs, stats
+
+
+def render_sharded(doc, rows, shards, layout, stats, options):
+    """Step 5 on `shards` processes: render contiguous chunks of rows and merge them in order.
+
+    Each worker renders its chunk into its own copy of `doc`; the parent
+    inserts the captured elements in row order, adding each distinct image
+    once and renumbering drawings, so the result matches a serial render.
+    """
+    rows = list(rows)
+    size = -(-len(rows) // shards)  # Ceiling division
+    tasks = [(start, rows[start:start + size]) for start in range(0, len(rows), size)]
+    if not tasks:
+        return
+    SHARD_STATE.update(doc=doc, layout=layout, options=options)
+    preload()  # Imported once here rather than in every shard
+    try:
+        with multiprocessing.get_context('fork').Pool(len(tasks)) as pool:
+            next_drawing_id = None
+            # Chunks are merged as they arrive, in order, while later ones are still rendering
+            for record, blobs, shard_stats in pool.imap(render_shard, tasks):
+                with span('merge', stats):
+                    next_drawing_id = insert(doc, record, blobs, next_drawing_id)
+                stats['findings'] += shard_stats['findings']
+                stats['images'] += shard_stats['images']
+                if 'image_lookups' in shard_stats:
+                    stats.setdefault('image_lookups', {}).update(shard_stats['image_lookups'])
+    finally:
+        SHARD_STATE.clear()
+
+
+def report_evidence(evidence, stats):
+    """Replace the image lookups in `stats` with the report of `evidence` on them, and log its summary."""
+    lookups = stats.pop('image_lookups', {})
+    if evidence is None:
+        return
+    report = stats['evidence'] = evidence.report(lookups)
+    logger.info("evidence images=%d references=%d fuzzy=%d ambiguous=%d unresolved=%d unused=%d",
+                report['images'], report['references'], len(report['resolved']), len(report['ambiguous']),
+                len(report['unresolved']), len(report['unused']))
+
+
+def open_report(excel_path, template_path, stats, severity_colors=None):
+    """Steps 1-4: Load the findings and the template, and take the findings table out.
+
+    Returns (rows, doc, layout, parent, following_elements); layout holds the
+    row headers, the normalized Excel columns and the POC columns.
+    """
+    template = template_path if isinstance(template_path, PreparedTemplate) else None
+    with span('load_findings', stats):
+        rows, excel_columns_normalized, additional_columns = load_findings(excel_path, severity_colors)
+    try:
+        with span('load_template', stats):
+            doc = template.document() if template else load_template(template_path)
+        with span('find_table', stats):
+            table_index = template.table_index(excel_columns_normalized) if template else None
+            row_headers, parent, following_elements = detach_matching_table(doc, excel_columns_normalized,
+                                                                            table_index)
+    except ReportError:
+        rows.close()
+        raise
+    return rows, doc, (row_headers, excel_columns_normalized, additional_columns), parent, following_elements
+
+
+def render_document(excel_path, template_path, image_dir=None, image_options=None, image_hashes=None,
+                    backend='fragments', fragment_cache=None, fragment_cache_max_bytes=256 * 1024 * 1024,
+                    stats=None, shards=1, severity_colors=None, evidence=None):
+    """Build the report and return the python-docx Document.
+
+    Relative image paths in the sheet are resolved against `image_dir`
+    (the current directory when not given). `image_options` are passed to
+    ImagePipeline (target_dpi, image_format, quality, cache_dir, ...) and
+    `image_hashes` maps image paths to their known SHA-256 digests.
+    With `evidence`, an EvidenceIndex of the images under `image_dir`,
+    references are resolved through it (see image_path) and `stats` gets its
+    report on the references ('evidence', see EvidenceIndex.report).
+    `backend` selects how tables are written (see WRITERS).
+
+    With `fragment_cache` (a directory), rendered findings are kept in a
+    FindingCache and only rows whose inputs changed since an earlier run
+    are rendered again.
+
+    With `shards` above 1, the findings are rendered by that many forked
+    processes and merged (see render_sharded); the document is the same.
+
+    `excel_path` may also be a CSV, JSON Lines or Parquet export, colored by
+    `severity_colors` (see input_readers.parse_severity_colors).
+    `template_path` may also be a PreparedTemplate shared by many renders.
+    `stats`, when given, is filled with per-step timings ('steps') and the
+    number of findings and images written.
+    """
+    stats = {} if stats is None else stats
+    rows, doc, layout, parent, following_elements = open_report(excel_path, template_path, stats, severity_colors)
+    options = {'image_dir': image_dir, 'image_options': image_options, 'image_hashes': image_hashes,
+               'backend': backend, 'fragment_cache': fragment_cache,
+               'fragment_cache_max_bytes': fragment_cache_max_bytes, 'evidence': evidence}
+    if shards > 1 and not can_shard():
+        logger.warning("Sharded rendering needs to fork worker processes; rendering serially")
+        shards = 1
+    stats['findings'] = stats['images'] = 0
+    with span('render_findings', stats):
+        if shards > 1:
+            render_sharded(doc, rows, shards, layout, stats, options)
+        else:
+            render_findings(doc, rows, *layout, stats, **options)
+    report_evidence(evidence, stats)
+
+    # Step 6: Reattach trailing content
+    with span('reattach', stats):
+        for elem in following_elements:
+            parent.append(elem)
+    return doc
+
+
+def render_report(excel_path, template_path, image_dir=None, image_options=None, image_hashes=None,
+                  backend='fragments', fragment_cache=None, fragment_cache_max_bytes=256 * 1024 * 1024,
+                  stats=None, shards=1, post_processors=(), severity_colors=None, evidence=None):
+    """Render the report in-process and return the .docx file contents as bytes.
+
+    `post_processors` name the hooks (see post_processing) applied to the
+    Document, in order, before it is saved. `stats` is filled as in
+    render_document, plus the total 'seconds' and the output size in 'bytes'.
+    """
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    doc = render_document(excel_path, template_path, image_dir, image_options, image_hashes, backend,
+                          fragment_cache, fragment_cache_max_bytes, stats, shards, severity_colors, evidence)
+    # Step 7: Post-process and save document
+    try:
+        run_post_processors(doc, post_processors, stats)
+    except LookupError as e:
+        raise ReportError(str(e)) from e
+    with span('save', stats):
+        buffer = io.BytesIO()
+        doc.save(buffer)
+    report = buffer.getvalue()
+    stats['seconds'] = time.perf_counter() - start
+    stats['bytes'] = len(report)
+    logger.info("rendered findings=%d images=%d bytes=%d seconds=%.3f",
+                stats['findings'], stats['images'], stats['bytes'], stats['seconds'])
+    return report
+
+
+def stream_report(excel_path, template_path, output_path, image_dir=None, image_options=None, image_hashes=None,
+                  backend='fragments', fragment_cache=None, fragment_cache_max_bytes=256 * 1024 * 1024,
+                  stats=None, post_processors=(), severity_colors=None, evidence=None):
+    """Render the report straight into the .docx file at `output_path`.
+
+    The document is the same as render_report's, but findings are written
+    to the file one at a time (see StreamingDocx), so memory is bounded by
+    the largest finding instead of the whole report. Options and `stats`
+    are as in render_report; post-processing hooks need the whole Document
+    and are refused.
+    """
+    if post_processors:
+        raise ReportError("Post-processing hooks need the whole document in memory; render without streaming.")
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    rows, doc, layout, _, following_elements = open_report(excel_path, template_path, stats, severity_colors)
+    # The trailing content stays in place (Step 6) and the findings are streamed in before it
+    output = StreamingDocx(doc, output_path, following_elements[0] if following_elements else None)
+    stats['findings'] = stats['images'] = 0
+    try:
+        with span('render_findings', stats):
+            render_findings(output.scratch, rows, *layout, stats, image_dir=image_dir, image_options=image_options,
+                            image_hashes=image_hashes, backend=backend, fragment_cache=fragment_cache,
+                            fragment_cache_max_bytes=fragment_cache_max_bytes, flush=output.flush,
+                            evidence=evidence)
+        report_evidence(evidence, stats)
+        # Step 7: Save document
+        with span('save', stats):
+            output.close()
+    except BaseException:
+        output.abort()
+        raise
+    stats['seconds'] = time.perf_counter() - start
+    stats['bytes'] = os.path.getsize(output_path)
+    logger.info("streamed findings=%d images=%d bytes=%d seconds=%.3f",
+                stats['findings'], stats['images'], stats['bytes'], stats['seconds'])
+
+
+def run_next_script(next_script=NEXT_SCRIPT, cwd=None, stats=None, timeout=None):
+    """Step 8: Run optional next script (in `cwd`, the current directory by default), killed after `timeout` seconds"""
+    if not os.path.exists(os.path.join(cwd or os.curdir, next_script)):
+        logger.warning("%s not found, skipping it", next_script)
+        return
+    with span('next_script', stats):
+        try:
+            result = subprocess.run([sys.executable, next_script], check=True, capture_output=True, text=True, cwd=cwd,
+                                    timeout=timeout)
+            logger.info("ran %s", next_script)
+            logger.debug("%s output: %s", next_script, result.stdout)
+        except subprocess.CalledProcessError as e:
+            logger.error("error running %s: %s\nstdout: %s\nstderr: %s", next_script, e, e.stdout, e.stderr)
+        except subprocess.TimeoutExpired:
+            logger.error("%s did not finish within %s s and was killed", next_script, timeout)
+
+
+def preload():
+    """Import the dependencies that are otherwise only imported on first use: openpyxl and Pillow.
+
+    Call it in a parent process before forking workers, so they start with
+    them loaded instead of each importing them again.
+    """
+    importlib.import_module('openpyxl')  # .xlsx input, see workbook_reader
+    load_pil()
+
+
+def warm_up():
+    """Preload every dependency and prime python-docx and openpyxl, so the first request is not slower.
+
+    For long-lived processes that fork their render workers (the web app);
+    one-off renders import only what their input needs.
+    """
+    from openpyxl import Workbook, load_workbook
+
+    preload()
+    load_parquet()  # When pyarrow is installed
+    buffer = io.BytesIO()
+    Workbook().save(buffer)
+    load_workbook(buffer, data_only=True)
+    Document().save(io.BytesIO())
+
+
+def severity_colors_argument(spec):
+    try:
+        return parse_severity_colors(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_render_arguments(parser):
+    """Add the rendering options shared by this CLI and batch.py to `parser`."""
+    parser.add_argument('--backend', choices=sorted(WRITERS), default='fragments',
+                        help="Table rendering backend: cached OOXML fragments, python-docx calls, "
+                             "or named Word styles (default: fragments)")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="Log step timings (-v) or every table cell (-vv)")
+    parser.add_argument('--image-dpi', type=int, default=150,
+                        help="Resolution screenshots are downscaled to at their 5 inch display width (default: 150)")
+    parser.add_argument('--image-format', choices=IMAGE_FORMATS, default='keep',
+                        help="Re-encode screenshots as JPEG or optimized PNG (default: keep the original format)")
+    parser.add_argument('--image-quality', type=int, default=85, help="JPEG quality when re-encoding (default: 85)")
+    parser.add_argument('--image-cache', metavar='DIR',
+                        help="Keep processed screenshots in this directory and reuse them across runs")
+    parser.add_argument('--image-cache-size', type=int, default=512, metavar='MB',
+                        help="Size limit of the image cache; least recently used images are evicted (default: 512)")
+    parser.add_argument('--fragment-cache', metavar='DIR',
+                        help="Keep rendered findings in this directory and only re-render changed rows")
+    parser.add_argument('--fragment-cache-size', type=int, default=256, metavar='MB',
+                        help="Size limit of the finding cache (default: 256)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Write the report to disk finding by finding, keeping memory use flat "
+                             "for very large reports")
+    parser.add_argument('--severity-colors', type=severity_colors_argument, metavar='SPEC',
+                        help="Severity colors for CSV, JSON Lines and Parquet input, e.g. 'High=FF0000,Low=92D050' "
+                             "(on top of the defaults; a 'Severity Color' column overrides them per row)")
+    parser.add_argument('--post-process', action='append', default=[], metavar='HOOK',
+                        help="Apply this post-processing hook (a registered name or module:function) "
+                             "to the document before saving; repeat to chain hooks in order")
+
+
+def render_options(args):
+    """Keyword arguments for render_report from the options added by add_render_arguments."""
+    return {
+        'image_options': {
+            'target_dpi': args.image_dpi,
+            'image_format': args.image_format,
+            'quality': args.image_quality,
+            'cache_dir': args.image_cache,
+            'cache_max_bytes': args.image_cache_size * 1024 * 1024,
+        },
+        'backend': args.backend,
+        'fragment_cache': args.fragment_cache,
+        'fragment_cache_max_bytes': args.fragment_cache_size * 1024 * 1024,
+        'post_processors': args.post_process,
+        'severity_colors': args.severity_colors,
+    }
+
+
+def check_post_processors(parser, args):
+    """Load the --post-process hooks before rendering, exiting with a usage error on bad ones."""
+    if not args.post_process:
+        return
+    if args.stream:
+        parser.error("--post-process needs the whole document in memory and cannot be combined with --stream")
+    sys.path.append(os.getcwd())  # Hooks may be modules in the working directory, as with python -m
+    for hook in args.post_process:
+        try:
+            resolve(hook)
+        except LookupError as e:
+            parser.error(str(e))
+
+
+def print_evidence_report(report, skipped=True):
+    """Print an EvidenceIndex report; `skipped=False` leaves out the unresolved references preflight warns about."""
+    for reference, path in report['resolved'].items():
+        print(f"Note: image '{reference}' resolved to '{path}'")
+    if skipped:
+        for reference, candidates in report['ambiguous'].items():
+            print(f"Warning: image '{reference}' matches several images and was skipped: {', '.join(candidates)}")
+        for reference in report['unresolved']:
+            print(f"Warning: image '{reference}' was not found and was skipped")
+    for path in report['unused']:
+        print(f"Unused image: {path}")
+    print(f"{report['references']} image references, {len(report['resolved'])} resolved by case or file name, "
+          f"{len(report['ambiguous']) + len(report['unresolved'])} unresolved, "
+          f"{len(report['unused'])} of {report['images']} images unused")
+
+
+def configure_logging(verbose):
+    level = [logging.WARNING, logging.INFO, logging.DEBUG][min(verbose, 2)]
+    logging.basicConfig(level=level, format='%(levelname)s %(name)s: %(message)s')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a Word report from an Excel sheet and a Word template.")
+    parser.add_argument('excel_path', help="Excel sheet (.xlsx), or a .csv, .jsonl or .parquet export, "
+                                           "with one finding per row")
+    parser.add_argument('template_path', help="Word template (.docx) containing the findings table")
+    add_render_arguments(parser)
+    parser.add_argument('--shards', type=int, default=1, metavar='N',
+                        help="Render the findings in N processes and merge them; 0 for one per CPU "
+                             "(default: 1, for large workbooks)")
+    parser.add_argument('--evidence-folder', metavar='DIR',
+                        help="Index the screenshots under DIR once and resolve the sheet's image references "
+                             "through it, matching case-insensitively and by file name when the path differs; "
+                             "reports unresolved, ambiguous and unused images")
+    parser.add_argument('--preflight', action='store_true',
+                        help="Only check the sheet's columns, the template's table and the screenshot paths, "
+                             "print what is wrong and exit (status 1 on errors)")
+    parser.add_argument('--next-script', nargs='?', const=NEXT_SCRIPT, metavar='PATH',
+                        help=f"Also run this legacy post-processing script on the saved report "
+                             f"(default: {NEXT_SCRIPT})")
+    return parser
+
+
+def main(argv=None):
+    """Command-line entry point: render the report to OUTPUT_FILE and run the next script (or just preflight)."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.stream and args.shards != 1:
+        parser.error("--stream renders serially and cannot be combined with --shards")
+    check_post_processors(parser, args)
+    configure_logging(args.verbose)
+    evidence = None
+    if args.evidence_folder:
+        if not os.path.isdir(args.evidence_folder):
+            parser.error(f"--evidence-folder: '{args.evidence_folder}' is not a directory")
+        evidence = EvidenceIndex.scan(os.curdir, args.evidence_folder)  # References are relative to the cwd
+    if args.preflight:
+        result = preflight(args.excel_path, args.template_path, evidence=evidence)
+        for error in result['errors']:
+            print(f"Error: {error}")
+        for warning in result['warnings']:
+            print(f"Warning: {warning}")
+        if evidence is not None:
+            print_evidence_report(result['evidence'], skipped=False)
+        print(f"{len(result['errors'])} errors, {len(result['warnings'])} warnings, "
+              f"{result['images']} images referenced ({result['seconds']:.3f} s)")
+        sys.exit(1 if result['errors'] else 0)
+    stats = {}
+    try:
+        if args.stream:
+            stream_report(args.excel_path, args.template_path, OUTPUT_FILE, stats=stats, evidence=evidence,
+                          **render_options(args))
+        else:
+            report = render_report(args.excel_path, args.template_path, shards=args.shards or os.cpu_count() or 1,
+                                   stats=stats, evidence=evidence, **render_options(args))
+            with open(OUTPUT_FILE, 'wb') as f:
+                f.write(report)
+    except ReportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if evidence is not None:
+        print_evidence_report(stats['evidence'])
+    print(f"Document saved as {OUTPUT_FILE}")
+
+    if args.next_script:
+        run_next_script(args.next_script)
+
+
+if __name__ == '__main__':
+    main()
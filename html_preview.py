@@ -0,0 +1,262 @@
+"""Lightweight HTML preview of a workbook's findings, one page at a time.
+
+The preview goes through the same Step 5 code as the report: render_finding
+fills an HtmlWriter instead of a Word table, so headers, severity shading,
+bullets and the parsed POC steps read exactly as in the document. No .docx
+is built and screenshots are not embedded; they link to thumbnails that are
+made on request and kept in a DiskCache.
+"""
+import collections
+import html
+import os
+import threading
+
+from disk_cache import cache_key, sha256_file
+from generate_document import load_findings, prepare_cells, render_finding, table_layout
+from image_pipeline import PIPELINE_VERSION, process_image
+from poc_parser import parse_poc
+
+THUMBNAIL_WIDTH = 480  # Pixels; about the width a screenshot takes in the preview
+THUMBNAIL_QUALITY = 80
+
+# CSS for the paragraph formats of styling.PARAGRAPH_FORMATS
+PARAGRAPH_CLASSES = {
+    None: 'p',
+    'body': 'p body',
+    'label': 'p body',
+    'justify': 'p justify',
+    'step_content': 'p step',
+    'line': 'p step',
+    'bullet': 'p step bullet',
+}
+
+
+class PreviewImage:
+    """Stands in for a ProcessedImage: where the browser fetches the screenshot's thumbnail."""
+
+    def __init__(self, url):
+        self.url = url
+
+
+class PreviewImages:
+    """Stands in for the ImagePipeline: resolves screenshot paths to thumbnail URLs.
+
+    `root` is the folder the workbook's image paths are relative to and
+    `image_url(name)` builds the URL of the thumbnail for such a path.
+    Paths that are missing or point outside `root` are skipped like
+    unreadable images in the report; with `indexed`, paths come from an
+    EvidenceIndex of `root` and are known to exist.
+    """
+
+    def __init__(self, root, image_url, indexed=False):
+        self.root = os.path.abspath(root)
+        self.image_url = image_url
+        self.indexed = indexed
+
+    def get(self, path):
+        full_path = os.path.abspath(os.path.join(self.root, path))
+        if not full_path.startswith(self.root + os.sep) or not (self.indexed or os.path.isfile(full_path)):
+            return None
+        return PreviewImage(self.image_url(os.path.relpath(full_path, self.root).replace(os.sep, '/')))
+
+
+class HtmlWriter:
+    """Writes finding tables as HTML, with the interface of styling.DocxWriter.
+
+    Tables are kept as lists of cells, cells as lists of paragraphs and
+    paragraphs as lists of HTML runs until html() joins them up.
+    """
+
+    def __init__(self):
+        self.blocks = []  # HTML strings for titles, lists of cells for tables
+
+    def begin_finding(self, severity_hex):
+        pass  # Colors are inline
+
+    def add_title(self, text, size, bold=True):
+        self.blocks.append(f'<p class="title">{self.run_html(text, size, bold)}</p>')
+
+    def add_table(self, rows):
+        table = [{'shading': None, 'paragraphs': [self.new_paragraph(None)]} for _ in range(rows)]
+        self.blocks.append(table)
+        return table
+
+    def cell(self, table, row_index):
+        return table[row_index]
+
+    def style_cell(self, cell, row_index, shading_hex=None):
+        cell['shading'] = shading_hex
+
+    def first_paragraph(self, cell, paragraph_format):
+        paragraph = cell['paragraphs'][0]
+        paragraph['format'] = paragraph_format
+        return paragraph
+
+    def add_paragraph(self, cell, paragraph_format=None, text='', size=None, bold=False, color_hex=None):
+        paragraph = self.new_paragraph(paragraph_format)
+        cell['paragraphs'].append(paragraph)
+        if text:
+            self.add_run(paragraph, text, size, bold, color_hex)
+        return paragraph
+
+    def add_run(self, paragraph, text, size=None, bold=False, color_hex=None):
+        paragraph['runs'].append(self.run_html(text, size, bold, color_hex))
+
+    def add_picture(self, paragraph, image, width, name=None):
+        paragraph['runs'].append(f'<img src="{html.escape(image.url)}" alt="{html.escape(name or "")}" loading="lazy">')
+
+    def finish_table(self, table):
+        pass  # Borders come from the stylesheet
+
+    @staticmethod
+    def new_paragraph(paragraph_format):
+        return {'format': paragraph_format, 'runs': []}
+
+    @staticmethod
+    def run_html(text, size=None, bold=False, color_hex=None):
+        style = []
+        if size:
+            style.append(f'font-size:{size}pt')
+        if bold:
+            style.append('font-weight:bold')
+        if color_hex:
+            style.append(f'color:#{color_hex}')
+        text = html.escape(text)
+        return f'<span style="{";".join(style)}">{text}</span>' if style else text
+
+    def html(self):
+        """The findings written so far as one HTML fragment."""
+        parts = []
+        for block in self.blocks:
+            if isinstance(block, str):
+                parts.append(block)
+                continue
+            parts.append('<table class="finding">')
+            for cell in block:
+                shading = f' style="background-color:#{cell["shading"]}"' if cell['shading'] else ''
+                paragraphs = ''.join(f'<div class="{PARAGRAPH_CLASSES[paragraph["format"]]}">'
+                                     f'{"".join(paragraph["runs"])}</div>' for paragraph in cell['paragraphs'])
+                parts.append(f'<tr><td{shading}>{paragraphs}</td></tr>')
+            parts.append('</table>')
+        return '\n'.join(parts)
+
+
+class PreviewSession:
+    """The rows of one workbook, read as far as the pages asked for so far.
+
+    Steps 1-2 run as for a report, but rows are only pulled from the
+    streaming reader until the requested page is full (plus one, to know
+    whether there is a next page), and kept for the pages after it. Step 4
+    only reads the matching table's headers from `template`, a
+    PreparedTemplate. Exports are colored by `severity_colors`, as in a render,
+    and image references are resolved through `evidence`, an EvidenceIndex
+    of `image_root`, when given.
+    """
+
+    def __init__(self, excel_path, template, image_root, severity_colors=None, evidence=None):
+        self.rows, self.excel_columns_normalized, self.additional_columns = load_findings(excel_path, severity_colors)
+        try:
+            self.row_headers = template.row_headers(self.excel_columns_normalized)
+            self.layout = table_layout(self.row_headers, self.excel_columns_normalized)
+        except Exception:
+            self.rows.close()
+            raise
+        self.image_root = image_root
+        self.evidence = evidence
+        self.loaded = []  # (values, severity_hex) of the rows read so far
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def read_until(self, count):
+        while not self.complete and len(self.loaded) < count:
+            row = next(self.rows, None)
+            if row is None:
+                self.complete = True
+            else:
+                self.loaded.append(row)
+
+    def total(self):
+        """Number of findings, or None until the whole sheet has been read."""
+        return len(self.loaded) if self.complete else None
+
+    def page(self, page, per_page, image_url):
+        """HTML of findings page `page` (from 1) and whether another page follows it."""
+        start = (page - 1) * per_page
+        with self.lock:
+            self.read_until(start + per_page + 1)
+            rows = self.loaded[start:start + per_page]
+            has_next = len(self.loaded) > start + per_page
+
+        writer = HtmlWriter()
+        images = PreviewImages(self.image_root, image_url, indexed=self.evidence is not None)
+        for idx, (row, severity_hex) in enumerate(rows, start):
+            poc = parse_poc(row, self.additional_columns)
+            render_finding(writer, idx, prepare_cells(row, self.layout), severity_hex, poc, images,
+                           evidence=self.evidence)
+            writer.blocks.append('<hr class="page-break">')
+        return writer.html(), has_next
+
+    def close(self):
+        self.rows.close()
+
+
+class PreviewStore:
+    """Open PreviewSessions by key, closing the least recently used beyond `max_sessions`."""
+
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self.sessions = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, create):
+        """The session for `key`, made by `create()` if there is none."""
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is not None:
+                self.sessions.move_to_end(key)
+                return session
+
+        # Opened outside the lock; two first requests at once just open the sheet twice
+        session = create()
+        evicted = []
+        with self.lock:
+            existing = self.sessions.get(key)
+            if existing is not None:
+                evicted.append(session)
+                session = existing
+            else:
+                self.sessions[key] = session
+            while len(self.sessions) > self.max_sessions:
+                evicted.append(self.sessions.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return session
+
+    def discard(self, key):
+        with self.lock:
+            session = self.sessions.pop(key, None)
+        if session is not None:
+            session.close()
+
+
+def thumbnail(path, cache=None, width=THUMBNAIL_WIDTH, sha256=None):
+    """JPEG thumbnail of the screenshot at `path` (the original when that is smaller), cached by content hash.
+
+    `sha256` is the file's hash when already known (recorded at upload), so
+    serving a cached thumbnail does not read the whole image again.
+    """
+    key = cache_key(sha256 or sha256_file(path), 'thumbnail', width, THUMBNAIL_QUALITY, PIPELINE_VERSION)
+    data = cache.get(key) if cache is not None else None
+    if data is None:
+        with open(path, 'rb') as f:
+            data = process_image(f.read(), width, 'jpeg', THUMBNAIL_QUALITY)
+        if cache is not None:
+            cache.put(key, data)
+    return data
+
+
+def image_mimetype(data):
+    """Content type of a thumbnail; process_image keeps the original bytes when they are smaller."""
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    return 'image/jpeg'
@@ -0,0 +1,272 @@
+import functools
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from disk_cache import DiskCache, cache_key
+
+DISPLAY_WIDTH_INCHES = 5.0  # Width images are shown at in the POC cell
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+IMAGE_FORMATS = ('keep', 'jpeg', 'png')
+
+
+PIPELINE_VERSION = 1  # Bump when process_image output changes, to invalidate cached images
+RELEASED_BYTES = 64 * 1024 * 1024  # Released images still kept for identical screenshots in later findings
+
+
+@functools.lru_cache(maxsize=None)
+def load_pil():
+    """PIL.Image, imported on first use as Pillow is slow to import; None without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:  # Pillow is optional: without it images are embedded as uploaded
+        return None
+    return Image
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
+
+
+def start_executor(max_workers=None):
+    """A thread pool for ImagePipeline with all of its threads already running.
+
+    ThreadPoolExecutor starts its threads on first use. Under a memory limit
+    (see jobs.apply_limits) starting one then fails, or the thread dies
+    before it runs its work item and leaves that future unresolved; a render
+    worker starts the pool before the limit is applied.
+    """
+    max_workers = max_workers or default_workers()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+    # Each thread stays busy until all have started, so every submit starts another one
+    started = threading.Barrier(max_workers + 1)
+    for _ in range(max_workers):
+        executor.submit(started.wait)
+    started.wait()
+    return executor
+
+
+class ProcessedImage:
+    """Image bytes ready to embed, plus the hash of the original file."""
+
+    def __init__(self, data, sha256):
+        self.data = data
+        self.sha256 = sha256
+
+
+def process_image(data, target_width, image_format='keep', quality=85):
+    """Downscale `data` to at most `target_width` pixels wide and re-encode it.
+
+    image_format: 'keep' re-encodes in the original format only when the image
+    was resized, 'jpeg' always converts to JPEG at `quality`, 'png' always
+    writes an optimized PNG. The original bytes are returned whenever the
+    processed version would not be smaller.
+    """
+    Image = load_pil()
+    if Image is None:
+        return data
+
+    with Image.open(io.BytesIO(data)) as img:
+        source_format = img.format
+        resized = img.width > target_width
+        if resized:
+            height = max(1, round(img.height * target_width / img.width))
+            img = img.resize((target_width, height), Image.LANCZOS)
+        elif image_format == 'keep':
+            return data
+
+        output_format = source_format if image_format == 'keep' else image_format.upper()
+        if output_format not in ('JPEG', 'PNG'):
+            output_format = 'PNG'
+
+        buffer = io.BytesIO()
+        if output_format == 'JPEG':
+            if img.mode in ('RGBA', 'LA', 'P'):
+                # Flatten transparency onto white; JPEG has no alpha channel
+                rgba = img.convert('RGBA')
+                img = Image.new('RGB', rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.save(buffer, 'JPEG', quality=quality, optimize=True)
+        else:
+            img.save(buffer, 'PNG', optimize=True)
+
+    processed = buffer.getvalue()
+    return processed if resized or len(processed) < len(data) else data
+
+
+class ImagePipeline:
+    """Prepare screenshots on a thread pool ahead of the render loop.
+
+    Each referenced file is read, hashed and processed once; a screenshot
+    referenced by several findings (or under several paths) resolves to the
+    same bytes and is stored once in the .docx package.
+
+    With `cache_dir`, processed bytes are kept in a persistent DiskCache keyed
+    by content hash and render parameters. `known_hashes` maps image paths to
+    SHA-256 digests computed at upload time; for those, a cache hit costs only
+    the lookup and the original file is never read.
+
+    `executor` is a thread pool to use instead of one of its own (see
+    start_executor); it is left running by close().
+    """
+
+    def __init__(self, target_dpi=150, image_format='keep', quality=85, max_workers=None,
+                 cache_dir=None, cache_max_bytes=512 * 1024 * 1024, known_hashes=None, executor=None):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of {', '.join(IMAGE_FORMATS)}")
+        self.target_width = int(DISPLAY_WIDTH_INCHES * target_dpi)
+        self.image_format = image_format
+        self.quality = quality
+        self.cache = DiskCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.known_hashes = {os.path.normpath(path): sha256 for path, sha256 in (known_hashes or {}).items()}
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers or default_workers(),
+                                                       thread_name_prefix='images')
+        self.lock = threading.Lock()
+        self.by_path = {}  # path -> Future[ProcessedImage | None]
+        self.by_hash = {}  # sha256 of original bytes -> Future[processed bytes]
+        self.released = OrderedDict()  # sha256 -> size of released images still in by_hash, oldest first
+        self.released_bytes = 0
+        # files: distinct paths resolved; unique: distinct contents processed (cache misses);
+        # seconds: processing time summed over workers; wait_seconds: time the render loop waited
+        self.stats = {'files': 0, 'unique': 0, 'cache_hits': 0, 'bytes_in': 0, 'bytes_out': 0,
+                      'seconds': 0.0, 'wait_seconds': 0.0}
+
+    def submit(self, path):
+        """Start preparing the image at `path` if it is not already queued."""
+        with self.lock:
+            future = self.by_path.get(path)
+            if future is None:
+                future = self.by_path[path] = self.executor.submit(self._load, path)
+        return future
+
+    def get(self, path):
+        """Return the ProcessedImage for `path`, or None if it is missing or unreadable."""
+        future = self.submit(path)
+        if future.done():
+            return future.result()
+        start = time.perf_counter()
+        image = future.result()
+        with self.lock:
+            self.stats['wait_seconds'] += time.perf_counter() - start
+        return image
+
+    def prefetch(self, rows, references, window=32):
+        """Yield `rows` unchanged while queueing the images of the next `window` rows.
+
+        `references(row)` returns the image paths a row will embed.
+        """
+        pending = deque()
+        for row in rows:
+            for path in references(row):
+                self.submit(path)
+            pending.append(row)
+            if len(pending) > window:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    def release(self, paths):
+        """Let go of the prepared images for `paths` once a streamed render has written them.
+
+        Their bytes stay available to identical screenshots of later findings
+        until RELEASED_BYTES of released images are kept; then the oldest are
+        dropped and prepared again (from the disk cache, if any) when needed.
+        """
+        with self.lock:
+            for path in paths:
+                future = self.by_path.pop(path, None)
+                if future is None or not future.done() or future.exception() is not None:
+                    continue
+                image = future.result()
+                if image is not None and image.sha256 not in self.released:
+                    self.released[image.sha256] = len(image.data)
+                    self.released_bytes += len(image.data)
+            while self.released_bytes > RELEASED_BYTES:
+                sha256, size = self.released.popitem(last=False)
+                self.by_hash.pop(sha256, None)
+                self.released_bytes -= size
+
+    def close(self):
+        if self.own_executor:
+            self.executor.shutdown(wait=True)
+            return
+        # A shared pool outlives the pipeline: drop what is still queued and wait for what is running
+        with self.lock:
+            futures = list(self.by_path.values())
+        for future in futures:
+            if not future.cancel():
+                future.exception()
+
+    def summary(self):
+        stats = self.stats
+        return (f"Images: {stats['files']} files ({stats['unique']} processed, {stats['cache_hits']} from cache), "
+                f"{stats['bytes_in'] / 1024:.0f} KB -> {stats['bytes_out'] / 1024:.0f} KB, "
+                f"processed in {stats['seconds']:.2f}s, render waited {stats['wait_seconds']:.2f}s")
+
+    def _load(self, path):
+        data = None
+        sha256 = self.known_hashes.get(os.path.normpath(path))
+        if sha256 is None:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+            sha256 = hashlib.sha256(data).hexdigest()
+
+        # Identical content under another path is prepared only once
+        with self.lock:
+            future = self.by_hash.get(sha256)
+            owner = future is None
+            if owner:
+                future = self.by_hash[sha256] = Future()
+        if owner:
+            try:
+                future.set_result(self._prepare(path, sha256, data))
+            except BaseException as e:
+                future.set_exception(e)
+        processed = future.result()
+        if processed is None:
+            return None
+        with self.lock:
+            self.stats['files'] += 1
+        return ProcessedImage(processed, sha256)
+
+    def _prepare(self, path, sha256, data):
+        key = None
+        if self.cache is not None:
+            key = cache_key(sha256, self.target_width, self.image_format, self.quality, PIPELINE_VERSION)
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self.lock:
+                    self.stats['cache_hits'] += 1
+                return cached
+
+        if data is None:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                return None
+
+        start = time.perf_counter()
+        try:
+            processed = process_image(data, self.target_width, self.image_format, self.quality)
+        except Exception:
+            processed = data  # Not an image Pillow can read; embed it as uploaded
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.stats['unique'] += 1
+            self.stats['bytes_in'] += len(data)
+            self.stats['bytes_out'] += len(processed)
+            self.stats['seconds'] += elapsed
+        if key is not None:
+            self.cache.put(key, processed)
+        return processed
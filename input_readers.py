@@ -0,0 +1,286 @@
+"""Findings readers by file format: .xlsx workbooks and CSV, JSON Lines and Parquet exports.
+
+Every reader returns (columns, rows) like workbook_reader.open_findings:
+the header and a generator of (values, severity_hex) tuples, with NaN for
+empty cells, so exports go through the same "Proof of Concept onwards"
+column handling and rendering as workbooks. Exports have no cell fills; the
+Severity color comes from a "Severity Color" column (RRGGBB) when there is
+one, or else from a severity -> color mapping (DEFAULT_SEVERITY_COLORS
+unless configured). The color column itself is never rendered.
+
+Readers are looked up by file extension in READERS; register more with
+@findings_reader('.ext').
+"""
+import csv
+import functools
+import io
+import json
+import math
+import os
+import re
+
+from workbook_reader import cell_text, open_findings, read_columns as read_workbook_columns, unique_columns
+
+# Severity fill colors of the workbooks this replaces, by severity (case-insensitive)
+DEFAULT_SEVERITY_COLORS = {
+    'critical': 'C00000',
+    'high': 'FF0000',
+    'medium': 'FFC000',
+    'low': '92D050',
+    'informational': '00B0F0',
+    'info': '00B0F0',
+}
+COLOR_COLUMN = 'severity color'  # Explicit per-row color, matched case-insensitively
+
+HEX_COLOR = re.compile(r'#?([0-9A-Fa-f]{6})')
+
+# Readers by lower-case file extension
+READERS = {}
+
+
+class InputError(ValueError):
+    """Raised when a findings file cannot be read in its format."""
+
+
+@functools.lru_cache(maxsize=None)
+def load_parquet():
+    """pyarrow.parquet, imported on first use as pyarrow is slow to import; None without pyarrow."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:  # Parquet exports need pyarrow; the other formats don't
+        return None
+    return pq
+
+
+def findings_reader(*extensions):
+    """Register the decorated function as the reader of files with these extensions."""
+    def register(reader):
+        for extension in extensions:
+            READERS[extension] = reader
+        return reader
+    return register
+
+
+def parse_severity_colors(spec):
+    """Parse 'High=FF0000,Medium=#FFC000' into a mapping on top of DEFAULT_SEVERITY_COLORS."""
+    colors = dict(DEFAULT_SEVERITY_COLORS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        severity, _, color = item.partition('=')
+        match = HEX_COLOR.fullmatch(color.strip())
+        if not severity.strip() or not match:
+            raise ValueError(f"Invalid severity color '{item}'; expected Severity=RRGGBB.")
+        colors[severity.strip().lower()] = match.group(1).upper()
+    return colors
+
+
+def input_format(source, fmt=None):
+    """The extension picking the reader for `source`: `fmt`, the path's, or '.xlsx' for streams and unknown ones."""
+    if fmt is None and isinstance(source, (str, os.PathLike)):
+        fmt = os.path.splitext(os.fspath(source))[1]
+    fmt = (fmt or '.xlsx').lower()
+    fmt = fmt if fmt.startswith('.') else '.' + fmt
+    return fmt if fmt in READERS else '.xlsx'  # openpyxl also reads .xlsm and the like
+
+
+def open_input(source, fmt=None, severity_colors=None):
+    """Open the findings in `source` (a path, or a binary stream with `fmt`) with the reader for its format.
+
+    Raises KeyError if there is no "Severity" column, like open_findings.
+    """
+    columns, rows = READERS[input_format(source, fmt)](source, severity_colors)
+    if not any(str(col).strip().lower() == 'severity' for col in columns):
+        rows.close()
+        raise KeyError('severity')
+    return columns, rows
+
+
+def read_columns(source, first_column, fmt=None):
+    """Like workbook_reader.read_columns, for any format: the header and the raw values from `first_column` on."""
+    fmt = input_format(source, fmt)
+    if fmt == '.xlsx':
+        return read_workbook_columns(source, first_column)
+    columns, records = READERS[fmt](source)
+    first_idx = next((idx for idx, col in enumerate(columns) if str(col).strip().lower() == first_column), None)
+
+    def rows():
+        try:
+            if first_idx is None:
+                return
+            for values, _ in records:
+                yield tuple(None if cell_text(values[col]) == '' else values[col] for col in columns[first_idx:])
+        finally:
+            records.close()
+
+    return columns, rows()
+
+
+@findings_reader('.xlsx')
+def open_workbook(source, severity_colors=None):
+    """Workbooks keep their Severity cell fills; the mapping is not used."""
+    return open_findings(source)
+
+
+def open_binary(source):
+    """A binary file for `source`, and whether it was opened here (and must be closed)."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    return source, False
+
+
+def plain_value(value):
+    """An export value as open_findings would report it: NaN when empty, lists as comma-separated text."""
+    if value is None or value == '':
+        return math.nan
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)  # Image columns hold comma-separated paths
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+def records(columns, row_values, severity_colors=None):
+    """Turn rows of export values into (values, severity_hex) records, as open_findings yields them.
+
+    The "Severity Color" column is taken out of the columns returned.
+    """
+    lookup = {str(col).strip().lower(): col for col in columns}
+    severity_col = lookup.get('severity')
+    color_col = lookup.get(COLOR_COLUMN)
+    colors = DEFAULT_SEVERITY_COLORS if severity_colors is None else severity_colors
+    shown = [col for col in columns if col != color_col]
+
+    def rows():
+        pending_blank = []  # Blank rows are only kept if data follows, as in workbooks
+        try:
+            for values in row_values:
+                match = HEX_COLOR.fullmatch(cell_text(values.get(color_col))) if color_col is not None else None
+                severity_hex = match.group(1).upper() if match else colors.get(cell_text(values.get(severity_col)).lower())
+                record = ({col: values[col] for col in shown}, severity_hex)
+                if all(cell_text(value) == '' for value in record[0].values()):
+                    pending_blank.append(record)
+                    continue
+                yield from pending_blank
+                pending_blank.clear()
+                yield record
+        finally:
+            row_values.close()
+
+    return shown, rows()
+
+
+@findings_reader('.csv')
+def open_csv(source, severity_colors=None):
+    """CSV with a header row (UTF-8, optionally with a BOM); quoted values may span lines."""
+    f, owned = open_binary(source)
+    try:
+        text = io.TextIOWrapper(f, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        try:
+            header = next(reader, [])
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise csv_error(e, f, reader)
+        columns = unique_columns([value.strip() or None for value in header])
+        width = len(columns)
+
+        def row_values():
+            try:
+                for row in reader:
+                    if not row:
+                        continue  # Blank line
+                    row = row[:width] + [''] * (width - len(row))
+                    yield {col: plain_value(value) for col, value in zip(columns, row)}
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise csv_error(e, f, reader)
+            finally:
+                text.detach()
+                if owned:
+                    f.close()
+
+        return records(columns, row_values(), severity_colors)
+    except BaseException:
+        if owned:
+            f.close()
+        raise
+
+
+def csv_error(e, f, reader):
+    """The InputError for a CSV file that cannot be decoded or parsed, saying where.
+
+    Text is decoded a chunk at a time, ahead of the line being parsed, so
+    decoding errors are located by their byte offset in `f` instead.
+    """
+    if isinstance(e, UnicodeDecodeError):
+        try:
+            position = f"at byte {f.tell() - len(e.object) + e.start}"
+        except (OSError, ValueError):
+            position = f"after line {reader.line_num}"
+        return InputError(f"The CSV file is not UTF-8 text ({position}); save it as \"CSV UTF-8\".")
+    return InputError(f"Line {reader.line_num} of the CSV file cannot be read: {e}")
+
+
+@findings_reader('.jsonl', '.ndjson')
+def open_jsonl(source, severity_colors=None):
+    """JSON Lines: one object per line. The columns are every key in order of first appearance.
+
+    The file is read twice, first for the keys only, so records that leave
+    out empty fields still line up.
+    """
+    f, owned = open_binary(source)
+    try:
+        columns = {}
+        for number, line in enumerate(f, 1):
+            item = parse_json_line(line, number)
+            if item is not None:
+                columns.update(dict.fromkeys(item))
+        columns = list(columns)
+        f.seek(0)
+
+        def row_values():
+            try:
+                for number, line in enumerate(f, 1):
+                    item = parse_json_line(line, number)
+                    if item is not None:
+                        yield {col: plain_value(item.get(col)) for col in columns}
+            finally:
+                if owned:
+                    f.close()
+
+        return records(columns, row_values(), severity_colors)
+    except BaseException:
+        if owned:
+            f.close()
+        raise
+
+
+def parse_json_line(line, number):
+    """The object on one line of a JSON Lines file, or None for a blank line."""
+    if not line.strip():
+        return None
+    try:
+        item = json.loads(line)  # Bytes; a leading BOM is recognized
+    except ValueError as e:
+        raise InputError(f"Line {number} of the JSON Lines file is not valid JSON: {e}")
+    if not isinstance(item, dict):
+        raise InputError(f"Line {number} of the JSON Lines file is not a JSON object.")
+    return item
+
+
+@findings_reader('.parquet')
+def open_parquet(source, severity_colors=None, batch_size=1024):
+    """Parquet, read in record batches of `batch_size` rows; needs pyarrow."""
+    pq = load_parquet()
+    if pq is None:
+        raise InputError("Reading Parquet files needs pyarrow (pip install pyarrow).")
+    parquet = pq.ParquetFile(source)
+    columns = list(parquet.schema_arrow.names)
+
+    def row_values():
+        try:
+            for batch in parquet.iter_batches(batch_size=batch_size):
+                for item in batch.to_pylist():
+                    yield {col: plain_value(item[col]) for col in columns}
+        finally:
+            if hasattr(parquet, 'close'):  # pyarrow 8+
+                parquet.close()
+
+    return records(columns, row_values(), severity_colors)
@@ -0,0 +1,454 @@
+import collections
+import gc
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: renders still time out, but run without memory and CPU limits
+    resource = None
+
+from disk_cache import cache_key, sha256_file
+from evidence_store import link_or_copy
+from generate_document import ENGINE_VERSION, OUTPUT_FILE, ReportError, preload, render_report, run_next_script, \
+    stream_report
+from image_pipeline import PIPELINE_VERSION, start_executor
+from metrics import record_render, registry, renders_stopped, results_reused
+
+logger = logging.getLogger('docgen.jobs')
+
+# Job states reported by /jobs/<id>
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+PREVIEW = 'preview'  # Uploads kept for /preview, never rendered
+
+# Retry-After estimate until a render has finished
+DEFAULT_RENDER_SECONDS = 10
+
+OUT_OF_MEMORY = "The render ran out of memory; try a smaller workbook or fewer, smaller images."
+# Built ahead of time: sending it must not need memory the failed render may not have released
+OUT_OF_MEMORY_RESULT = (FAILED, OUT_OF_MEMORY, {'stopped': 'memory'})
+
+# Fork from the pre-warmed parent where available so each worker starts with
+# openpyxl/python-docx/Pillow already imported; fall back to spawn elsewhere.
+if 'fork' in multiprocessing.get_all_start_methods():
+    MP_CONTEXT = multiprocessing.get_context('fork')
+else:
+    MP_CONTEXT = multiprocessing.get_context('spawn')
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when as many jobs as it admits are already queued or running."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"The server is busy; try again in {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+def apply_limits(memory_bytes=None, cpu_seconds=None):
+    """Cap this process's address space and CPU time; also inherited by the next script.
+
+    Past the memory limit allocations fail with MemoryError; past the CPU
+    limit the kernel sends SIGXCPU, and SIGKILL five seconds later.
+    """
+    if resource is None:
+        return
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+
+
+def caused_by_memory(error, limits):
+    """Whether `error` is how running out of memory surfaced: a MemoryError, or an error raised from one.
+
+    Under a memory limit, a thread that cannot get the address space for its
+    stack fails to start with a RuntimeError rather than a MemoryError.
+    """
+    if isinstance(error, RuntimeError) and limits.get('memory_bytes') and str(error) == "can't start new thread":
+        return True
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, MemoryError):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def render_job(excel_path, template_path, workspace, next_script, render_options, conn, stream=False,
+               limits=None, memory_error=None):
+    """Worker process entry point: render one job inside its workspace.
+
+    With `stream`, the report is written to disk finding by finding
+    (stream_report), unless post-processing hooks need it in memory. `limits` holds the 'memory_bytes' and 'cpu_seconds'
+    for apply_limits and the 'timeout' the parent enforces, of which the
+    next script gets what is left. Sends (status, error, stats) back over
+    `conn`; stats are the render timings and counts, recorded into the
+    metrics registry by the parent. `memory_error`, a shared flag, is set
+    before an out-of-memory failure is reported, so the parent still knows
+    the cause when the worker dies before the report gets through.
+    """
+    start = time.monotonic()
+    limits = limits or {}
+    stats = {}
+    out_of_memory = False
+    try:
+        # Import what the render loads on first use before the address space is capped (a no-op after a warm start)
+        preload()
+        # Start the image threads too: under the limit a thread may fail to start, or die before running its work
+        image_options = dict(render_options.get('image_options') or {})
+        image_options['executor'] = start_executor(image_options.get('max_workers'))
+        render_options = {**render_options, 'image_options': image_options}
+        apply_limits(limits.get('memory_bytes'), limits.get('cpu_seconds'))
+        output_path = os.path.join(workspace, OUTPUT_FILE)
+        if stream and not render_options.get('post_processors'):
+            stream_report(excel_path, template_path, output_path, image_dir=workspace, stats=stats,
+                          **render_options)
+        else:
+            report = render_report(excel_path, template_path, image_dir=workspace, stats=stats, **render_options)
+            with open(output_path, 'wb') as f:
+                f.write(report)
+        if next_script:
+            timeout = limits.get('timeout')
+            run_next_script(next_script, cwd=workspace, stats=stats,
+                            timeout=max(1, timeout - (time.monotonic() - start)) if timeout else None)
+        conn.send((DONE, None, stats))
+    except Exception as e:
+        if caused_by_memory(e, limits):
+            out_of_memory = True  # Reported below, once the traceback no longer holds the partial document
+        else:
+            try:
+                conn.send((FAILED, str(e) if isinstance(e, ReportError) else traceback.format_exc(limit=5), stats))
+            except MemoryError:
+                out_of_memory = True
+    try:
+        if out_of_memory:
+            if memory_error is not None:
+                memory_error.value = 1
+            gc.collect()
+            conn.send(OUT_OF_MEMORY_RESULT)
+    finally:
+        conn.close()
+
+
+class Job:
+    """A single render request and its isolated workspace."""
+
+    def __init__(self, job_id, workspace):
+        self.id = job_id
+        self.workspace = workspace
+        self.status = QUEUED
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.result_key = None  # Identifies the report by its inputs; the download's ETag
+        self.cached = False  # Finished from the result cache without rendering
+        self.evidence = None  # EvidenceIndex report on the images the sheet references
+        self.image_hashes = {}  # SHA-256 of each image saved in the workspace, by path
+
+    @property
+    def output_path(self):
+        return os.path.join(self.workspace, OUTPUT_FILE)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished,
+            'cached': self.cached,
+            'evidence': self.evidence,
+        }
+
+
+class JobManager:
+    """Run render jobs on a bounded set of worker processes.
+
+    Each job gets its own temporary workspace holding its uploads and output.
+    At most `max_workers` renders run at once; further jobs wait in the queue.
+    Finished jobs and their workspaces are removed `ttl` seconds after they end.
+    `render_options` are extra keyword arguments for render_report, and
+    `next_script` a legacy post-processing script run on each saved report.
+
+    With a `template_cache` (a TemplateCache), templates are prepared in this
+    process and forked workers render from a copy of the cached template
+    instead of loading the .docx again. With `stream`, workers write reports
+    to disk as they render them, keeping their memory use flat. With a
+    `result_cache` (a DiskCache), finished reports are kept by the hash of
+    their inputs and identical submissions are answered from there.
+
+    Admission and limits: submit() refuses new renders once `max_pending`
+    are queued or running. A render still going after `timeout` seconds is
+    terminated, and each worker process runs with at most `memory_limit`
+    bytes of address space and `cpu_limit` seconds of CPU time (None or 0
+    for no limit).
+
+    `on_discard(job)`, when given, is called before a job's workspace is
+    deleted, whether the reaper or a caller discards it, to release what
+    was opened from it.
+    """
+
+    def __init__(self, root=None, max_workers=2, ttl=3600, next_script=None, render_options=None,
+                 template_cache=None, stream=False, result_cache=None, max_pending=None, timeout=None,
+                 memory_limit=None, cpu_limit=None, on_discard=None):
+        self.root = root or tempfile.mkdtemp(prefix='docgen-jobs-')
+        os.makedirs(self.root, exist_ok=True)
+        self.ttl = ttl
+        # Resolve now: workers run with the job workspace as their working directory
+        self.next_script = os.path.abspath(next_script) if next_script else None
+        self.render_options = render_options or {}
+        self.template_cache = template_cache
+        self.stream = stream
+        self.result_cache = result_cache
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout or None
+        self.limits = {'memory_bytes': memory_limit, 'cpu_seconds': cpu_limit, 'timeout': self.timeout}
+        self.on_discard = on_discard
+        self.pending = 0  # Renders submitted and not finished yet
+        self.durations = collections.deque(maxlen=20)  # Recent render times, for Retry-After
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render')
+        self.reaper = threading.Thread(target=self._reap_forever, name='job-reaper', daemon=True)
+        self.reaper.start()
+
+    def create_job(self, preview=False):
+        """Create a job and its empty workspace; uploads are saved there before submit().
+
+        A `preview` job only holds uploads for the HTML preview; it is never
+        submitted and expires `ttl` seconds after it was last looked at.
+        """
+        job_id = uuid.uuid4().hex
+        workspace = os.path.join(self.root, job_id)
+        os.makedirs(workspace)
+        job = Job(job_id, workspace)
+        if preview:
+            job.status = PREVIEW
+            job.finished = job.created
+        with self.lock:
+            self.jobs[job_id] = job
+        return job
+
+    def result_key(self, job, excel_sha256, template_sha256, image_hashes):
+        """Identify the report `job` would produce: the hashes of its inputs and of everything rendering them.
+
+        `image_hashes` maps the image paths in the job's workspace to their
+        SHA-256 digests; the engine and image pipeline versions, the render
+        options and the next script are part of the key too.
+        """
+        images = sorted((os.path.relpath(path, job.workspace), sha256) for path, sha256 in image_hashes.items())
+        next_script = sha256_file(self.next_script) if self.next_script and os.path.exists(self.next_script) else None
+        return cache_key(excel_sha256, template_sha256, images, ENGINE_VERSION, PIPELINE_VERSION,
+                         sorted(self.render_options.items()), next_script)
+
+    def submit(self, job, excel_path, template_path, template_sha256=None, result_key=None, **options):
+        """Queue the job for rendering and return immediately.
+
+        `template_sha256` is the template's content hash when already known.
+        `options` are per-job keyword arguments for render_report, on top of
+        the manager's render_options.
+
+        With a `result_key` (see result_key()), a job for the same inputs that
+        is still queued, running or available is returned instead, and this
+        one discarded; otherwise a report in the result cache finishes the job
+        at once. Returns the job that will have the report. Raises QueueFull,
+        leaving the job for the caller to discard, when it would have to render
+        and max_pending renders are already waiting or running.
+        """
+        same = None
+        with self.lock:
+            # Checked and claimed under one lock, so of two identical submissions only one renders,
+            # and only a job that got a render slot can be found by others
+            if result_key is not None:
+                same = next((other for other in self.jobs.values() if other.result_key == result_key and (
+                    other.status in (QUEUED, RUNNING) or other.status == DONE and os.path.exists(other.output_path))),
+                    None)
+            admitted = same is None and (self.max_pending is None or self.pending < self.max_pending)
+            if admitted:
+                self.pending += 1
+                job.result_key = result_key
+        if same is not None:
+            self.discard(job)
+            with registry.lock:
+                results_reused.inc(source='job')
+            return same
+        if result_key is not None and self.finish_from_cache(job, result_key):
+            if admitted:
+                with self.lock:
+                    self.pending -= 1
+            with registry.lock:
+                results_reused.inc(source='cache')
+            return job
+        if not admitted:
+            raise QueueFull(self.retry_after())
+        self.executor.submit(self._run, job, excel_path, template_path, template_sha256,
+                             {**self.render_options, **options})
+        return job
+
+    def finish_from_cache(self, job, result_key):
+        """Finish `job` with the cached report for `result_key`; False if there is none."""
+        path = self.result_cache.get_path(result_key) if self.result_cache is not None else None
+        if path is None:
+            return False
+        try:
+            link_or_copy(path, job.output_path)
+        except OSError:
+            return False  # Evicted in the meantime
+        job.result_key = result_key
+        job.cached = True
+        job.finished = time.time()
+        job.status = DONE
+        return True
+
+    def retry_after(self):
+        """Seconds until a render slot is likely to free up, from the recent render times."""
+        with self.lock:
+            average = sum(self.durations) / len(self.durations) if self.durations else DEFAULT_RENDER_SECONDS
+            waiting = max(1, self.pending - self.max_workers + 1)
+        return max(1, math.ceil(average * waiting / self.max_workers))
+
+    def full(self):
+        """True when submit() would refuse a render; lets callers refuse before reading the uploads."""
+        with self.lock:
+            return self.max_pending is not None and self.pending >= self.max_pending
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def queue_depth(self):
+        """Number of jobs waiting for or occupying a worker."""
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def discard(self, job):
+        """Forget a job and delete its workspace."""
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        if self.on_discard is not None:
+            try:
+                self.on_discard(job)
+            except Exception as e:
+                logger.warning("Could not release job %s: %s", job.id, e)
+        shutil.rmtree(job.workspace, ignore_errors=True)
+
+    def prepare_template(self, template_path, template_sha256=None):
+        """The cached PreparedTemplate for `template_path`, or the path itself.
+
+        Only forked workers can share the parsed template; spawned ones and
+        templates that fail to load get the path, so the worker reports the
+        error as usual.
+        """
+        if self.template_cache is None or MP_CONTEXT.get_start_method() != 'fork':
+            return template_path
+        try:
+            return self.template_cache.get(template_path, template_sha256)
+        except Exception as e:
+            logger.warning("Could not prepare template %s (%s); the worker will load it", template_path, e)
+            return template_path
+
+    def _run(self, job, excel_path, template_path, template_sha256, render_options):
+        try:
+            self._render(job, excel_path, template_path, template_sha256, render_options)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def _render(self, job, excel_path, template_path, template_sha256, render_options):
+        job.status = RUNNING
+        started = time.monotonic()
+        template = self.prepare_template(template_path, template_sha256)
+        parent_conn, child_conn = MP_CONTEXT.Pipe(duplex=False)
+        memory_error = MP_CONTEXT.RawValue('b', 0)
+        process = MP_CONTEXT.Process(
+            target=render_job,
+            args=(excel_path, template, job.workspace, self.next_script, render_options, child_conn, self.stream,
+                  self.limits, memory_error),
+            daemon=True,
+        )
+        stopped = None  # Why the render was cut short, for the metrics
+        try:
+            process.start()
+            child_conn.close()
+            if parent_conn.poll(self.timeout):
+                try:
+                    status, error, stats = parent_conn.recv()
+                except EOFError:
+                    status, error, stats = FAILED, None, {}
+                process.join()
+                stopped = stats.pop('stopped', None)
+                if process.exitcode is not None and process.exitcode < 0:
+                    # Killed by a signal: SIGXCPU/SIGKILL from the CPU limit, or the OOM killer
+                    stopped = 'cpu' if process.exitcode == -getattr(signal, 'SIGXCPU', 0) else 'signal'
+                if status == FAILED and error is None and stopped is None and memory_error.value:
+                    # Died before it could report: a MemoryError that even the error report ran into
+                    stopped, error = 'memory', OUT_OF_MEMORY
+                if status == FAILED and error is None:
+                    error = f"Render worker exited unexpectedly (exit code {process.exitcode})."
+                    if stopped == 'cpu':
+                        error = "The render used up its CPU time limit and was stopped."
+            else:
+                self.stop(process)
+                stopped = 'timeout'
+                status, error, stats = FAILED, f"The render took longer than {self.timeout} seconds and was stopped.", {}
+                logger.warning("Job %s timed out after %s s; worker stopped", job.id, self.timeout)
+        except Exception as e:
+            status, error, stats = FAILED, str(e), {}
+        finally:
+            parent_conn.close()
+        if stats.get('evidence') is not None:
+            job.evidence = stats.pop('evidence')
+        record_render(stats, status)
+        if stopped is not None:
+            with registry.lock:
+                renders_stopped.inc(reason=stopped)
+        if status == DONE:
+            with self.lock:
+                self.durations.append(time.monotonic() - started)
+        if status == DONE and job.result_key is not None and self.result_cache is not None:
+            try:
+                self.result_cache.add_file(job.result_key, job.output_path)
+            except OSError as e:
+                logger.warning("Could not cache the report of job %s: %s", job.id, e)
+        job.error = error
+        job.finished = time.time()
+        job.status = status
+
+    @staticmethod
+    def stop(process, grace=5):
+        """Terminate a worker process, and kill it if it is still there after `grace` seconds."""
+        process.terminate()
+        process.join(grace)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def cleanup_expired(self, now=None):
+        """Remove finished jobs (and their workspaces) older than the TTL."""
+        now = time.time() if now is None else now
+        with self.lock:
+            expired = [job for job in self.jobs.values()
+                       if job.finished is not None and now - job.finished > self.ttl]
+        for job in expired:
+            self.discard(job)
+        return len(expired)
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(max(1, min(self.ttl, 60)))
+            self.cleanup_expired()
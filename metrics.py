@@ -0,0 +1,131 @@
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger('docgen.timing')
+
+# Seconds; covers a handful of findings up to several-thousand-row reports
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+@contextlib.contextmanager
+def span(name, stats=None):
+    """Time a pipeline step, log it, and record it in `stats['steps']` when given."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.info("step=%s seconds=%.3f", name, elapsed)
+        if stats is not None:
+            stats.setdefault('steps', {})[name] = stats.get('steps', {}).get(name, 0.0) + elapsed
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labelled=False):
+        self.name = name
+        self.help_text = help_text
+        self.values = {} if labelled else {(): 0}  # Unlabelled counters are reported from zero
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{format_labels(dict(key))} {value}')
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from `callback` at scrape time."""
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge',
+                f'{self.name} {self.callback()}']
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, series in sorted(self.series.items()):
+            labels = dict(key)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{format_labels({**labels, "le": bound})} {count}')
+            lines.append(f'{self.name}_bucket{format_labels({**labels, "le": "+Inf"})} {series[-1]}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {series[-1]}')
+        return lines
+
+
+class Registry:
+    """Metrics of the web app, rendered in the Prometheus text format by /metrics."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self.lock:
+            lines = [line for metric in self.metrics for line in metric.render()]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+render_duration = registry.add(Histogram('docgen_render_duration_seconds', 'Time to render one report.'))
+step_duration = registry.add(Histogram('docgen_step_duration_seconds', 'Time spent in each pipeline step.'))
+jobs_finished = registry.add(Counter('docgen_jobs_total', 'Render jobs finished, by status.', labelled=True))
+findings_rendered = registry.add(Counter('docgen_findings_rendered_total', 'Findings written to reports.'))
+images_embedded = registry.add(Counter('docgen_images_embedded_total', 'Screenshots embedded in reports.'))
+bytes_produced = registry.add(Counter('docgen_output_bytes_total', 'Size of the generated .docx files.'))
+results_reused = registry.add(Counter('docgen_results_reused_total',
+                                     'Submissions answered with an existing report, by source.', labelled=True))
+jobs_rejected = registry.add(Counter('docgen_jobs_rejected_total',
+                                    'Submissions refused because the render queue was full.'))
+renders_stopped = registry.add(Counter('docgen_renders_stopped_total',
+                                      'Renders cancelled or killed at a limit, by reason.', labelled=True))
+
+
+def record_render(stats, status):
+    """Add the `stats` of one finished render (see render_report) to the registry."""
+    with registry.lock:
+        jobs_finished.inc(status=status)
+        if 'seconds' in stats:
+            render_duration.observe(stats['seconds'])
+        for step, seconds in stats.get('steps', {}).items():
+            step_duration.observe(seconds, step=step)
+        findings_rendered.inc(stats.get('findings', 0))
+        images_embedded.inc(stats.get('images', 0))
+        bytes_produced.inc(stats.get('bytes', 0))
@@ -0,0 +1,128 @@
+from copy import deepcopy
+from docx.oxml import OxmlElement
+from docx.table import _Cell
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from lxml import etree
+from styling import (PARAGRAPH_FORMATS, DocxWriter, format_run, picture_inline, set_cell_borders, set_cell_margins,
+                     set_cell_shading)
+
+
+class FragmentWriter:
+    """Writes finding tables by cloning precompiled OOXML fragments.
+
+    Every distinct pPr (paragraph format), rPr (size/bold/color) and tcPr
+    (padding/shading/border variant) is built once by running the same
+    styling.py calls that DocxWriter uses on a scratch element, then
+    deep-copied into the table. Table skeletons are cached per row count.
+    The resulting document.xml is byte-identical to DocxWriter's.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.body = doc.element.body
+        self.reference = DocxWriter(doc)
+        self.fragments = {}
+
+    def begin_finding(self, severity_hex):
+        pass  # Fragments are keyed by color as they are used
+
+    def fragment(self, key, build):
+        """Return a fresh copy of the cached fragment for `key`, building it on first use."""
+        element = self.fragments.get(key)
+        if element is None:
+            element = self.fragments[key] = build()
+        return deepcopy(element)
+
+    def paragraph_properties(self, paragraph_format):
+        def build():
+            p = OxmlElement('w:p')
+            PARAGRAPH_FORMATS[paragraph_format](Paragraph(p, None))
+            return p.pPr
+        return self.fragment(('pPr', paragraph_format), build)
+
+    def run_properties(self, size, bold, color_hex):
+        def build():
+            r = OxmlElement('w:r')
+            format_run(Run(r, None), size, bold, color_hex)
+            return r.rPr
+        return self.fragment(('rPr', size, bold, color_hex), build)
+
+    def cell_properties(self, tc, table_key, row_index, shading_hex):
+        def build():
+            cell = _Cell(deepcopy(tc), None)
+            set_cell_margins(cell, margin_value=100)
+            if shading_hex:
+                set_cell_shading(cell, shading_hex)
+            set_cell_borders(cell, row_index)
+            return cell._tc.tcPr
+        # Borders only differ for the first two rows
+        return self.fragment(('tcPr', table_key, min(row_index, 2), shading_hex), build)
+
+    def new_paragraph(self, paragraph_format=None):
+        p = OxmlElement('w:p')
+        if paragraph_format:
+            p.append(self.paragraph_properties(paragraph_format))
+        return p
+
+    def new_run(self, text, size=None, bold=False, color_hex=None):
+        r = OxmlElement('w:r')
+        if text:
+            r.text = text
+        if size or bold or color_hex:
+            r.insert(0, self.run_properties(size, bold, color_hex))
+        return r
+
+    def add_title(self, text, size, bold=True):
+        p = self.new_paragraph('center')
+        p.append(self.new_run(text, size, bold))
+        self.body._insert_p(p)
+        return p
+
+    def add_table(self, rows):
+        key = ('tbl', rows)
+        skeleton = self.fragments.get(key)
+        if skeleton is None:
+            # Build the first table of this size through python-docx and keep an empty copy
+            tbl = self.reference.add_table(rows)._tbl
+            self.fragments[key] = deepcopy(tbl)
+        else:
+            tbl = deepcopy(skeleton)
+            self.body._insert_tbl(tbl)
+        cells = [tr.tc_lst[0] for tr in tbl.tr_lst]
+        # Cells of one skeleton share a width, so their tcPr fragments can be shared too
+        table_key = etree.tostring(cells[0].tcPr)
+        return cells, table_key
+
+    def cell(self, table, row_index):
+        cells, table_key = table
+        return cells[row_index], table_key
+
+    def style_cell(self, cell, row_index, shading_hex=None):
+        tc, table_key = cell
+        tc.replace(tc.tcPr, self.cell_properties(tc, table_key, row_index, shading_hex))
+
+    def first_paragraph(self, cell, paragraph_format):
+        p = cell[0].p_lst[0]
+        p.insert(0, self.paragraph_properties(paragraph_format))
+        return p
+
+    def add_paragraph(self, cell, paragraph_format=None, text='', size=None, bold=False, color_hex=None):
+        p = self.new_paragraph(paragraph_format)
+        if text:
+            p.append(self.new_run(text, size, bold, color_hex))
+        cell[0].append(p)
+        return p
+
+    def add_run(self, paragraph, text, size=None, bold=False, color_hex=None):
+        r = self.new_run(text, size, bold, color_hex)
+        paragraph.append(r)
+        return r
+
+    def add_picture(self, paragraph, image, width, name=None):
+        r = OxmlElement('w:r')
+        paragraph.append(r)
+        r.add_drawing(picture_inline(self.doc.part, image, width, name))
+
+    def finish_table(self, table):
+        pass  # Borders are already part of each cell's tcPr fragment
@@ -0,0 +1,55 @@
+import re
+
+from image_pipeline import IMAGE_EXTENSIONS
+from workbook_reader import cell_text
+
+# "Step 1:", "step2:", ... A capture group, so split() keeps the labels
+STEP_LABEL = re.compile(r'(Step\s*\d+:)', re.IGNORECASE)
+# Columns mentioning a step without a numbered label are steps too
+STEP_WORD = re.compile(r'\bstep\b', re.IGNORECASE)
+
+
+def parse_steps(text):
+    """Split `text` into an ordered {label: content} dict of its "StepN:" sections.
+
+    Text before the first label is dropped; a repeated label keeps its first
+    position and its last content. Returns an empty dict when there are no labels.
+    """
+    parts = STEP_LABEL.split(text)
+    return {label: content.strip() for label, content in zip(parts[1::2], parts[2::2])}
+
+
+def parse_poc(row, additional_columns):
+    """Parse the "Proof of Concept" column and the columns after it into render items.
+
+    Returns a list of ('step', label, content) and ('image', path) tuples in
+    document order. Each column is classified once: the POC column and
+    columns with step labels are split into steps (the whole value becomes
+    one "StepN:" when there are none), image columns become one item per
+    comma-separated path, and anything else is a step of its own. Fallback
+    labels count every step emitted so far, as in the rendered document.
+    Empty cells add nothing.
+    """
+    items = []
+    step_counter = 1
+
+    for col_idx, col_name in enumerate(additional_columns):
+        col_value = cell_text(row.get(col_name))
+        if not col_value:
+            continue  # No POC text, or nothing in this column
+
+        # One split both detects and parses labelled steps
+        steps = parse_steps(col_value)
+        if col_idx == 0 or steps or STEP_WORD.search(col_value):
+            if not steps:
+                steps = {f"Step{step_counter}:": col_value}
+            for label, content in steps.items():
+                items.append(('step', label, content))
+            step_counter += len(steps)
+        elif col_value.lower().endswith(IMAGE_EXTENSIONS):
+            items.extend(('image', path) for path in (p.strip() for p in col_value.split(",")) if path)
+        else:
+            items.append(('step', f"Step{step_counter}:", col_value))
+            step_counter += 1
+
+    return items
@@ -0,0 +1,58 @@
+"""Post-processing hooks: transforms applied to the finished Document before it is saved.
+
+A hook is a callable taking the python-docx Document and editing it in
+place. Hooks are named in the configuration (the CLI's --post-process, the
+web app's DOCGEN_POST_PROCESS) either by the name they were registered
+under with @post_processor, or as 'package.module:function', which is
+imported on first use. They run in the order given, each timed as its own
+pipeline step, inside the render process, so unlike the legacy next script
+(table_update.py) the report is not saved, reloaded and saved again.
+"""
+import importlib
+import logging
+
+from metrics import span
+
+logger = logging.getLogger('docgen.post_processing')
+
+# Registered hooks by name
+HOOKS = {}
+
+
+def post_processor(name):
+    """Register the decorated function as the post-processing hook `name`."""
+    def register(hook):
+        HOOKS[name] = hook
+        return hook
+    return register
+
+
+def resolve(spec):
+    """Return the hook named by `spec`: a registered name, a 'module:function' path or a callable.
+
+    Raises LookupError for names that are neither registered nor importable.
+    """
+    if callable(spec):
+        return spec
+    if spec in HOOKS:
+        return HOOKS[spec]
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise LookupError(f"Unknown post-processing hook '{spec}'; register it or name it as module:function.")
+    try:
+        return getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise LookupError(f"Cannot load post-processing hook '{spec}': {e}") from e
+
+
+def hook_name(spec):
+    return spec if isinstance(spec, str) else getattr(spec, '__name__', repr(spec))
+
+
+def run_post_processors(doc, specs, stats=None):
+    """Apply the hooks named by `specs` to `doc` in order, timing each as step 'post_process:<name>'."""
+    hooks = [(hook_name(spec), resolve(spec)) for spec in specs]  # All resolved before any runs
+    for name, hook in hooks:
+        with span(f'post_process:{name}', stats):
+            hook(doc)
+        logger.debug("ran post-processing hook %s", name)
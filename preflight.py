@@ -0,0 +1,130 @@
+"""Check a workbook, a template and their screenshots before anything is rendered.
+
+The checks cover what otherwise only shows up in the middle of a render:
+missing "Severity" or "Proof of Concept" columns, a template without a
+matching findings table, template rows with no column to fill them, and
+screenshot references that would be skipped. Only the header row and the
+cells from the "Proof of Concept" column on are read, as plain values, so
+even large workbooks are checked in a fraction of a render's time.
+"""
+import logging
+import math
+import os
+import time
+
+from docx import Document
+
+from image_pipeline import IMAGE_EXTENSIONS
+from poc_parser import parse_poc
+from input_readers import InputError, input_format, read_columns
+
+logger = logging.getLogger('docgen.preflight')
+
+
+def template_tables(template):
+    """First-column texts of the template's tables; `template` is a path, stream or PreparedTemplate."""
+    doc = template.doc if hasattr(template, 'doc') else Document(template)
+    return [[row.cells[0].text.strip() for row in table.rows] for table in doc.tables]
+
+
+def preflight(excel_path, template, image_dir=None, evidence=None, check_images=True, fmt=None):
+    """Check `excel_path` against `template` and report what the render would run into.
+
+    `excel_path` may be a CSV, JSON Lines or Parquet export too; `fmt` gives
+    the extension of a stream's format.
+
+    Image references are resolved like render_finding does, against
+    `image_dir` (the working directory when None); with `evidence`, an
+    EvidenceIndex (which may list files that have not been uploaded yet),
+    they are looked up there instead; `check_images=False` only counts them.
+    Returns a dict with the 'errors' that would fail the render, the
+    'warnings' about findings that would come out incomplete, and the number
+    of 'images' referenced; with `evidence`, also its 'evidence' report.
+    """
+    start = time.perf_counter()
+    errors, warnings = [], []
+    images = 0
+    lookups = {}
+
+    # The template: the first column of every table holds the row headers
+    tables = None
+    try:
+        tables = template_tables(template)
+    except FileNotFoundError:
+        errors.append(f"Word template '{template}' not found.")
+    except Exception as e:
+        logger.debug("Cannot read the template: %s", e)
+        errors.append("The Word template is not a valid .docx file.")
+
+    # The workbook: its header row, then only the POC and following columns
+    try:
+        columns, rows = read_columns(excel_path, 'proof of concept', fmt)
+    except FileNotFoundError:
+        errors.append(f"Excel file '{excel_path}' not found.")
+        columns, rows = None, iter(())
+    except InputError as e:
+        errors.append(str(e))
+        columns, rows = None, iter(())
+    except Exception as e:
+        logger.debug("Cannot read the workbook: %s", e)
+        if input_format(excel_path, fmt) == '.xlsx':
+            errors.append("The Excel sheet is not a valid .xlsx file.")
+        else:
+            errors.append(f"The findings file is not a valid {input_format(excel_path, fmt)} file.")
+        columns, rows = None, iter(())
+
+    if columns is not None:
+        excel_columns_normalized = {str(col).strip().lower(): col for col in columns}
+        if 'severity' not in excel_columns_normalized:
+            errors.append("'Severity' column not found in the Excel header.")
+        if 'proof of concept' not in excel_columns_normalized:
+            errors.append("'Proof of Concept' column not found in the Excel sheet.")
+
+        # The same table detach_matching_table would pick, and the rows it would leave empty
+        if tables is not None:
+            row_headers = next((headers for headers in tables
+                                if headers and headers[0].lower() in excel_columns_normalized), None)
+            if row_headers is None:
+                errors.append("No matching table found in the template.")
+            else:
+                for header in row_headers:
+                    if header.lower() != 'proof of concept' and header.lower() not in excel_columns_normalized:
+                        warnings.append(f"Template row '{header}' has no matching column in the Excel sheet "
+                                        f"and will be empty.")
+
+        # Screenshot references, parsed as render_finding parses them
+        poc_index = next((idx for idx, col in enumerate(columns) if str(col).strip().lower() == 'proof of concept'),
+                         len(columns))
+        additional_columns = columns[poc_index:]
+        try:
+            for number, values in enumerate(rows, 1):
+                row = {col: (math.nan if value is None else value) for col, value in zip(additional_columns, values)}
+                for item in parse_poc(row, additional_columns):
+                    if item[0] != 'image':
+                        continue
+                    path = item[1]
+                    images += 1
+                    if not path.lower().endswith(IMAGE_EXTENSIONS):
+                        warnings.append(f"Finding {number}: '{path}' is not a .png, .jpg or .jpeg image "
+                                        f"and will be skipped.")
+                    elif check_images and evidence is not None:
+                        match = lookups[path] = evidence.lookup(path)
+                        if match[0] is None:
+                            warnings.append(f"Finding {number}: image '{path}' will be skipped, as "
+                                            f"{evidence.explain(path)}.")
+                    elif check_images and not image_exists(path, image_dir):
+                        warnings.append(f"Finding {number}: image '{path}' was not found and will be skipped.")
+        except InputError as e:  # Found partway through the file
+            errors.append(str(e))
+
+    report = {'errors': errors, 'warnings': warnings, 'images': images,
+              'seconds': round(time.perf_counter() - start, 3)}
+    if evidence is not None:
+        report['evidence'] = evidence.report(lookups)
+    logger.info("Preflight: %d errors, %d warnings, %d images referenced in %.3f s",
+                len(errors), len(warnings), images, report['seconds'])
+    return report
+
+
+def image_exists(path, image_dir=None):
+    return os.path.isfile(os.path.join(image_dir, path) if image_dir else path)
@@ -1,6 +1,144 @@
-document.getElementById('upload-form').addEventListener('submit', function() {
+function showMessage(message) {
+    // Show a message in the alert box above the form
+    let alert = document.getElementById('job-alert');
+    alert.textContent = message;
+    alert.style.display = 'block';
+}
+
+function resetForm() {
+    document.getElementById('loading').style.display = 'none';
+    document.getElementById('generate-btn').disabled = false;
+    document.getElementById('preview-btn').disabled = false;
+}
+
+function sha256Hex(file) {
+    return file.arrayBuffer()
+        .then(buffer => crypto.subtle.digest('SHA-256', buffer))
+        .then(digest => Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join(''));
+}
+
+function negotiateImages(form, formData) {
+    // Send the server a manifest of image hashes and upload only the images it doesn't have yet.
+    // Without Web Crypto (plain http to a remote host) every image is uploaded as before.
+    let files = Array.from(document.getElementById('image_folder').files)
+        .filter(file => /\.(png|jpe?g)$/i.test(file.name));
+    if (!files.length || !window.crypto || !crypto.subtle) {
+        return Promise.resolve(formData);
+    }
+    let manifest = {};
+    // Hash one file at a time so large evidence sets are never all in memory
+    let hashing = files.reduce((previous, file) => previous
+        .then(() => sha256Hex(file))
+        .then(hash => { manifest[file.webkitRelativePath || file.name] = hash; }), Promise.resolve());
+    return hashing
+        .then(() => fetch(form.dataset.manifestUrl, {
+            method: 'POST',
+            body: JSON.stringify({ files: manifest }),
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' }
+        }))
+        .then(response => response.json())
+        .then(result => {
+            let missing = new Set(result.missing);
+            formData.delete('image_folder');
+            files.forEach(file => {
+                let path = file.webkitRelativePath || file.name;
+                if (missing.has(path)) {
+                    formData.append('image_folder', file, path);
+                }
+            });
+            formData.append('image_manifest', JSON.stringify(manifest));
+            return formData;
+        })
+        .catch(() => new FormData(form));
+}
+
+function preflight(form) {
+    // Check the sheet, the template and the image paths before uploading any images.
+    // Image paths are only checked for a folder; the names in a .zip aren't known here.
+    let data = new FormData();
+    data.append('excel_file', document.getElementById('excel_file').files[0]);
+    data.append('template_file', document.getElementById('template_file').files[0]);
+    let folder = Array.from(document.getElementById('image_folder').files);
+    if (folder.length && !document.getElementById('image_archive').files.length) {
+        data.append('image_paths', JSON.stringify(folder.map(file => file.webkitRelativePath || file.name)));
+    }
+    return fetch(form.dataset.preflightUrl, {
+        method: 'POST',
+        body: data,
+        headers: { 'Accept': 'application/json' }
+    })
+        .then(response => response.json())
+        .then(report => report.error ? [report.error] : report.errors)
+        .catch(() => []);  // The server checks again before rendering
+}
+
+function pollJob(statusUrl) {
+    // Poll the job status until the document is ready, then download it
+    fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(job => {
+            if (job.status === 'done') {
+                resetForm();
+                window.location = job.download_url;
+            } else if (job.status === 'failed' || job.error) {
+                resetForm();
+                showMessage('Error generating document: ' + job.error);
+            } else {
+                setTimeout(() => pollJob(statusUrl), 1000);
+            }
+        })
+        .catch(() => setTimeout(() => pollJob(statusUrl), 2000));
+}
+
+document.getElementById('upload-form').addEventListener('submit', function(event) {
+    event.preventDefault();
     // Show loading message
     document.getElementById('loading').style.display = 'block';
-    // Disable the generate button to prevent multiple submissions
+    document.getElementById('job-alert').style.display = 'none';
+    // Disable the buttons to prevent multiple submissions
     document.getElementById('generate-btn').disabled = true;
-});
\ No newline at end of file
+    document.getElementById('preview-btn').disabled = true;
+    // The Preview button posts to /preview instead of /generate
+    let action = event.submitter && event.submitter.id === 'preview-btn' ? event.submitter.formAction : this.action;
+
+    let form = this;
+    preflight(form)
+        .then(errors => {
+            if (errors.length) {
+                let error = new Error(errors.join(' '));
+                error.preflight = true;
+                throw error;
+            }
+            return negotiateImages(form, new FormData(form));
+        })
+        .then(formData => fetch(action, {
+            method: 'POST',
+            body: formData,
+            headers: { 'Accept': 'application/json' }
+        }))
+        .then(response => response.json())
+        .then(job => {
+            if (job.error) {
+                resetForm();
+                showMessage(job.error);
+                return;
+            }
+            if (job.preview_url) {
+                window.location = job.preview_url;  // Warnings are shown on the preview page
+                return;
+            }
+            if (job.warnings && job.warnings.length) {
+                showMessage(job.warnings.join(' '));
+            }
+            if (job.status === 'done') {
+                resetForm();
+                window.location = job.download_url;  // Answered from the result cache
+                return;
+            }
+            pollJob(job.status_url);
+        })
+        .catch(error => {
+            resetForm();
+            showMessage(error.preflight ? error.message : 'Upload failed: ' + error);
+        });
+});
@@ -0,0 +1,196 @@
+import copy
+import os
+import tempfile
+import zipfile
+
+from docx.image.image import Image
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.oxml import CT_Types, serialize_part_xml
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI, PackURI
+from docx.opc.shared import CaseInsensitiveDict
+from docx.opc.spec import default_content_types
+from docx.oxml.ns import qn
+from docx.parts.image import ImagePart
+from lxml import etree
+
+from finding_cache import PICTURE_NAME
+
+# Marks where the findings go in the serialized body
+MARKER = etree.ProcessingInstruction('docgen-findings')
+MARKER_XML = etree.tostring(MARKER)
+
+
+class SpooledImagePart(ImagePart):
+    """An image part whose bytes stay in a spool file until the package is written."""
+
+    def __init__(self, partname, content_type, path, sha1):
+        super().__init__(partname, content_type, b'')
+        self.path = path
+        self._sha1 = sha1
+
+    @property
+    def blob(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    @property
+    def sha1(self):
+        return self._sha1
+
+
+def content_types_xml(parts):
+    """[Content_Types].xml for `parts`, laid out as python-docx writes it."""
+    defaults = CaseInsensitiveDict({'rels': CT.OPC_RELATIONSHIPS, 'xml': CT.XML})
+    overrides = {}
+    for part in parts:
+        ext = part.partname.ext
+        if (ext.lower(), part.content_type) in default_content_types:
+            defaults[ext] = part.content_type
+        else:
+            overrides[part.partname] = part.content_type
+    types = CT_Types.new()
+    for ext in sorted(defaults.keys()):
+        types.add_default(ext, defaults[ext])
+    for partname in sorted(overrides):
+        types.add_override(partname, overrides[partname])
+    return serialize_part_xml(types)
+
+
+class StreamingDocx:
+    """Write a .docx with its findings streamed into word/document.xml one at a time.
+
+    `doc` is the template with the findings table taken out; the findings go
+    before `anchor`, the first element that followed the table (at the end
+    of the body when None). The body is written up to there; findings are rendered into `scratch`, a copy of the template with an
+    empty body, and flush() moves what was rendered there into the output.
+    document.xml and the screenshots are spooled to a temporary directory as
+    they are written, and close() copies them into the package together with
+    the template's other parts, so memory holds one finding at a time rather
+    than the whole report.
+
+    Relationship IDs, media names, drawing IDs, style order and the order of
+    the package members follow what python-docx would have produced for the
+    same document.
+    """
+
+    def __init__(self, doc, output_path, anchor=None):
+        self.doc = doc
+        self.part = doc.part
+        self.package = doc.part.package
+        self.output_path = output_path
+        self.spool = tempfile.TemporaryDirectory(prefix='docgen-media-')
+        self.images = {image_part.sha1: image_part for image_part in self.package.image_parts}
+        self.next_drawing_id = self.part.next_id
+
+        # document.xml up to the findings, and from there (trailing content, section properties) to the end
+        head, self.tail = self.split_body(doc, anchor)
+        # Spooled rather than written to the zip, as [Content_Types].xml (which lists every image) comes first
+        self.document_path = os.path.join(self.spool.name, 'document.xml')
+        self.document = open(self.document_path, 'wb')
+        self.document.write(head)
+
+        # Findings are rendered into a copy of the template whose body only holds the marker
+        # and the section properties; its pictures go through get_or_add_image below
+        self.scratch = copy.deepcopy(self.part).document
+        body = self.scratch.element.body
+        for element in list(body):
+            if element is not body.sectPr:
+                body.remove(element)
+        self.scratch_head, self.scratch_tail = self.split_body(self.scratch, body.sectPr, keep_marker=True)
+        self.scratch_head += MARKER_XML
+        self.scratch.part.get_or_add_image = self.get_or_add_image
+        self.scratch_rels = set(self.scratch.part.rels)
+        self.scratch_styles = len(self.scratch.styles.element.style_lst)
+
+    @staticmethod
+    def split_body(doc, anchor, keep_marker=False):
+        """Serialize `doc`'s part around a marker placed before `anchor` (or at the end of the body)."""
+        marker = copy.copy(MARKER)
+        if anchor is not None:
+            anchor.addprevious(marker)
+        else:
+            doc.element.body.append(marker)
+        head, tail = doc.part.blob.split(MARKER_XML)
+        if not keep_marker:
+            marker.getparent().remove(marker)
+        return head, tail
+
+    def get_or_add_image(self, image_descriptor):
+        """Stands in for the scratch document part's get_or_add_image; returns (rId, Image)."""
+        image = Image.from_file(image_descriptor)
+        image_part = self.images.get(image.sha1)
+        if image_part is None:
+            partname = self.next_image_partname(image.ext)
+            path = os.path.join(self.spool.name, os.path.basename(partname))
+            with open(path, 'wb') as f:
+                f.write(image.blob)
+            image_part = SpooledImagePart(partname, image.content_type, path, image.sha1)
+            self.package.image_parts.append(image_part)
+            self.images[image.sha1] = image_part
+        return self.scratch.part.relate_to(image_part, RT.IMAGE), image
+
+    def next_image_partname(self, ext):
+        # The first unused number, as python-docx numbers media
+        used = {image_part.partname.idx for image_part in self.package.image_parts}
+        number = next(n for n in range(1, len(used) + 2) if n not in used)
+        return PackURI(f'/word/media/image{number}.{ext}')
+
+    def flush(self, scratch):
+        """Write what was rendered into `scratch` since the last flush and clear it."""
+        body = scratch.element.body
+        elements = [element for element in list(body)[1:] if element is not body.sectPr]  # After the marker
+        related_parts = scratch.part.related_parts
+        for element in elements:
+            for blip in element.iter(qn('a:blip')):
+                image_part = related_parts[blip.get(qn('r:embed'))]
+                blip.set(qn('r:embed'), self.part.relate_to(image_part, RT.IMAGE))
+            for doc_pr in element.iter(qn('wp:docPr')):
+                doc_pr.set('id', str(self.next_drawing_id))
+                if PICTURE_NAME.match(doc_pr.get('name', '')):
+                    doc_pr.set('name', f'Picture {self.next_drawing_id}')
+                self.next_drawing_id += 1
+
+        # Serialized in place, so namespaces are declared once on the root as in a normal save
+        blob = scratch.part.blob
+        self.document.write(blob[len(self.scratch_head):len(blob) - len(self.scratch_tail)])
+
+        for element in elements:
+            body.remove(element)
+        for rId in set(scratch.part.rels) - self.scratch_rels:
+            scratch.part.drop_rel(rId)
+        # Styles the writer defined while rendering, in the order it defined them
+        styles = scratch.styles.element.style_lst
+        for style in styles[self.scratch_styles:]:
+            self.doc.styles.element.append(copy.deepcopy(style))
+        self.scratch_styles = len(styles)
+
+    def close(self):
+        """Finish document.xml and write the rest of the package."""
+        self.document.write(self.tail)
+        self.document.close()
+        parts = list(self.package.iter_parts())
+        for part in parts:
+            part.before_marshal()
+        # Members in python-docx's order: content types, package rels, then each part followed by its rels
+        with zipfile.ZipFile(self.output_path, 'w', zipfile.ZIP_DEFLATED) as package:
+            package.writestr(CONTENT_TYPES_URI.membername, content_types_xml(parts))
+            package.writestr(PACKAGE_URI.rels_uri.membername, self.package.rels.xml)
+            for part in parts:
+                if part is self.part:
+                    package.write(self.document_path, part.partname.membername)
+                elif isinstance(part, SpooledImagePart):
+                    package.write(part.path, part.partname.membername)
+                else:
+                    package.writestr(part.partname.membername, part.blob)
+                if len(part.rels):
+                    package.writestr(part.partname.rels_uri.membername, part.rels.xml)
+        self.spool.cleanup()
+
+    def abort(self):
+        """Discard a partly written output."""
+        try:
+            self.document.close()
+        finally:
+            self.spool.cleanup()
+            if os.path.exists(self.output_path):
+                os.remove(self.output_path)
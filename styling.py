@@ -3,8 +3,11 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.enum.table import WD_TABLE_ALIGNMENT
+import functools
+import io
 import re
 
+@functools.lru_cache(maxsize=None)  # A report only uses a handful of severity colors
 def lighten_color(hex_color, factor=0.4):
     """Lightens the given color by the factor"""
     hex_color = hex_color.lstrip('#')
@@ -14,6 +17,11 @@ def lighten_color(hex_color, factor=0.4):
     b = min(255, int(b + (255 - b) * factor))
     return '{:02x}{:02x}{:02x}'.format(r, g, b)
 
+@functools.lru_cache(maxsize=None)
+def rgb_color(hex_color):
+    """RGBColor of an RRGGBB string, converted once per color"""
+    return RGBColor(int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16))
+
 def set_cell_shading(cell, color_hex):
     """Set the background color of a table cell"""
     tc = cell._tc
@@ -65,23 +73,27 @@ def set_cell_border(cell, border_position, border_type='single', border_size=4,
     
     tcBorders.append(border_xml)
 
+def set_cell_borders(cell, row_idx):
+    """Make all borders of a cell visible and black, except between the first and second rows"""
+    # Apply borders to all sides by default
+    set_cell_border(cell, 'top')
+    set_cell_border(cell, 'bottom')
+    set_cell_border(cell, 'left')
+    set_cell_border(cell, 'right')
+    
+    # Remove bottom border of first row
+    if row_idx == 0:
+        set_cell_border(cell, 'bottom', border_type='nil')
+    # Remove top border of second row
+    if row_idx == 1:
+        set_cell_border(cell, 'top', border_type='nil')
+
 def set_table_borders(table):
     """Apply 'Table Grid' style and ensure all cell borders are visible and black, except between first and second rows"""
     table.style = 'Table Grid'
     for row_idx, row in enumerate(table.rows):
         for cell in row.cells:
-            # Apply borders to all sides by default
-            set_cell_border(cell, 'top')
-            set_cell_border(cell, 'bottom')
-            set_cell_border(cell, 'left')
-            set_cell_border(cell, 'right')
-            
-            # Remove bottom border of first row
-            if row_idx == 0:
-                set_cell_border(cell, 'bottom', border_type='nil')
-            # Remove top border of second row
-            if row_idx == 1:
-                set_cell_border(cell, 'top', border_type='nil')
+            set_cell_borders(cell, row_idx)
 
 def format_text_with_bullets(text, apply_bullets=False):
     """Format text with bullets for lines after the first if apply_bullets is True."""
@@ -98,4 +110,127 @@ def format_text_with_bullets(text, apply_bullets=False):
                     formatted_lines.append(f"    • {line}")  # Subsequent lines with bullet and indent
         return '\n'.join(formatted_lines)
     else:
-        return text
\ No newline at end of file
+        return text
+
+def format_center(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+def format_justify(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+
+def format_body(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    paragraph.paragraph_format.line_spacing = 1.0
+
+def format_step_content(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    paragraph.paragraph_format.space_before = Pt(2)
+    paragraph.paragraph_format.space_after = Pt(2)
+
+def format_line(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    paragraph.paragraph_format.space_before = Pt(2)
+    paragraph.paragraph_format.space_after = Pt(2)
+    paragraph.paragraph_format.line_spacing = 1.0
+
+def format_bullet(paragraph):
+    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
+    paragraph.paragraph_format.left_indent = Inches(0.25)
+    paragraph.paragraph_format.space_before = Pt(2)
+    paragraph.paragraph_format.space_after = Pt(2)
+    paragraph.paragraph_format.line_spacing = 1.0
+
+# Paragraph formats used in the findings tables, by name
+PARAGRAPH_FORMATS = {
+    'center': format_center,          # Title above each table
+    'justify': format_justify,        # Step names and images
+    'body': format_body,              # First line of a cell: justified, single spacing
+    'label': format_body,             # First line of a cell holding a colored "Header:" label
+    'step_content': format_step_content,  # Step text: justified, 2pt before/after
+    'line': format_line,              # Further lines of a multi-line value
+    'bullet': format_bullet,          # Bulleted lines, indented 0.25"
+}
+
+def picture_inline(part, image, width, name=None):
+    """Return a w:inline showing `image` (a ProcessedImage) at `width`, adding its image part to `part`.
+
+    The picture is named `name`, the screenshot's file name, as python-docx
+    names pictures added from a path (from bytes it would be 'image.png').
+    """
+    inline = part.new_pic_inline(io.BytesIO(image.data), width, None)
+    if name:
+        inline.graphic.graphicData.pic.nvPicPr.cNvPr.name = name
+    return inline
+
+
+def format_run(run, size=None, bold=False, color_hex=None):
+    """Apply font size (pt), bold and text color to a run"""
+    if size:
+        run.font.size = Pt(size)
+    if bold:
+        run.bold = True
+    if color_hex:
+        # Convert hex color to RGB and apply as text color
+        run.font.color.rgb = rgb_color(color_hex)
+
+
+class DocxWriter:
+    """Writes finding tables through the python-docx API and the helpers above.
+
+    This is the reference rendering backend; ooxml_fragments.FragmentWriter
+    produces the same XML from cached fragments.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def begin_finding(self, severity_hex):
+        pass  # Formatting is inline, nothing to prepare per severity
+
+    def add_title(self, text, size, bold=True):
+        paragraph = self.doc.add_paragraph()
+        format_center(paragraph)
+        format_run(paragraph.add_run(text), size, bold)
+        return paragraph
+
+    def add_table(self, rows):
+        table = self.doc.add_table(rows=rows, cols=1)
+        table.style = 'Table Grid'
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        table.autofit = False
+        table.width = Inches(6.5)  # Fit page width (8.5 - 1 - 1 = 6.5 inches)
+        return table
+
+    def cell(self, table, row_index):
+        return table.cell(row_index, 0)
+
+    def style_cell(self, cell, row_index, shading_hex=None):
+        """Add padding and optional background color; borders follow in finish_table"""
+        set_cell_margins(cell, margin_value=100)
+        if shading_hex:
+            set_cell_shading(cell, shading_hex)
+
+    def first_paragraph(self, cell, paragraph_format):
+        paragraph = cell.paragraphs[0]
+        PARAGRAPH_FORMATS[paragraph_format](paragraph)
+        return paragraph
+
+    def add_paragraph(self, cell, paragraph_format=None, text='', size=None, bold=False, color_hex=None):
+        paragraph = cell.add_paragraph()
+        if paragraph_format:
+            PARAGRAPH_FORMATS[paragraph_format](paragraph)
+        if text:
+            format_run(paragraph.add_run(text), size, bold, color_hex)
+        return paragraph
+
+    def add_run(self, paragraph, text, size=None, bold=False, color_hex=None):
+        run = paragraph.add_run(text)
+        format_run(run, size, bold, color_hex)
+        return run
+
+    def add_picture(self, paragraph, image, width, name=None):
+        paragraph.add_run()._r.add_drawing(picture_inline(paragraph.part, image, width, name))
+
+    def finish_table(self, table):
+        # Apply table borders (with custom handling for first and second rows)
+        set_table_borders(table)
@@ -0,0 +1,82 @@
+import collections
+import threading
+import zipfile
+
+from docx.opc.part import XmlPart
+
+from disk_cache import sha256_file
+from generate_document import PreparedTemplate
+
+# Memory of a parsed XML part relative to its uncompressed size, measured with python-docx on lxml (11 to 13
+# times); a .docx is zipped on top of that, so its file size says little about what a cached template holds
+XML_EXPANSION = 12
+
+
+def parsed_size(template_path, template):
+    """Estimated bytes the PreparedTemplate of the .docx at `template_path` holds in memory.
+
+    XML parts count as XML_EXPANSION times their uncompressed size, read from
+    the zip directory; binary parts (images, fonts) as their length.
+    """
+    with zipfile.ZipFile(template_path) as package:
+        sizes = {info.filename: info.file_size for info in package.infolist()}
+    size = 0
+    for part in template.doc.part.package.iter_parts():
+        if isinstance(part, XmlPart):
+            size += XML_EXPANSION * sizes.get(part.partname.membername, 0)
+        else:
+            size += len(part.blob)
+    return size
+
+
+class TemplateCache:
+    """Prepared templates kept in memory, keyed by the SHA-256 of the .docx.
+
+    Teams upload the same few templates over and over; each distinct one is
+    loaded and analyzed once (see PreparedTemplate) and later renders start
+    from an in-memory copy of it. The cache holds templates whose parsed
+    size (estimated by parsed_size, not measured) adds up to at most
+    `max_bytes`, evicting the least recently used one first; a template
+    larger than the limit is prepared but not kept.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # sha256 -> (PreparedTemplate, size)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_path, sha256=None):
+        """Return the PreparedTemplate for the .docx at `template_path`.
+
+        `sha256` is the file's content hash when the caller already knows it.
+        """
+        sha256 = sha256 or sha256_file(template_path)
+        with self.lock:
+            entry = self.entries.get(sha256)
+            if entry is not None:
+                self.entries.move_to_end(sha256)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Prepared outside the lock; a template uploaded twice at once is just prepared twice
+        template = PreparedTemplate(template_path)
+        size = parsed_size(template_path, template)
+        if size > self.max_bytes:
+            return template
+        with self.lock:
+            if sha256 not in self.entries:
+                self.entries[sha256] = (template, size)
+                self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+            return self.entries.get(sha256, (template,))[0]
+
+    def summary(self):
+        with self.lock:
+            return {'templates': len(self.entries), 'bytes': self.total_bytes,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs  # noqa: E402
+from benchmarks import fixtures  # noqa: E402
+from image_pipeline import ImagePipeline, start_executor  # noqa: E402
+from jobs import FAILED, MP_CONTEXT, OUT_OF_MEMORY, OUT_OF_MEMORY_RESULT, JobManager, render_job  # noqa: E402
+
+needs_limits = pytest.mark.skipif(jobs.resource is None or MP_CONTEXT.get_start_method() != 'fork',
+                                  reason="needs resource limits and forked workers")
+
+
+def address_space():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmSize'))
+
+
+def process_images_at_the_limit(paths, conn):
+    executor = start_executor(4)
+    # No room left for the stack of another thread
+    jobs.apply_limits(address_space())
+    images = ImagePipeline(image_format='keep', executor=executor)
+    try:
+        conn.send([images.get(path) is not None for path in paths])
+    finally:
+        images.close()
+        conn.close()
+
+
+@needs_limits
+def test_image_threads_run_under_a_memory_limit(tmp_path):
+    paths = fixtures.build_images(str(tmp_path), count=6, size=(64, 64))
+    parent_conn, child_conn = MP_CONTEXT.Pipe(duplex=False)
+    process = MP_CONTEXT.Process(target=process_images_at_the_limit, args=(paths, child_conn), daemon=True)
+    process.start()
+    child_conn.close()
+    try:
+        assert parent_conn.poll(30), "the image threads never finished"
+        assert parent_conn.recv() == [True] * 6
+    finally:
+        process.kill()
+        process.join()
+
+
+def run_render_job(monkeypatch, error, limits):
+    def render_report(*args, **kwargs):
+        raise error
+    monkeypatch.setattr(jobs, 'preload', lambda: None)
+    monkeypatch.setattr(jobs, 'apply_limits', lambda *args: None)
+    monkeypatch.setattr(jobs, 'render_report', render_report)
+    memory_error = MP_CONTEXT.RawValue('b', 0)
+    parent_conn, child_conn = MP_CONTEXT.Pipe(duplex=False)
+    render_job('findings.xlsx', 'template.docx', '.', None, {}, child_conn, limits=limits,
+               memory_error=memory_error)
+    return parent_conn.recv(), memory_error.value
+
+
+def test_thread_start_failure_under_a_memory_limit_is_out_of_memory(monkeypatch):
+    result, memory_error = run_render_job(monkeypatch, RuntimeError("can't start new thread"),
+                                          {'memory_bytes': 1 << 40})
+    assert result == OUT_OF_MEMORY_RESULT
+    assert memory_error == 1
+
+
+def test_import_error_under_a_memory_limit_is_reported_as_is(monkeypatch):
+    (status, error, _), memory_error = run_render_job(monkeypatch, ImportError("No module named 'pyarrow'"),
+                                                      {'memory_bytes': 1 << 40})
+    assert status == FAILED
+    assert "No module named 'pyarrow'" in error
+    assert memory_error == 0
+
+
+def test_import_error_raised_from_a_memory_error_is_out_of_memory(monkeypatch):
+    try:
+        try:
+            raise MemoryError()
+        except MemoryError as e:
+            raise ImportError("cannot load module") from e
+    except ImportError as e:
+        error = e
+    result, _ = run_render_job(monkeypatch, error, {'memory_bytes': 1 << 40})
+    assert result == OUT_OF_MEMORY_RESULT
+
+
+def exit_hook(doc):
+    sys.exit(1)
+
+
+@needs_limits
+def test_worker_exiting_with_code_1_is_not_out_of_memory(tmp_path):
+    template_path, excel_path = str(tmp_path / 'template.docx'), str(tmp_path / 'findings.xlsx')
+    fixtures.build_template(template_path)
+    fixtures.build_workbook(excel_path, findings=2)
+    manager = JobManager(root=str(tmp_path / 'jobs'), max_workers=1, memory_limit=2048 * 1024 * 1024,
+                         render_options={'post_processors': [exit_hook]})
+    job = manager.create_job()
+    manager.submit(job, excel_path, template_path)
+    deadline = time.monotonic() + 60
+    while job.status not in (FAILED, jobs.DONE) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert job.status == FAILED
+    assert job.error != OUT_OF_MEMORY
+    assert "exit code 1" in job.error
+
+
+def test_reaping_an_expired_job_calls_on_discard(tmp_path):
+    discarded = []
+    manager = JobManager(root=str(tmp_path / 'jobs'), ttl=60, on_discard=lambda job: discarded.append(job.id))
+    job = manager.create_job(preview=True)
+
+    assert manager.cleanup_expired(now=job.finished + 61) == 1
+    assert discarded == [job.id]
+    assert manager.get(job.id) is None
+    assert not os.path.exists(job.workspace)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workbook_reader import cell_text, open_findings  # noqa: E402
+
+
+def test_unfilled_severity_cell_has_no_color(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Title", "Severity", "Proof of Concept"])
+    ws.append(["Filled", "High", "Step 1: a"])
+    ws.append(["Unfilled", "Low", "Step 1: b"])
+    ws.append(["No pattern", "Low", "Step 1: c"])
+    ws.cell(row=2, column=2).fill = PatternFill("solid", fgColor="FFFF0000")
+    ws.cell(row=4, column=2).fill = PatternFill(patternType=None, fgColor="FF00FF00")
+    path = tmp_path / "findings.xlsx"
+    wb.save(path)
+
+    columns, rows = open_findings(path)
+    colors = [severity_hex for _, severity_hex in rows]
+
+    assert colors == ["FF0000", None, None]
+
+
+def test_numbers_render_as_stored_in_their_cell(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Title", "Severity", "CVSS Score"])
+    ws.append(["Whole", "High", 3])
+    ws.append(["Decimal", "High", 2.5])
+    ws.append(["Empty", "Low", None])
+    ws.append(["Whole again", "Low", 10])
+    path = tmp_path / "findings.xlsx"
+    wb.save(path)
+
+    columns, rows = open_findings(path)
+    scores = [cell_text(values["CVSS Score"]) for values, _ in rows]
+
+    # pandas made this column float, which rendered "3.0" and "10.0"
+    assert scores == ["3", "2.5", "", "10"]
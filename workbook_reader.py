@@ -0,0 +1,177 @@
+import colorsys
+import math
+import re
+
+# Excel theme color indices map to the clrScheme entries in this order
+# (light/dark pairs are swapped compared to the order they appear in theme1.xml)
+THEME_COLOR_ORDER = ['lt1', 'dk1', 'lt2', 'dk2', 'accent1', 'accent2', 'accent3',
+                     'accent4', 'accent5', 'accent6', 'hlink', 'folHlink']
+
+
+def load_theme_colors(wb):
+    """Return {theme_index: 'RRGGBB'} from the workbook's theme part (empty if none)."""
+    theme_xml = getattr(wb, 'loaded_theme', None)
+    if not theme_xml:
+        return {}
+    if isinstance(theme_xml, bytes):
+        theme_xml = theme_xml.decode('utf-8', errors='ignore')
+
+    scheme = {}
+    pattern = r'<a:({})>(.*?)</a:\1>'.format('|'.join(THEME_COLOR_ORDER))
+    for name, body in re.findall(pattern, theme_xml, flags=re.DOTALL):
+        if name in scheme:
+            continue
+        match = re.search(r'<a:srgbClr val="([0-9A-Fa-f]{6})"', body) or \
+            re.search(r'<a:sysClr [^>]*lastClr="([0-9A-Fa-f]{6})"', body)
+        if match:
+            scheme[name] = match.group(1).upper()
+    return {idx: scheme[name] for idx, name in enumerate(THEME_COLOR_ORDER) if name in scheme}
+
+
+def apply_tint(hex_color, tint):
+    """Apply an Excel tint (-1.0 darker .. 1.0 lighter) to an RRGGBB color."""
+    if not tint:
+        return hex_color
+    r, g, b = (int(hex_color[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+    l = l * (1 + tint) if tint < 0 else l * (1 - tint) + tint
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+    return '{:02X}{:02X}{:02X}'.format(round(r * 255), round(g * 255), round(b * 255))
+
+
+def resolve_color(color, theme_colors, indexed_colors):
+    """Resolve an openpyxl Color (rgb, indexed or theme) to 'RRGGBB', or None."""
+    if color is None:
+        return None
+    if color.type == 'rgb':
+        return color.rgb[-6:] if isinstance(color.rgb, str) else None  # Get RRGGBB from AARRGGBB
+    if color.type == 'indexed':
+        if 0 <= color.indexed < len(indexed_colors):
+            return indexed_colors[color.indexed][-6:]
+        return None  # 64/65 are the system foreground/background colors
+    if color.type == 'theme':
+        base = theme_colors.get(color.theme)
+        return apply_tint(base, color.tint) if base else None
+    return None
+
+
+def cell_text(value):
+    """A cell value as stripped text; empty cells (None, or NaN as open_findings reports them) are ''."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value).strip()
+
+
+def unique_columns(header_values):
+    """Name header cells the way pandas.read_excel does (Unnamed: N, duplicate.1, ...)."""
+    columns = []
+    seen = {}
+    for idx, value in enumerate(header_values):
+        name = f"Unnamed: {idx}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def open_findings(excel_path):
+    """Open the workbook read-only and stream it in a single pass.
+
+    Returns (columns, rows) where `columns` is the header row and `rows` is a
+    generator of (values, severity_hex) tuples: `values` maps each column to
+    the cell value (NaN for empty cells, like pandas) and `severity_hex` is
+    the resolved fill color of the Severity cell, or None. Values are kept
+    as stored, cell by cell: unlike pandas, which made a column of whole and
+    decimal numbers float ("3.0"), a whole number stays an int ("3").
+
+    Raises KeyError if there is no "Severity" column in the header.
+    """
+    # openpyxl is slow to import, so only .xlsx input pays for it
+    from openpyxl import load_workbook
+    from openpyxl.styles.colors import COLOR_INDEX
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        ws.reset_dimensions()  # Don't trust the stored dimension; read every row
+        row_iter = ws.iter_rows()
+        header_row = next(row_iter, ())
+        header_values = [cell.value for cell in header_row]
+        while header_values and header_values[-1] is None:
+            header_values.pop()
+        columns = unique_columns(header_values)
+
+        header_lookup = {str(col).strip().lower(): idx for idx, col in enumerate(columns)}
+        if "severity" not in header_lookup:
+            raise KeyError("severity")
+        severity_idx = header_lookup["severity"]
+    except BaseException:
+        wb.close()
+        raise
+
+    theme_colors = load_theme_colors(wb)
+    indexed_colors = getattr(wb, '_colors', None) or COLOR_INDEX
+
+    def rows():
+        width = len(columns)
+        pending_blank = []  # Blank rows are only kept if data follows, as pandas does
+        try:
+            for cells in row_iter:
+                values = [cell.value for cell in cells[:width]]
+                values.extend([None] * (width - len(values)))
+                severity_hex = None
+                if severity_idx < len(cells):
+                    fill = cells[severity_idx].fill
+                    # Only a pattern fill colors the cell; unfilled cells still carry a default (black) fgColor
+                    if fill and getattr(fill, 'patternType', None) not in (None, 'none') and fill.fgColor:
+                        severity_hex = resolve_color(fill.fgColor, theme_colors, indexed_colors)
+
+                record = ({col: (math.nan if value is None else value) for col, value in zip(columns, values)},
+                          severity_hex)
+                if all(value is None for value in values):
+                    pending_blank.append(record)
+                    continue
+                yield from pending_blank
+                pending_blank.clear()
+                yield record
+        finally:
+            wb.close()
+
+    return columns, rows()
+
+
+def read_columns(excel_path, first_column):
+    """Open the workbook read-only and stream only some of its cells, for quick checks.
+
+    Returns (columns, rows) like open_findings, but `rows` yields tuples of the
+    raw values (None for empty cells) of the columns from the one named
+    `first_column` (case-insensitive) to the end, without resolving any cell
+    styles; it yields nothing when there is no such column.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        ws.reset_dimensions()  # Don't trust the stored dimension; read every row
+        header_values = list(next(ws.iter_rows(max_row=1, values_only=True), ()))
+        while header_values and header_values[-1] is None:
+            header_values.pop()
+        columns = unique_columns(header_values)
+        first_idx = next((idx for idx, col in enumerate(columns) if str(col).strip().lower() == first_column), None)
+    except BaseException:
+        wb.close()
+        raise
+
+    def rows():
+        try:
+            if first_idx is None:
+                return
+            yield from ws.iter_rows(min_row=2, min_col=first_idx + 1, max_col=len(columns), values_only=True)
+        finally:
+            wb.close()
+
+    return columns, rows()